@@ -1,18 +1,35 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from concurrent.futures import Future
+from datetime import datetime
 from pathlib import Path
-import pandas as pd
-import shutil
-import os
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional
 
-from app.services.data_validation import validate_data
-from app.services.feature_engineering import compute_features
-from app.services.scoring_engine import calculate_scorecard
-from app.services.pdf_generator import create_credit_memo
+from app.services.daily_aggregate import WINDOW_MONTHS
+from app.services.tasks import score_window, score_history, rescore_business, append_transactions, score_trajectory
+from app.services import workers, result_cache, memo_renderer, uploads, business_store, metrics, portfolio, workspaces
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # Traffic is only accepted once startup finishes, so a new server never hands its first
+    # requests to cold workers. The server itself imports no pandas, matplotlib or fpdf.
+    if workers.WARM_UP:
+        await run_in_threadpool(result_cache.policy_version)
+        await asyncio.gather(*(asyncio.wrap_future(f) for f in workers.start_workers()))
+    stop_collector = workspaces.start_collector(UPLOAD_DIR)
+    yield
+    stop_collector.set()
+    workers.shutdown_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
@@ -20,6 +37,29 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 # Mount the static directory for CSS and JS files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
+#  Request metrics: latency per route and requests in flight; pipeline stages are timed in the workers 
+_requests_in_flight = 0
+metrics.set_gauge('scoring_requests_in_flight', lambda: _requests_in_flight, 'HTTP requests being handled.')
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    global _requests_in_flight
+    if not metrics.ENABLED:
+        return await call_next(request)
+    _requests_in_flight += 1
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        _requests_in_flight -= 1
+        # The route template, not the raw path, so business names don't become series
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.observe('scoring_request_duration_seconds', time.perf_counter() - start,
+                        (("method", request.method), ("route", route), ("status", str(status))))
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root():
     """Serves the main HTML page."""
@@ -29,6 +69,188 @@ async def read_root():
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="index.html not found")
 
+#  Upload handling: uploads are parsed from memory in the workers, never copied and re-read 
+def _read_uploads(workspace, suffix, bank_tx, pnl_monthly, vendors, spill=True):
+    """Reads one set of uploads, turning a broken limit or a bad header into an HTTP error."""
+    try:
+        return uploads.read_uploads(workspace, suffix, bank_tx, pnl_monthly, vendors, spill)
+    except uploads.UploadRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+#  Workspaces: each request writes only into its own directory, uploads/<business_name>/<workspace id>/ 
+def _new_workspace(business_name):
+    """Creates a request's workspace, held until the request has queued its tasks."""
+    workspace = workspaces.create(UPLOAD_DIR / business_name)
+    workspaces.hold(workspace)
+    return workspace
+
+def _submit(fn, *args):
+    """Queues CPU-bound work on the scoring pool, turning a full queue into a 503."""
+    try:
+        return workers.submit(fn, *args)
+    except workers.QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+#  Result cache: identical uploads (same bytes, same policy version, same day) skip the pool 
+def _cache_key(kind, business_name, windows, digests):
+    # The memo is stamped with today's date, so entries only live for the day they were scored
+    as_of = datetime.now().strftime('%Y-%m-%d')
+    return result_cache.make_key(kind, business_name, windows, as_of, *digests)
+
+def _memo_paths(result):
+    """
+    PDF paths referenced by a window result or a {window: result} mapping, from their
+    /download/<business_name>/<workspace id>/<filename> URLs.
+    """
+    results = result.values() if "pdf_download_url" not in result and "error" not in result else [result]
+    return [
+        UPLOAD_DIR.joinpath(*r["pdf_download_url"].split("/")[2:])
+        for r in results if isinstance(r, dict) and "pdf_download_url" in r
+    ]
+
+def _memo_artifacts(pdf_path):
+    """Files behind one memo: the rendered PDF (if any) and the spec it is rendered from."""
+    return [pdf_path, memo_renderer.spec_path(pdf_path)]
+
+def _restore_cached(key):
+    """
+    Returns a finished future for a cached result, restoring its memo files for /download
+    into the workspace its URLs name (the retention collector may have removed it). None on a miss.
+    """
+    entry = result_cache.get(key)
+    if entry is None:
+        return None
+    pdf_paths = _memo_paths(entry["result"])
+    if pdf_paths:
+        workspace = pdf_paths[0].parent
+        workspace.mkdir(parents=True, exist_ok=True)
+        workspaces.touch(workspace)
+        for filename, artifact in entry["memos"].items():
+            workspaces.atomic_write_bytes(workspace / filename, artifact)
+    for pdf_path in pdf_paths:
+        if pdf_path.name not in entry["memos"]:
+            # Not rendered yet: the PDF joins the entry once it is
+            _track_memo(pdf_path, key)
+    future = Future()
+    future.set_result(entry["result"])
+    return future
+
+def _store_result(key, future):
+    """Done-callback that caches a finished task's result together with its memo files."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    result = future.result()
+    try:
+        memos = {}
+        for pdf_path in _memo_paths(result):
+            for path in _memo_artifacts(pdf_path):
+                if path.exists():
+                    memos[path.name] = path.read_bytes()
+            if pdf_path.name not in memos:
+                _track_memo(pdf_path, key)
+        result_cache.put(key, result, memos)
+    except OSError:
+        # A cache that cannot be written is only a missed optimisation
+        pass
+
+#  Portfolio store: every fresh result is recorded for the /portfolio queries 
+def _record_result(business_name, window, source, future):
+    """Done-callback that records a finished task's result (one window's, or a {window: result} mapping)."""
+    if not portfolio.RECORD_RESULTS or future.cancelled() or future.exception() is not None:
+        return
+    result = future.result()
+    try:
+        portfolio.record(business_name, {window: result} if window else result, source, result_cache.policy_version())
+    except (sqlite3.Error, OSError):
+        # Like the cache, the portfolio store never fails a scoring request
+        pass
+
+#  Memo rendering: PDFs render on first download, or ahead of time while the pool is idle 
+# pdf path -> cache key of the result it belongs to, so the PDF joins that entry once rendered
+_memo_cache_keys = OrderedDict()
+MAX_TRACKED_MEMOS = 10_000
+_memo_lock = threading.Lock()
+
+def _track_memo(pdf_path, key):
+    with _memo_lock:
+        _memo_cache_keys[str(pdf_path)] = key
+        while len(_memo_cache_keys) > MAX_TRACKED_MEMOS:
+            _memo_cache_keys.popitem(last=False)
+
+def _memo_rendered(future):
+    """Done-callback for a memo render: adds the PDF to the cached result it belongs to."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    pdf_path = future.result()
+    with _memo_lock:
+        key = _memo_cache_keys.pop(pdf_path, None)
+    if key is not None:
+        try:
+            result_cache.add_memo(key, Path(pdf_path).name, Path(pdf_path).read_bytes())
+        except OSError:
+            pass
+
+def _prerender(future):
+    if memo_renderer.PRERENDER and not future.cancelled() and future.exception() is None:
+        memo_renderer.prerender(_memo_paths(future.result()), _memo_rendered)
+
+async def _cached_or_submit(key, workspace, sources, record, fn, *args):
+    """
+    Serves the task from the result cache, or queues it and, when it finishes, caches its
+    result and records it in the portfolio store (record: the _record_result arguments).
+    The workspace is held until the task is done.
+    """
+    loop = asyncio.get_running_loop()
+    future = await run_in_threadpool(_restore_cached, key)
+    if future is None:
+        try:
+            future = _submit(fn, *args)
+        except HTTPException:
+            uploads.discard_spilled(sources)
+            raise
+        future.add_done_callback(lambda f: _store_result(key, f))
+        future.add_done_callback(lambda f: _record_result(*record, f))
+    workspaces.hold(workspace)
+    future.add_done_callback(lambda f: uploads.discard_spilled(sources))
+    future.add_done_callback(lambda f: workspaces.release(workspace))
+    # Pre-rendering is queued from the event loop rather than the pool's callback thread
+    future.add_done_callback(lambda f: loop.call_soon_threadsafe(_prerender, f))
+    return future
+
+async def _submit_windows(business_name, files_map):
+    """Reads each window's uploads into one workspace and queues one scoring task per window."""
+    workspace = _new_workspace(business_name)
+    tasks = {}
+    try:
+        for window, files in files_map.items():
+            sources, digests = await run_in_threadpool(
+                _read_uploads, workspace, window, files["bank_tx"], files["pnl_monthly"], files["vendors"]
+            )
+            key = _cache_key("window", business_name, window, digests)
+            tasks[window] = await _cached_or_submit(
+                key, workspace, sources, (business_name, window, "window"), score_window, business_name, window, *sources, str(workspace)
+            )
+    finally:
+        workspaces.release(workspace)
+    return tasks
+
+async def _submit_history(business_name, windows, bank_tx, pnl_monthly, vendors):
+    """Validates the requested windows, saves the history and queues a single scoring task."""
+    requested_windows = [w.strip() for w in windows.split(",") if w.strip()]
+    unknown = [w for w in requested_windows if w not in WINDOW_MONTHS]
+    if unknown or not requested_windows:
+        raise HTTPException(status_code=400, detail=f"Unsupported windows: {unknown}. Choose from {list(WINDOW_MONTHS)}")
+
+    workspace = _new_workspace(business_name)
+    try:
+        sources, digests = await run_in_threadpool(_read_uploads, workspace, "history", bank_tx, pnl_monthly, vendors)
+        key = _cache_key("history", business_name, ",".join(requested_windows), digests)
+        return await _cached_or_submit(
+            key, workspace, sources, (business_name, None, "history"), score_history, business_name, requested_windows, *sources, str(workspace)
+        )
+    finally:
+        workspaces.release(workspace)
+
 @app.post("/score/")
 async def score_business(
     business_name: str = Form(...),
@@ -41,73 +263,239 @@ async def score_business(
 ):
     """
     Handles file uploads, validates data, computes scores for 3m and 6m windows,
-    and generates a PDF credit memo.
+    and generates a PDF credit memo. The work runs on the scoring process pool.
     """
-    business_upload_dir = UPLOAD_DIR / business_name
-    business_upload_dir.mkdir(exist_ok=True)
-
     files_map = {
         "3m": {"bank_tx": bank_tx_3m, "pnl_monthly": pnl_monthly_3m, "vendors": vendors_3m},
         "6m": {"bank_tx": bank_tx_6m, "pnl_monthly": pnl_monthly_6m, "vendors": vendors_6m}
     }
+    tasks = await _submit_windows(business_name, files_map)
 
     results = {}
-
-    for window, files in files_map.items():
+    for window, future in tasks.items():
         try:
-            #  Save files 
-            bank_tx_path = business_upload_dir / f"bank_tx_{window}.csv"
-            pnl_monthly_path = business_upload_dir / f"pnl_monthly_{window}.csv"
-            vendors_path = None
-
-            with open(bank_tx_path, "wb") as buffer:
-                shutil.copyfileobj(files["bank_tx"].file, buffer)
-            with open(pnl_monthly_path, "wb") as buffer:
-                shutil.copyfileobj(files["pnl_monthly"].file, buffer)
-            
-            #  Checking if optional vendors file was uploaded 
-            vendor_file = files["vendors"]
-            if vendor_file and vendor_file.filename:
-                vendors_path = business_upload_dir / f"vendors_{window}.csv"
-                with open(vendors_path, "wb") as buffer:
-                    shutil.copyfileobj(vendor_file.file, buffer)
-
-            #  1. Data Validation 
-            validation = validate_data(bank_tx_path, pnl_monthly_path, vendors_path)
-            if not validation["passed"]:
-                results[window] = {"error": "Data validation failed", "details": validation["checks"]}
-                continue
-
-            #  2. Feature Engineering 
-            bank_df = pd.read_csv(bank_tx_path, parse_dates=['date'])
-            pnl_df = pd.read_csv(pnl_monthly_path)
-            vendors_df = pd.read_csv(vendors_path) if vendors_path else None
-            features = compute_features(bank_df, pnl_df, vendors_df)
-
-            #  3. Scoring 
-            scorecard = calculate_scorecard(features)
-            
-            #  4. PDF Generation 
-            pdf_filename = f"Credit_Memo_{business_name}_{window}.pdf"
-            pdf_output_path = business_upload_dir / pdf_filename
-            create_credit_memo(business_name, window, scorecard, features, str(pdf_output_path), bank_df)
-
-            results[window] = {
-                "scorecard": scorecard,
-                "features": features,
-                "pdf_download_url": f"/download/{business_name}/{pdf_filename}"
-            }
-
+            results[window] = await asyncio.wrap_future(future)
         except Exception as e:
             # Provide a more detailed error message to the frontend
             raise HTTPException(status_code=500, detail=f"Error processing {window} data: {str(e)}")
 
     return JSONResponse(content=results)
 
-@app.get("/download/{business_name}/{filename}")
-async def download_file(business_name: str, filename: str):
-    """Provides a download link for the generated PDF."""
-    file_path = UPLOAD_DIR / business_name / filename
-    if os.path.exists(file_path):
-        return FileResponse(file_path, media_type='application/pdf', filename=filename)
-    raise HTTPException(status_code=404, detail="File not found")
+@app.post("/score/history/")
+async def score_business_history(
+    business_name: str = Form(...),
+    bank_tx: UploadFile = File(...),
+    pnl_monthly: UploadFile = File(...),
+    vendors: Optional[UploadFile] = File(None),
+    windows: str = Form("3m,6m")
+):
+    """
+    Scores any set of trailing windows from a single transaction history.
+    The history is parsed and aggregated per day once; each window is a slice of that aggregate.
+    """
+    future = await _submit_history(business_name, windows, bank_tx, pnl_monthly, vendors)
+    try:
+        results = await asyncio.wrap_future(future)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return JSONResponse(content=results)
+
+@app.post("/rescore/{business_name}")
+async def rescore_stored_business(business_name: str, windows: Optional[str] = Form(None)):
+    """
+    Rescores a business from the data stored when it was last scored, without any upload:
+    for policy changes, appeals or another window. windows defaults to every stored window.
+    Always runs the current policy, so the result cache is not consulted.
+    """
+    if not business_store.list_datasets(business_name):
+        raise HTTPException(status_code=404, detail=f"No stored data for {business_name}")
+    requested_windows = None
+    if windows:
+        requested_windows = [w.strip() for w in windows.split(",") if w.strip()]
+        unknown = [w for w in requested_windows if w not in WINDOW_MONTHS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unsupported windows: {unknown}. Choose from {list(WINDOW_MONTHS)}")
+
+    workspace = _new_workspace(business_name)
+    loop = asyncio.get_running_loop()
+    try:
+        future = _submit(rescore_business, business_name, requested_windows, str(workspace))
+    except HTTPException:
+        workspaces.release(workspace)
+        raise
+    future.add_done_callback(lambda f: _record_result(business_name, None, "rescore", f))
+    future.add_done_callback(lambda f: workspaces.release(workspace))
+    future.add_done_callback(lambda f: loop.call_soon_threadsafe(_prerender, f))
+    try:
+        results = await asyncio.wrap_future(future)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return JSONResponse(content=results)
+
+@app.post("/append/{business_name}")
+async def append_business_transactions(
+    business_name: str,
+    bank_tx: UploadFile = File(...),
+    pnl_monthly: Optional[UploadFile] = File(None),
+    windows: Optional[str] = Form(None)
+):
+    """
+    Refreshes a stored business's scores from new transactions only (e.g. the day's bank feed),
+    folded into its stored daily aggregates. New P&L months may be sent along. windows
+    defaults to the windows the business was last scored on. Not cached: every append changes the data.
+    """
+    if not business_store.list_datasets(business_name):
+        raise HTTPException(status_code=404, detail=f"No stored data for {business_name}")
+    requested_windows = None
+    if windows:
+        requested_windows = [w.strip() for w in windows.split(",") if w.strip()]
+        unknown = [w for w in requested_windows if w not in WINDOW_MONTHS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unsupported windows: {unknown}. Choose from {list(WINDOW_MONTHS)}")
+
+    workspace = _new_workspace(business_name)
+    loop = asyncio.get_running_loop()
+    try:
+        # Appends are folded in memory: a feed too big for that is rejected, not spilled
+        sources, _ = await run_in_threadpool(_read_uploads, workspace, "append", bank_tx, pnl_monthly, None, False)
+        try:
+            future = _submit(append_transactions, business_name, requested_windows, sources[0], sources[1], str(workspace))
+        except HTTPException:
+            uploads.discard_spilled(sources)
+            raise
+    except HTTPException:
+        workspaces.release(workspace)
+        raise
+    future.add_done_callback(lambda f: uploads.discard_spilled(sources))
+    future.add_done_callback(lambda f: _record_result(business_name, None, "append", f))
+    future.add_done_callback(lambda f: workspaces.release(workspace))
+    future.add_done_callback(lambda f: loop.call_soon_threadsafe(_prerender, f))
+    try:
+        results = await asyncio.wrap_future(future)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return JSONResponse(content=results)
+
+MAX_HISTORY_DAYS = 3660
+MAX_PORTFOLIO_ROWS = 10_000
+
+@app.get("/score-history/{business_name}")
+async def get_score_history(business_name: str, window_days: Optional[int] = None, days: Optional[int] = None):
+    """
+    The daily score trajectory of a stored business: the scorecard at each of the last `days`
+    days, each from the trailing window_days (defaults: rolling_history.HISTORY_DAYS and
+    WINDOW_DAYS), one list per column.
+    """
+    if not business_store.list_datasets(business_name):
+        raise HTTPException(status_code=404, detail=f"No stored data for {business_name}")
+    for name, value in (("window_days", window_days), ("days", days)):
+        if value is not None and not 0 < value <= MAX_HISTORY_DAYS:
+            raise HTTPException(status_code=400, detail=f"{name} must be between 1 and {MAX_HISTORY_DAYS}")
+    future = _submit(score_trajectory, business_name, window_days, days)
+    try:
+        result = await asyncio.wrap_future(future)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return JSONResponse(content=result)
+
+#  Portfolio queries: answered from the portfolio store's rollups and indexes, never from transaction data 
+@app.get("/portfolio/summary")
+async def get_portfolio_summary(window: Optional[str] = None):
+    """Businesses, total eligible capital, total expected loss and mean score per window and grade."""
+    return await run_in_threadpool(portfolio.summary, window)
+
+@app.get("/portfolio/reasons")
+async def get_portfolio_reasons(window: Optional[str] = None):
+    """How many businesses' latest result carries each reason code, per window."""
+    return await run_in_threadpool(portfolio.reasons, window)
+
+@app.get("/portfolio/businesses")
+async def get_portfolio_businesses(window: Optional[str] = None, grade: Optional[str] = None,
+                                   reason: Optional[str] = None, limit: int = 100, offset: int = 0):
+    """Latest results, filtered on window, grade and reason code, by business name."""
+    if not 0 < limit <= MAX_PORTFOLIO_ROWS or offset < 0:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PORTFOLIO_ROWS}, offset at least 0")
+    return await run_in_threadpool(portfolio.businesses, window, grade, reason, limit, offset)
+
+@app.get("/portfolio/businesses/{business_name}")
+async def get_portfolio_business(business_name: str, window: Optional[str] = None):
+    """Every recorded result of one business, oldest first, with its features."""
+    history = await run_in_threadpool(portfolio.business_history, business_name, window)
+    if not history:
+        raise HTTPException(status_code=404, detail=f"No recorded results for {business_name}")
+    return history
+
+#  Async job API: submit returns a job id immediately, poll /jobs/{job_id} for the result 
+@app.post("/jobs/score/", status_code=202)
+async def submit_score_job(
+    business_name: str = Form(...),
+    bank_tx_3m: UploadFile = File(...),
+    pnl_monthly_3m: UploadFile = File(...),
+    vendors_3m: Optional[UploadFile] = File(None),
+    bank_tx_6m: UploadFile = File(...),
+    pnl_monthly_6m: UploadFile = File(...),
+    vendors_6m: Optional[UploadFile] = File(None)
+):
+    """Queues a 3m/6m scoring job and returns its id without waiting for the result."""
+    files_map = {
+        "3m": {"bank_tx": bank_tx_3m, "pnl_monthly": pnl_monthly_3m, "vendors": vendors_3m},
+        "6m": {"bank_tx": bank_tx_6m, "pnl_monthly": pnl_monthly_6m, "vendors": vendors_6m}
+    }
+    tasks = await _submit_windows(business_name, files_map)
+    job_id = workers.create_job(tasks)
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+@app.post("/jobs/score/history/", status_code=202)
+async def submit_score_history_job(
+    business_name: str = Form(...),
+    bank_tx: UploadFile = File(...),
+    pnl_monthly: UploadFile = File(...),
+    vendors: Optional[UploadFile] = File(None),
+    windows: str = Form("3m,6m")
+):
+    """Queues a single-history scoring job and returns its id without waiting for the result."""
+    future = await _submit_history(business_name, windows, bank_tx, pnl_monthly, vendors)
+    job_id = workers.create_job({"history": future}, merge_results=True)
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Reports a job's status (queued, running, done, failed) and its result once done."""
+    job = workers.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(content=job)
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Result cache hit/miss counters and tier sizes."""
+    return result_cache.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Per-stage wall/CPU/peak-memory histograms, request latency and pool gauges, in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/download/{business_name}/{workspace}/{filename}")
+async def download_file(business_name: str, workspace: str, filename: str):
+    """
+    Provides a download link for the PDF a request generated, in that request's workspace.
+    A memo that has not been rendered yet is rendered now; concurrent downloads of the same
+    memo share a single render.
+    """
+    if not workspaces.is_workspace(workspace) or filename.endswith(memo_renderer.SPEC_SUFFIX):
+        raise HTTPException(status_code=404, detail="File not found")
+    file_path = UPLOAD_DIR / business_name / workspace / filename
+    workspaces.touch(file_path.parent)
+    try:
+        render = memo_renderer.ensure_memo(file_path, _memo_rendered)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    except workers.QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    if render is not None:
+        try:
+            await asyncio.wrap_future(render)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error rendering memo: {str(e)}")
+    return FileResponse(file_path, media_type='application/pdf', filename=filename)
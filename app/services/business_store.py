@@ -0,0 +1,280 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+# Validated business data, kept per business and dataset (a window such as '3m', or
+# 'history') so it can be rescored without re-uploading or re-parsing CSV text.
+#
+# Layout: <STORE_DIR>/<business>/<dataset>/meta.json plus one raw little-endian column file
+# per table column. Files are appendable, so streamed uploads are stored chunk by chunk, and
+# they are memory-mapped on load: only the columns asked for are touched, without copying.
+# numpy and pandas are imported by the functions that encode and load columns; the server
+# process only checks which datasets exist.
+STORE_DIR = Path(os.environ.get("SCORING_STORE_DIR", "uploads/.store"))
+STORE_DATA = os.environ.get("SCORING_STORE_DATA", "1") != "0"
+
+TABLES = ('bank_tx', 'pnl_monthly', 'vendors')
+META_FILE = 'meta.json'
+
+# kind -> on-disk dtype
+_STORAGE_DTYPES = {
+    'float64': '<f8',
+    'int64': '<i8',
+    'datetime': '<i8',     # datetime64[ns] ticks; NaT is the minimum int64
+    'boolean': 'i1',       # 1 / 0, -1 for missing
+    'category': '<i4',     # codes into the stored categories, -1 for missing
+    'object': '<i4',       # strings, dictionary-encoded like category
+}
+
+
+def dataset_dir(business_name, dataset):
+    return STORE_DIR / business_name / dataset
+
+
+def list_datasets(business_name):
+    """Names of the complete datasets stored for a business."""
+    business_dir = STORE_DIR / business_name
+    if not business_dir.is_dir():
+        return []
+    return sorted(p.name for p in business_dir.iterdir() if (p / META_FILE).exists())
+
+
+def read_meta(business_name, dataset):
+    with open(dataset_dir(business_name, dataset) / META_FILE) as f:
+        return json.load(f)
+
+
+def _column_kind(series):
+    import pandas as pd
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return 'category'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'datetime'
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'boolean'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'int64'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'float64'
+    return 'object'
+
+
+def _encode(column, series, lookup=None):
+    """Column values in their on-disk dtype. lookup maps category/object values to stored codes."""
+    import numpy as np
+    import pandas as pd
+    kind = column['kind']
+    dtype = _STORAGE_DTYPES[kind]
+    if kind == 'datetime':
+        return series.to_numpy(dtype='datetime64[ns]').view('i8').astype(dtype, copy=False)
+    if kind == 'boolean':
+        return np.where(series.isna(), -1, series.fillna(False).astype(bool)).astype(dtype)
+    if kind in ('category', 'object'):
+        # Chunk-local codes are remapped onto the dataset-wide dictionary
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            local_codes, local_values = series.cat.codes.to_numpy(), series.cat.categories
+        else:
+            local_codes, local_values = pd.factorize(series)
+        remap = np.empty(len(local_values) + 1, dtype=dtype)
+        remap[-1] = -1
+        for i, value in enumerate(local_values):
+            if value not in lookup:
+                lookup[value] = len(column['categories'])
+                column['categories'].append(value)
+            remap[i] = lookup[value]
+        return remap[local_codes]
+    return series.to_numpy(dtype=dtype)
+
+
+def _write_meta(directory, meta):
+    tmp_path = directory / f".{META_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, default=str)
+    os.replace(tmp_path, directory / META_FILE)
+
+
+class DatasetWriter:
+    """
+    Appends DataFrames table by table into column files. The dataset is written to a
+    temporary directory and only replaces the stored one on commit().
+    """
+
+    def __init__(self, business_name, dataset):
+        self.final_dir = dataset_dir(business_name, dataset)
+        self.tmp_dir = self.final_dir.with_name(f".{dataset}.{os.getpid()}.tmp")
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        self.tmp_dir.mkdir(parents=True)
+        self.tables = {}
+        self._codes = {}
+
+    def append(self, table, df):
+        info = self.tables.get(table)
+        if info is None:
+            info = self.tables[table] = {'rows': 0, 'columns': []}
+            for i, col in enumerate(df.columns):
+                column = {'name': col, 'kind': _column_kind(df[col]), 'file': f"{table}.{i}.bin"}
+                if column['kind'] in ('category', 'object'):
+                    column['categories'] = []
+                    self._codes[(table, col)] = {}
+                info['columns'].append(column)
+
+        for column in info['columns']:
+            values = _encode(column, df[column['name']], self._codes.get((table, column['name'])))
+            with open(self.tmp_dir / column['file'], 'ab') as f:
+                f.write(values.tobytes())
+        info['rows'] += len(df)
+
+    def commit(self, **extra):
+        """Writes the manifest and swaps the dataset in. extra is kept in meta.json."""
+        with open(self.tmp_dir / META_FILE, 'w') as f:
+            json.dump(dict(extra, tables=self.tables), f, default=str)
+        old_dir = self.final_dir.with_name(f".{self.final_dir.name}.{os.getpid()}.old")
+        if self.final_dir.exists():
+            os.replace(self.final_dir, old_dir)
+        os.replace(self.tmp_dir, self.final_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    def abort(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def store_frames(business_name, dataset, frames, **extra):
+    """Stores a frame bundle (see load_business_data), or any {table: DataFrame}, as one dataset."""
+    writer = DatasetWriter(business_name, dataset)
+    try:
+        for table, df in frames.items():
+            if df is not None:
+                writer.append(table, df)
+        writer.commit(**extra)
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def append_rows(business_name, dataset, tables, **extra):
+    """
+    Appends rows to tables of a stored dataset in place ({table: DataFrame}); the cost depends
+    only on the rows appended. Column files are extended first and meta.json (whose row counts
+    readers trust) is replaced last, so a failed append leaves the dataset as it was.
+    extra updates meta.json.
+    """
+    import numpy as np
+    directory = dataset_dir(business_name, dataset)
+    meta = read_meta(business_name, dataset)
+    for table, df in tables.items():
+        info = meta['tables'][table]
+        for column in info['columns']:
+            path = directory / column['file']
+            itemsize = np.dtype(_STORAGE_DTYPES[column['kind']]).itemsize
+            lookup = None
+            if column['kind'] in ('category', 'object'):
+                lookup = {value: code for code, value in enumerate(column['categories'])}
+            values = _encode(column, df[column['name']], lookup)
+            with open(path, 'r+b' if path.exists() else 'wb') as f:
+                # Bytes past the committed rows are left over from an append that failed
+                f.truncate(info['rows'] * itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(values.tobytes())
+        info['rows'] += len(df)
+    meta.update(extra)
+    _write_meta(directory, meta)
+    return meta
+
+
+def replace_table(business_name, dataset, table, df, **extra):
+    """Rewrites one (small) table of a stored dataset, leaving the others in place."""
+    directory = dataset_dir(business_name, dataset)
+    meta = read_meta(business_name, dataset)
+    old_files = [column['file'] for column in meta['tables'].get(table, {}).get('columns', [])]
+    generation = meta.get('generation', 0) + 1
+    columns = []
+    for i, col in enumerate(df.columns):
+        column = {'name': col, 'kind': _column_kind(df[col]), 'file': f"{table}.{i}.g{generation}.bin"}
+        if column['kind'] in ('category', 'object'):
+            column['categories'] = []
+        with open(directory / column['file'], 'wb') as f:
+            f.write(_encode(column, df[col], {}).tobytes())
+        columns.append(column)
+    meta['tables'][table] = {'rows': len(df), 'columns': columns}
+    meta.update(extra, generation=generation)
+    _write_meta(directory, meta)
+    for name in old_files:
+        (directory / name).unlink(missing_ok=True)
+    return meta
+
+
+def drop_dataset(business_name, dataset):
+    shutil.rmtree(dataset_dir(business_name, dataset), ignore_errors=True)
+
+
+def _load_column(directory, column, rows, start=0):
+    import numpy as np
+    import pandas as pd
+    kind = column['kind']
+    dtype = np.dtype(_STORAGE_DTYPES[kind])
+    if rows > start:
+        values = np.memmap(directory / column['file'], dtype=dtype, mode='r', shape=(rows,))[start:]
+    else:
+        values = np.empty(0, dtype=dtype)
+
+    if kind == 'datetime':
+        return values.view('datetime64[ns]')
+    if kind == 'boolean':
+        return pd.arrays.BooleanArray(values == 1, values < 0)
+    if kind == 'category':
+        return pd.Categorical.from_codes(values, categories=column['categories'], validate=False)
+    if kind == 'object':
+        categories = np.array(column['categories'] + [np.nan], dtype=object)
+        return categories[values]
+    return values
+
+
+def load_frames(business_name, dataset, bank_tx_columns=None):
+    """
+    Returns the stored frame bundle, memory-mapped. bank_tx_columns restricts bank_tx to the
+    columns a caller needs (e.g. ingestion.BANK_TX_REQUIRED_COLUMNS for scoring).
+    """
+    import pandas as pd
+    directory = dataset_dir(business_name, dataset)
+    meta = read_meta(business_name, dataset)
+    frames = {}
+    for table in TABLES:
+        info = meta['tables'].get(table)
+        if info is None:
+            frames[table] = None
+            continue
+        columns = info['columns']
+        if table == 'bank_tx' and bank_tx_columns is not None:
+            by_name = {column['name']: column for column in columns}
+            columns = [by_name[name] for name in bank_tx_columns]
+        frames[table] = pd.DataFrame(
+            {column['name']: _load_column(directory, column, info['rows']) for column in columns}, copy=False
+        )
+    return frames
+
+
+def load_table(business_name, dataset, table, after=None, date_column='date'):
+    """
+    Loads one stored table, memory-mapped. For a table appended in date order, after=<date>
+    loads only the rows dated after it: the date column is binary-searched, so rows before
+    it are never read.
+    """
+    import numpy as np
+    import pandas as pd
+    directory = dataset_dir(business_name, dataset)
+    info = read_meta(business_name, dataset)['tables'][table]
+    by_name = {column['name']: column for column in info['columns']}
+    start = 0
+    if after is not None and info['rows']:
+        dates = _load_column(directory, by_name[date_column], info['rows'])
+        start = int(np.searchsorted(dates, np.datetime64(pd.Timestamp(after), 'ns'), side='right'))
+    return pd.DataFrame(
+        {column['name']: _load_column(directory, column, info['rows'], start) for column in info['columns']}, copy=False
+    )
+
+
+def stored_bytes(business_name, dataset):
+    """Total size of a stored dataset on disk."""
+    return sum(p.stat().st_size for p in dataset_dir(business_name, dataset).iterdir())
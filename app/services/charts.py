@@ -0,0 +1,105 @@
+import io
+
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
+from PIL import Image
+
+# Charts are drawn on standalone Figure objects with their own Agg canvas: no pyplot state
+# machine and no files, so any number of threads can render at once, one ChartRenderer each.
+
+
+def _millions(x, pos):
+    return f'{x / 1e6:.1f}M'
+
+
+def _thousands(x, pos):
+    return f'{x / 1e3:.0f}K'
+
+
+def _whole(x, pos):
+    return f'{x:.0f}'
+
+
+def _styled_axes(title, ylabel, formatter):
+    fig = Figure(figsize=(5, 3))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_title(title, fontsize=12, weight='bold')
+    ax.set_ylabel(ylabel, fontsize=10)
+    ax.yaxis.set_major_formatter(FuncFormatter(formatter))
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    return fig, ax
+
+
+def _png(fig, ax):
+    """Lays out the figure and returns it as opaque RGB PNG bytes."""
+    for label in ax.get_xticklabels():
+        label.set(rotation=30, ha='right')
+    # tight_layout starts from the current margins, so a reused figure is reset to the
+    # defaults first to come out exactly like a fresh one
+    fig.subplots_adjust(**{k: matplotlib.rcParams[f'figure.subplot.{k}'] for k in ('left', 'right', 'bottom', 'top')})
+    fig.tight_layout()
+
+    rgba = io.BytesIO()
+    fig.savefig(rgba, format='png', bbox_inches='tight', pad_inches=0.1, pil_kwargs={'compress_level': 0})
+    # The figures are opaque; dropping the alpha channel spares FPDF a slow per-pixel split.
+    # Only this final PNG is compressed; the intermediate one above is stored raw
+    rgb = io.BytesIO()
+    Image.open(rgba).convert('RGB').save(rgb, format='png')
+    return rgb.getvalue()
+
+
+class ChartRenderer:
+    """
+    Holds the two memo figures, styled once, and only swaps their data for each memo.
+    Meant for rendering many memos in a row; an instance must not be shared across threads.
+    """
+
+    def __init__(self):
+        self._balance_fig, self._balance_ax = _styled_axes("Daily Balance", "Balance (USD)", _millions)
+        self._balance_line = None
+        self._cashflow_fig, self._cashflow_ax = _styled_axes("Weekly Net Cash Flow", "Net Flow (USD)", _thousands)
+        self._cashflow_bars = None
+        # Only memos with a score history show the third chart, so it is styled on first use
+        self._score_fig = self._score_ax = self._score_line = None
+
+    def balance_png(self, daily_balance):
+        """Line chart of the daily closing balance (a Series indexed by date)."""
+        ax = self._balance_ax
+        if self._balance_line is None:
+            # The first plot also sets the date units of the x axis
+            self._balance_line, = ax.plot(daily_balance.index, daily_balance.values, color='#4285F4', linewidth=2)
+        else:
+            self._balance_line.set_data(daily_balance.index, daily_balance.values)
+            ax.relim()
+            ax.autoscale_view()
+        return _png(self._balance_fig, ax)
+
+    def cashflow_png(self, weekly_cash_flow):
+        """Bar chart of weekly net cash flow (a Series indexed by week end), green in / red out."""
+        ax = self._cashflow_ax
+        if self._cashflow_bars is not None:
+            self._cashflow_bars.remove()
+        colors = ['#34A853' if val >= 0 else '#EA4335' for val in weekly_cash_flow.values]
+        self._cashflow_bars = ax.bar(weekly_cash_flow.index, weekly_cash_flow.values, width=5, color=colors)
+        if len(ax.lines) == 0:
+            ax.axhline(0, color='grey', linewidth=0.8)
+        ax.relim()
+        ax.autoscale_view()
+        return _png(self._cashflow_fig, ax)
+
+    def score_png(self, score_history):
+        """Line chart of the rolling score (a Series indexed by day) against the 0-100 scale."""
+        if self._score_fig is None:
+            self._score_fig, self._score_ax = _styled_axes("Score History", "Score", _whole)
+            self._score_ax.set_ylim(0, 100)
+        ax = self._score_ax
+        if self._score_line is None:
+            self._score_line, = ax.plot(score_history.index, score_history.values, color='#9334E6', linewidth=2)
+        else:
+            self._score_line.set_data(score_history.index, score_history.values)
+            ax.relim()
+            ax.autoscale_view(scaley=False)
+        return _png(self._score_fig, ax)
@@ -0,0 +1,110 @@
+# pandas and numpy are imported by the functions that use them: the server process loads
+# this module only for WINDOW_MONTHS.
+
+#  Trailing windows an underwriter can request from a single history upload
+WINDOW_MONTHS = {'1m': 1, '3m': 3, '6m': 6, '12m': 12}
+# A window is fully covered when the history starts at most this many days after its first
+# day, so a feed that opens after a weekend or a bank holiday still counts
+WINDOW_START_GRACE_DAYS = 3
+
+
+def build_daily_aggregate(bank_tx_df):
+    """
+    Collapses a full transaction history into per-day totals, built once per upload.
+
+    Returns a dict with:
+      - 'daily': one row per transaction day with closing balance, signed net flow,
+        inflow totals by category, NSF / returned-ACH counts, late-payment tallies
+        and debt service.
+      - 'counterparty_outflows': outflow totals per (date, counterparty), which the
+        concentration features need and which cannot be reduced to a single row per day.
+    """
+    import numpy as np
+    import pandas as pd
+    is_in = (bank_tx_df['in_out'] == 'in').to_numpy()
+    is_out = (bank_tx_df['in_out'] == 'out').to_numpy()
+    amount = bank_tx_df['amount'].to_numpy()
+    category = bank_tx_df['category']
+    dates = bank_tx_df['date']
+
+    due_mask = is_out & bank_tx_df['due_date'].notna().to_numpy()
+    per_row = pd.DataFrame({
+        'date': dates,
+        'closing_balance': bank_tx_df['balance'],
+        'net_flow': np.where(is_in, amount, -amount),
+        'outflow_total': np.where(is_out, amount, 0.0),
+        'nsf_count': (category == 'nsf_fee').to_numpy().astype('int64'),
+        'returned_ach_count': (category == 'returned_ach').to_numpy().astype('int64'),
+        'due_payments': due_mask.astype('int64'),
+        'late_payments': (due_mask & (dates > bank_tx_df['due_date']).to_numpy()).astype('int64'),
+        'debt_service': np.where((category == 'loan_repayment').to_numpy(), amount, 0.0),
+    })
+    daily = per_row.groupby('date').agg(
+        closing_balance=('closing_balance', 'last'),
+        net_flow=('net_flow', 'sum'),
+        outflow_total=('outflow_total', 'sum'),
+        nsf_count=('nsf_count', 'sum'),
+        returned_ach_count=('returned_ach_count', 'sum'),
+        due_payments=('due_payments', 'sum'),
+        late_payments=('late_payments', 'sum'),
+        debt_service=('debt_service', 'sum'),
+    )
+
+    # Inflow totals by category, one column per category ('inflow_credit', ...)
+    inflows = bank_tx_df[is_in]
+    inflow_by_category = inflows.pivot_table(
+        index='date', columns='category', values='amount', aggfunc='sum', fill_value=0.0, observed=True
+    )
+    inflow_by_category.columns = [f'inflow_{c}' for c in inflow_by_category.columns]
+    daily = daily.join(inflow_by_category).fillna(0.0)
+    if 'inflow_credit' not in daily.columns:
+        daily['inflow_credit'] = 0.0
+    daily['inflow_total'] = inflows.groupby('date')['amount'].sum().reindex(daily.index, fill_value=0.0)
+
+    outflows = bank_tx_df[is_out]
+    counterparty_outflows = (
+        outflows.groupby(['date', 'counterparty'], observed=True)['amount'].sum().reset_index()
+    )
+
+    return {'daily': daily, 'counterparty_outflows': counterparty_outflows}
+
+
+def month_end_dates(pnl_monthly_df):
+    """Converts the 'YYYY-MM' month labels of a P&L frame to month-end timestamps."""
+    import pandas as pd
+    return pd.PeriodIndex(pnl_monthly_df['month'], freq='M').to_timestamp(how='end').normalize()
+
+
+def window_start(pnl_monthly_df, months, end_date=None):
+    """Exclusive start date of a trailing window, anchored on end_date or else the last P&L month end."""
+    import pandas as pd
+    if end_date is None:
+        end_date = month_end_dates(pnl_monthly_df).max()
+    return end_date - pd.DateOffset(months=months)
+
+
+def slice_window(aggregate, pnl_monthly_df, months, end_date=None):
+    """
+    Slices the precomputed daily aggregate and the P&L down to a trailing window,
+    mirroring how data_generator.save_sliced_data cuts trailing files. end_date anchors
+    the window on a given day (e.g. the last appended day) instead of the last P&L month end.
+
+    'window_start' is the window's first day. When the history starts later than that
+    (beyond WINDOW_START_GRACE_DAYS) the window is only partly covered, and 'covered_from'
+    is the first transaction day; otherwise it is None.
+    """
+    import pandas as pd
+    start_date = window_start(pnl_monthly_df, months, end_date)
+    daily = aggregate['daily']
+    first_window_day = start_date + pd.Timedelta(days=1)
+    covered_from = None
+    if len(daily) and daily.index.min() > first_window_day + pd.Timedelta(days=WINDOW_START_GRACE_DAYS):
+        covered_from = daily.index.min()
+    counterparty_outflows = aggregate['counterparty_outflows']
+    return {
+        'daily': daily[daily.index > start_date],
+        'counterparty_outflows': counterparty_outflows[counterparty_outflows['date'] > start_date],
+        'pnl_monthly': pnl_monthly_df[(month_end_dates(pnl_monthly_df) > start_date)].reset_index(drop=True),
+        'window_start': first_window_day,
+        'covered_from': covered_from,
+    }
@@ -1,72 +1,222 @@
+import os
+import time
+
 import pandas as pd
 import numpy as np
 
-def validate_data(bank_tx_path, pnl_monthly_path, vendors_path=None):
-    """Performs data quality checks on the uploaded CSV files."""
-    results = {}
-    passed = True
-
-    try:
-        #  bank_tx.csv checks 
-        bank_tx_df = pd.read_csv(bank_tx_path, parse_dates=['date'])
-        results['bank_tx_missing_dates'] = int(bank_tx_df['date'].diff().dt.days.gt(1).sum())
-        results['bank_tx_duplicate_rows'] = int(bank_tx_df.duplicated().sum())
-        results['bank_tx_negative_or_empty_amounts'] = int(((bank_tx_df['amount'] < 0) | bank_tx_df['amount'].isnull()).sum())
-
-        #  Balance Continuity Check
-        if not bank_tx_df.empty:
-            bank_tx_df['signed_amount'] = np.where(bank_tx_df['in_out'] == 'in', bank_tx_df['amount'], -bank_tx_df['amount'])
-            
-            # Group by date to get the net change and closing balance for each day
-            daily_summary = bank_tx_df.groupby('date').agg(
-                daily_net_change=('signed_amount', 'sum'),
-                closing_balance=('balance', 'last')
-            ).reset_index()
-
-            # Get the previous day's closing balance
-            previous_closing_balance = daily_summary['closing_balance'].shift(1)
-            
-            # The expected balance for today is yesterday's close + today's net change
-            expected_today_balance = previous_closing_balance + daily_summary['daily_net_change']
-            
-            # Compare the actual closing balance to the expected, allowing for a small tolerance
-            balance_errors = ~np.isclose(daily_summary['closing_balance'][1:], expected_today_balance[1:])
-            results['balance_continuity_errors'] = int(balance_errors.sum())
-        else:
-            results['balance_continuity_errors'] = 0
+from app.services import metrics
+from app.services.daily_aggregate import build_daily_aggregate
+from app.services.feature_engineering import bank_tx_kernel
 
+# Data quality checks are declared as rules (see `rule` below) and run in registration
+# order, cheapest first. Each rule returns a count of problems: 0 passes. Severities:
+#   - 'blocking': fails validation and, with fail-fast on, skips every later rule;
+#   - 'error': fails validation;
+#   - 'warning': reported under "warnings" but never fails validation.
+# Rules share aggregates through the validation context, so the daily summary is built
+# once, and it is the same aggregate the caller scores from afterwards: bank_tx_kernel for
+# compute_features, or build_daily_aggregate when a history is sliced into windows.
+FAIL_FAST = os.environ.get("SCORING_VALIDATION_FAIL_FAST", "1") != "0"
+
+BLOCKING = 'blocking'
+ERROR = 'error'
+WARNING = 'warning'
+
+RULES = []
+AGGREGATES = {}
+
+
+def rule(name, table, severity=ERROR):
+    """Registers check(context) -> problem count as a validation rule on `table`."""
+    def register(check):
+        RULES.append({'name': name, 'table': table, 'severity': severity, 'check': check})
+        return check
+    return register
+
+
+def aggregate(name):
+    """Registers build(frames) as an aggregate rules can share through context.aggregate(name)."""
+    def register(build):
+        AGGREGATES[name] = build
+        return build
+    return register
+
+
+class ValidationContext:
+    """The frames being validated plus the aggregates built for them so far."""
+
+    def __init__(self, frames, aggregates=None, daily_summary='bank_tx_kernel'):
+        self.frames = frames
+        self.aggregates = {} if aggregates is None else aggregates
+        self.daily_summary_source = daily_summary
+
+    def aggregate(self, name):
+        if name not in self.aggregates:
+            self.aggregates[name] = AGGREGATES[name](self.frames)
+        return self.aggregates[name]
+
+    def daily_summary(self):
+        """Per-day signed net change and closing balance, from the chosen shared aggregate."""
+        if self.daily_summary_source == 'daily_aggregate':
+            daily = self.aggregate('daily_aggregate')['daily']
+            return daily['net_flow'].reset_index(drop=True), daily['closing_balance'].reset_index(drop=True)
+        kernel = self.aggregate('bank_tx_kernel')
+        return pd.Series(kernel['daily_net_flow']), pd.Series(kernel['daily_balance'])
+
+
+#  Shared aggregates
+@aggregate('bank_tx_kernel')
+def _bank_tx_kernel(frames):
+    return bank_tx_kernel(frames['bank_tx'])
+
+
+@aggregate('daily_aggregate')
+def _daily_aggregate(frames):
+    return build_daily_aggregate(frames['bank_tx'])
+
+
+#  pnl_monthly.csv checks
+@rule('pnl_null_values', 'pnl_monthly', BLOCKING)
+def _pnl_null_values(context):
+    return int(context.frames['pnl_monthly'][['revenue', 'cogs', 'operating_expense']].isnull().sum().sum())
+
+
+#  vendors.csv checks (optional file)
+@rule('vendors_null_values', 'vendors')
+def _vendors_null_values(context):
+    return int(context.frames['vendors'][['vendor_id', 'name']].isnull().sum().sum())
 
-        #  Category Coverage Check 
-        missing_categories = bank_tx_df['category'].isnull().sum()
-        total_transactions = len(bank_tx_df)
-        if total_transactions > 0:
-            category_coverage_percent = ( (total_transactions - missing_categories) / total_transactions ) * 100
-            # Fail if coverage is less than 95%
-            results['category_coverage_low'] = 1 if category_coverage_percent < 95 else 0
-        else:
-            results['category_coverage_low'] = 0
 
+@rule('vendors_duplicate_ids', 'vendors')
+def _vendors_duplicate_ids(context):
+    return int(context.frames['vendors']['vendor_id'].duplicated().sum())
 
-        #  pnl_monthly.csv checks 
-        pnl_df = pd.read_csv(pnl_monthly_path)
-        results['pnl_null_values'] = int(pnl_df[['revenue', 'cogs', 'operating_expense']].isnull().sum().sum())
 
-        #  vendors.csv checks (optional file) 
-        if vendors_path:
-            try:
-                vendors_df = pd.read_csv(vendors_path)
-                results['vendors_null_values'] = int(vendors_df[['vendor_id', 'name']].isnull().sum().sum())
-                results['vendors_duplicate_ids'] = int(vendors_df['vendor_id'].duplicated().sum())
-            except Exception as e:
-                results['vendors_read_error'] = str(e)
+#  bank_tx.csv checks
+@rule('bank_tx_empty', 'bank_tx', BLOCKING)
+def _bank_tx_empty(context):
+    # A header with no transactions would otherwise score as a business with no cash
+    return 1 if len(context.frames['bank_tx']) == 0 else 0
 
 
-        # Final check to determine overall pass/fail status
-        for key, value in results.items():
-            if isinstance(value, (int, float)) and value > 0:
-                passed = False
+@rule('bank_tx_negative_or_empty_amounts', 'bank_tx', BLOCKING)
+def _bank_tx_negative_or_empty_amounts(context):
+    amount = context.frames['bank_tx']['amount'].to_numpy(dtype='float64')
+    return int((np.isnan(amount) | (amount < 0)).sum())
+
+
+@rule('bank_tx_missing_dates', 'bank_tx')
+def _bank_tx_missing_dates(context):
+    return int(context.frames['bank_tx']['date'].diff().dt.days.gt(1).sum())
+
+
+@rule('category_coverage_low', 'bank_tx')
+def _category_coverage_low(context):
+    bank_tx_df = context.frames['bank_tx']
+    return category_coverage_low(int(bank_tx_df['category'].isnull().sum()), len(bank_tx_df))
+
+
+@rule('balance_continuity_errors', 'bank_tx')
+def _balance_continuity_errors(context):
+    daily_net_change, closing_balance = context.daily_summary()
+    return balance_continuity_errors(daily_net_change, closing_balance) if len(closing_balance) else 0
+
+
+@rule('bank_tx_duplicate_rows', 'bank_tx')
+def _bank_tx_duplicate_rows(context):
+    # One 64-bit hash per row instead of DataFrame.duplicated's per-column factorizing;
+    # the streaming path counts duplicates from the same hashes
+    hashes = pd.util.hash_pandas_object(context.frames['bank_tx'], index=False).to_numpy()
+    return int(len(hashes) - len(pd.unique(hashes)))
+
+
+def balance_continuity_errors(daily_net_change, closing_balance):
+    """Counts days whose closing balance is not yesterday's close plus today's net change."""
+    # Get the previous day's closing balance
+    previous_closing_balance = closing_balance.shift(1)
+
+    # The expected balance for today is yesterday's close + today's net change
+    expected_today_balance = previous_closing_balance + daily_net_change
+
+    # Compare the actual closing balance to the expected, allowing for a small tolerance
+    balance_errors = ~np.isclose(closing_balance[1:], expected_today_balance[1:])
+    return int(balance_errors.sum())
+
+
+def category_coverage_low(missing_categories, total_transactions):
+    """Returns 1 when fewer than 95% of transactions carry a category."""
+    if total_transactions > 0:
+        category_coverage_percent = ( (total_transactions - missing_categories) / total_transactions ) * 100
+        # Fail if coverage is less than 95%
+        return 1 if category_coverage_percent < 95 else 0
+    return 0
+
+
+def validate_data(frames, fail_fast=None, aggregates=None, precomputed=None, daily_summary='bank_tx_kernel'):
+    """
+    Performs data quality checks on the frame bundle from load_business_data: runs every
+    registered rule whose table is present in `frames`.
+
+    fail_fast (default: FAIL_FAST) stops at the first failing blocking rule. Aggregates
+    built along the way are left in `aggregates` if a dict is passed, for the caller to
+    reuse; daily_summary names the one ('bank_tx_kernel' or 'daily_aggregate') the balance
+    checks read, so it is the one the caller needs next. `precomputed` maps rule names to
+    counts already taken elsewhere (the streaming path), which are used instead of running
+    those rules.
+
+    Returns {"passed", "checks", "rules"}, plus "warnings", "skipped" and "error" when
+    there are any. "rules" holds each rule's severity, outcome ('pass', 'fail', 'warn',
+    'error' or 'skipped'), count and seconds taken.
+    """
+    if fail_fast is None:
+        fail_fast = FAIL_FAST
+    context = ValidationContext(frames, aggregates, daily_summary)
+    precomputed = precomputed or {}
+    bank_tx_df = frames.get('bank_tx')
+    rows = len(bank_tx_df) if bank_tx_df is not None else None
+    checks, warnings, report, errors, skipped = {}, {}, {}, {}, []
+    stopped = False
+
+    for spec in RULES:
+        name, severity = spec['name'], spec['severity']
+        if name not in precomputed and frames.get(spec['table']) is None:
+            continue
+        if stopped:
+            skipped.append(name)
+            report[name] = {'severity': severity, 'outcome': 'skipped', 'value': None, 'seconds': 0.0}
+            continue
+
+        start = time.perf_counter()
+        try:
+            if name in precomputed:
+                value = precomputed[name]
+            else:
+                with metrics.stage(f'validate:{name}', rows=rows):
+                    value = spec['check'](context)
+        except Exception as e:
+            value = None
+            errors[name] = str(e)
+        seconds = time.perf_counter() - start
+
+        if value is None:
+            outcome = 'error'
+        elif value > 0:
+            outcome = 'warn' if severity == WARNING else 'fail'
+        else:
+            outcome = 'pass'
+        report[name] = {'severity': severity, 'outcome': outcome, 'value': value, 'seconds': seconds}
+        if value is not None:
+            (warnings if severity == WARNING else checks)[name] = value
+        if fail_fast and severity == BLOCKING and outcome in ('fail', 'error'):
+            stopped = True
 
-        return {"passed": passed, "checks": results}
+    passed = not errors and not any(value > 0 for value in checks.values())
+    result = {"passed": passed, "checks": checks, "rules": report}
+    if warnings:
+        result["warnings"] = warnings
+    if skipped:
+        result["skipped"] = skipped
+    if errors:
+        result["error"] = "; ".join(f"{name}: {message}" for name, message in errors.items())
+    return result
 
-    except Exception as e:
-        return {"passed": False, "error": str(e)}
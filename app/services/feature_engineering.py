@@ -1,88 +1,274 @@
 import pandas as pd
 import numpy as np
 
-def compute_features(bank_tx_df, pnl_monthly_df, vendors_df=None):
-    """Computes financial features from the input dataframes."""
+def _codes(series):
+    """Integer codes and categories for a column, encoding it once if it isn't categorical already."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    return series.cat.codes.to_numpy(), list(series.cat.categories)
+
+
+def _code_of(categories, value):
+    return categories.index(value) if value in categories else -2
+
+
+def bank_tx_kernel(bank_tx_df):
+    """
+    Computes every bank_tx aggregate the features need in a fixed number of vectorized passes
+    over integer-coded columns. The input frame is never modified.
+
+    Returns a dict of plain arrays / scalars: per-category direction totals, the daily closing
+    balance and net-flow series, weekly net cash flow, vendor-payment tallies and
+    per-counterparty outflow totals.
+    """
+    n = len(bank_tx_df)
+    amount = bank_tx_df['amount'].to_numpy(dtype='float64')
+    amount_filled = np.where(np.isnan(amount), 0.0, amount)
+
+    #  Pass 1: encode categoricals once; every later comparison is an integer compare
+    in_out_codes, in_out_categories = _codes(bank_tx_df['in_out'])
+    is_in = in_out_codes == _code_of(in_out_categories, 'in')
+    is_out = in_out_codes == _code_of(in_out_categories, 'out')
+    category_codes, categories = _codes(bank_tx_df['category'])
+
+    #  Pass 2: one bincount over (category, inflow?) gives every count and total by category
+    n_slots = (len(categories) + 1) * 2
+    slot = (category_codes.astype('int64') + 1) * 2 + is_in
+    slot_counts = np.bincount(slot, minlength=n_slots).reshape(-1, 2)
+    slot_amounts = np.bincount(slot, weights=amount_filled, minlength=n_slots).reshape(-1, 2)
+
+    def category_total(name, column):
+        idx = _code_of(categories, name) + 1
+        return column[idx] if idx >= 1 else 0
+
+    #  Pass 3: daily closing balance and net flow, then weekly net cash flow
+    dates = bank_tx_df['date'].to_numpy(dtype='datetime64[ns]')
+    day_codes, days = pd.factorize(dates, sort=True)
+    has_date = day_codes >= 0
+    signed = np.where(is_in, amount_filled, -amount_filled)
+    daily_balance = pd.Series(bank_tx_df['balance'].to_numpy(dtype='float64')[has_date]).groupby(day_codes[has_date]).last()
+    daily_balance = daily_balance.reindex(range(len(days))).to_numpy()
+    daily_net_flow = np.bincount(day_codes[has_date], weights=signed[has_date], minlength=len(days))
+
+    # Weeks end on Sunday, matching resample('W'); 1970-01-01 was a Thursday
+    day_numbers = pd.DatetimeIndex(days).to_numpy().astype('datetime64[D]').astype('int64')
+    week_numbers = (day_numbers + 3) // 7
+    if len(week_numbers):
+        weekly_net_flow = np.bincount(week_numbers - week_numbers[0], weights=daily_net_flow)
+        week_ends = (week_numbers[0] + np.arange(len(weekly_net_flow))) * 7 + 3
+        week_index = pd.DatetimeIndex(week_ends.astype('datetime64[D]'))
+    else:
+        weekly_net_flow = np.empty(0)
+        week_index = pd.DatetimeIndex([])
+
+    #  Pass 4: vendor payments with a due date, late if paid after it
+    due_dates = bank_tx_df['due_date'].to_numpy(dtype='datetime64[ns]')
+    vendor_payment = is_out & ~np.isnat(due_dates)
+    late_payments = int((vendor_payment & (dates > due_dates)).sum())
+
+    #  Pass 5: outflow totals per counterparty, over the integer IDs interned at ingest
+    outflow_rows = is_out
+    counterparty_codes, counterparties = _codes(bank_tx_df['counterparty'])
+    known = outflow_rows & (counterparty_codes >= 0)
+    counterparty_outflows = np.bincount(
+        counterparty_codes[known], weights=amount_filled[known], minlength=len(counterparties)
+    )
+
+    return {
+        'row_count': n,
+        'total_inflows': slot_amounts[:, 1].sum(),
+        'credit_inflows': category_total('credit', slot_amounts[:, 1]),
+        'nsf_count': int(category_total('nsf_fee', slot_counts.sum(axis=1))),
+        'returned_ach_count': int(category_total('returned_ach', slot_counts.sum(axis=1))),
+        'debt_service': category_total('loan_repayment', slot_amounts.sum(axis=1)),
+        'days': pd.DatetimeIndex(days),
+        'daily_balance': daily_balance,
+        'daily_net_flow': daily_net_flow,
+        'weekly_index': week_index,
+        'weekly_net_flow': weekly_net_flow,
+        'vendor_payments': int(vendor_payment.sum()),
+        'late_payments': late_payments,
+        'has_outflows': bool(outflow_rows.any()),
+        'counterparties': counterparties,
+        'counterparty_outflows': counterparty_outflows,
+    }
+
+
+def _first_positions(keys, values):
+    """Row of the first `keys` entry equal to each of `values`, -1 where there is none."""
+    keys = pd.Index(keys)
+    first = ~keys.duplicated()
+    rows = np.flatnonzero(first)
+    found = keys[first].get_indexer(values)
+    return np.where(found >= 0, rows[found], -1)
+
+
+def vendor_lookup(counterparties, vendors_df):
+    """
+    Joins counterparties against the vendor master (vendors.csv) once. A counterparty is a
+    vendor when it equals a vendor_id, or else a vendor name. Returns (is_critical,
+    category_codes, categories) aligned with counterparties; code -1 means no vendor category.
+    """
+    n = len(counterparties)
+    if vendors_df is None or vendors_df.empty or not n:
+        return np.zeros(n, dtype=bool), np.full(n, -1), []
+    counterparties = pd.Index(counterparties, dtype=object)
+    position = _first_positions(vendors_df['vendor_id'], counterparties)
+    position = np.where(position >= 0, position, _first_positions(vendors_df['name'], counterparties))
+    matched = position >= 0
+
+    is_critical = np.zeros(n, dtype=bool)
+    if 'is_critical' in vendors_df.columns:
+        is_critical[matched] = vendors_df['is_critical'].fillna(False).to_numpy(dtype=bool)[position[matched]]
+    category_codes, categories = np.full(n, -1), []
+    if 'category' in vendors_df.columns:
+        vendor_categories, categories = _codes(vendors_df['category'])
+        category_codes[matched] = vendor_categories[position[matched]]
+    return is_critical, category_codes, categories
+
+
+def vendor_exposure(counterparties, spending, vendors_df):
+    """
+    Shares of outflows (spending, per counterparty) going to critical vendors and to the
+    largest vendor category. Both are 0 without a vendor master.
+    """
+    spending = np.asarray(spending, dtype='float64')
+    total = spending.sum()
+    if total <= 0:
+        return {'critical_vendor_share': 0, 'top_vendor_category_share': 0}
+    is_critical, category_codes, categories = vendor_lookup(counterparties, vendors_df)
+    known = category_codes >= 0
+    by_category = np.bincount(category_codes[known], weights=spending[known], minlength=len(categories))
+    return {
+        'critical_vendor_share': spending[is_critical].sum() / total,
+        'top_vendor_category_share': by_category.max() / total if len(by_category) else 0,
+    }
+
+
+def chart_series(kernel):
+    """The daily closing balance and weekly net cash flow Series plotted on the credit memo."""
+    daily_balance = pd.Series(kernel['daily_balance'], index=kernel['days'])
+    weekly_cash_flow = pd.Series(kernel['weekly_net_flow'], index=kernel['weekly_index'])
+    return daily_balance, weekly_cash_flow
+
+
+def pnl_statistics(pnl_monthly_df):
+    """
+    The P&L side of the features, shared by every scoring path: the P&L-only features plus
+    the average daily operating expense and the NOCF total, which the liquidity and coverage
+    features divide by.
+    """
+    revenue = pnl_monthly_df['revenue']
+    nocf = revenue - pnl_monthly_df['cogs'] - pnl_monthly_df['operating_expense']
+    if len(pnl_monthly_df) >= 3:
+        revenue_trend = np.polyfit(range(len(revenue[-3:])), revenue[-3:], 1)
+        slope = revenue_trend[0]
+    else:
+        slope = 0
+    return {
+        'avg_daily_expenses': pnl_monthly_df['operating_expense'].mean() / 30,
+        'median_monthly_nocf': nocf.median(),
+        'nocf_sum': nocf.sum(),
+        'mom_revenue_variability': revenue.pct_change().std(),
+        '3_month_slope': slope,
+        'annualized_revenue': revenue.sum() * (12 / len(pnl_monthly_df)) if len(pnl_monthly_df) > 0 else 0,
+    }
+
+
+def _assemble_features(daily_balance, weekly_net_flow, totals, counterparties, spending, pnl_monthly_df, vendors_df):
+    """
+    The feature formulas, shared by compute_features (raw transactions) and
+    compute_window_features (the daily aggregate). daily_balance and weekly_net_flow are
+    arrays; totals holds the period's total_inflows, credit_inflows, nsf_count,
+    returned_ach_count, vendor_payments, late_payments and debt_service (as
+    bank_tx_kernel names them); spending is the outflow total of each counterparty.
+    """
+    pnl = pnl_statistics(pnl_monthly_df)
     features = {}
 
     #  Liquidity 
-    daily_balance = bank_tx_df.groupby('date')['balance'].last()
-    features['average_daily_balance'] = daily_balance.mean()
-    features['percent_of_days_below_zero'] = (daily_balance < 0).mean() * 100
-    avg_daily_expenses = pnl_monthly_df['operating_expense'].mean() / 30
+    daily_balance = np.asarray(daily_balance, dtype='float64')
+    features['average_daily_balance'] = np.nanmean(daily_balance) if np.any(~np.isnan(daily_balance)) else np.nan
+    features['percent_of_days_below_zero'] = (daily_balance < 0).mean() * 100 if len(daily_balance) else np.nan
+    avg_daily_expenses = pnl['avg_daily_expenses']
     features['days_cash_on_hand'] = features['average_daily_balance'] / avg_daily_expenses if avg_daily_expenses > 0 else 0
 
     #  Cash flow 
-    pnl_monthly_df['nocf'] = pnl_monthly_df['revenue'] - pnl_monthly_df['cogs'] - pnl_monthly_df['operating_expense']
-    features['median_monthly_nocf'] = pnl_monthly_df['nocf'].median()
-
-    bank_tx_df['signed_amount'] = np.where(bank_tx_df['in_out'] == 'in', bank_tx_df['amount'], -bank_tx_df['amount'])
-    weekly_cash_flow = bank_tx_df.set_index('date')['signed_amount'].resample('W').sum()
-    features['weekly_net_cashflow_variability'] = weekly_cash_flow.std() / weekly_cash_flow.mean() if weekly_cash_flow.mean() != 0 else 0
-
-    inflows_df = bank_tx_df[bank_tx_df['in_out'] == 'in']
-    total_inflows = inflows_df['amount'].sum()
-    credit_inflows = inflows_df[inflows_df['category'] == 'credit']['amount'].sum() 
-    features['draw_on_credit_ratio'] = credit_inflows / total_inflows if total_inflows > 0 else 0
-
-
-    #  Payment discipline (Updated Logic) 
-    # Counting NSF and ACH returns based on the 'category' column
-    features['nsf_count'] = int((bank_tx_df['category'] == 'nsf_fee').sum())
-    features['returned_ach_count'] = int((bank_tx_df['category'] == 'returned_ach').sum())
-    
-    # Calculate vendor late proxy from new date columns
-    # Filtering for outgoing payments that have a due date
-    vendor_payments = bank_tx_df[(bank_tx_df['in_out'] == 'out') & (bank_tx_df['due_date'].notna())].copy()
-    
-    if not vendor_payments.empty:
-        # Convert date columns to datetime objects for comparison
-        vendor_payments['payment_date'] = pd.to_datetime(vendor_payments['date'])
-        vendor_payments['due_date'] = pd.to_datetime(vendor_payments['due_date'])
-        
-        # A payment is late if it's made after the due date
-        late_payments = (vendor_payments['payment_date'] > vendor_payments['due_date']).sum()
-        total_payments = len(vendor_payments)
-        
-        # The proxy is the percentage of late payments
-        features['vendor_late_proxy'] = (late_payments / total_payments) * 100 if total_payments > 0 else 0
-    else:
-        features['vendor_late_proxy'] = 0
+    features['median_monthly_nocf'] = pnl['median_monthly_nocf']
+
+    weekly_cash_flow = np.asarray(weekly_net_flow, dtype='float64')
+    weekly_mean = weekly_cash_flow.mean() if len(weekly_cash_flow) else np.nan
+    weekly_std = weekly_cash_flow.std(ddof=1) if len(weekly_cash_flow) > 1 else np.nan
+    features['weekly_net_cashflow_variability'] = weekly_std / weekly_mean if weekly_mean != 0 else 0
+
+    total_inflows = totals['total_inflows']
+    features['draw_on_credit_ratio'] = totals['credit_inflows'] / total_inflows if total_inflows > 0 else 0
 
+    #  Payment discipline 
+    features['nsf_count'] = int(totals['nsf_count'])
+    features['returned_ach_count'] = int(totals['returned_ach_count'])
+    total_payments = totals['vendor_payments']
+    # The proxy is the percentage of outgoing payments made after their due date
+    features['vendor_late_proxy'] = (totals['late_payments'] / total_payments) * 100 if total_payments > 0 else 0
 
     #  Revenue stability 
-    features['mom_revenue_variability'] = pnl_monthly_df['revenue'].pct_change().std()
-    if len(pnl_monthly_df) >= 3:
-        revenue_trend = np.polyfit(range(len(pnl_monthly_df['revenue'][-3:])), pnl_monthly_df['revenue'][-3:], 1)
-        features['3_month_slope'] = revenue_trend[0]
-    else:
-        features['3_month_slope'] = 0
+    features['mom_revenue_variability'] = pnl['mom_revenue_variability']
+    features['3_month_slope'] = pnl['3_month_slope']
     features['seasonal_delta'] = 0  # Placeholder
 
     #  Concentration 
-    outgoing_transactions = bank_tx_df[bank_tx_df['in_out'] == 'out']
-    if not outgoing_transactions.empty:
-        vendor_spending = outgoing_transactions.groupby('counterparty')['amount'].sum()
-        total_spending = vendor_spending.sum()
-        features['top_vendor_share'] = vendor_spending.max() / total_spending if total_spending > 0 else 0
-        features['top_5_vendors_share'] = vendor_spending.nlargest(5).sum() / total_spending if total_spending > 0 else 0
+    vendor_spending = np.asarray(spending, dtype='float64')
+    total_spending = vendor_spending.sum()
+    if total_spending > 0:
+        top_5 = np.sort(vendor_spending)[-5:]
+        features['top_vendor_share'] = top_5[-1] / total_spending
+        features['top_5_vendors_share'] = top_5.sum() / total_spending
     else:
         features['top_vendor_share'] = 0
         features['top_5_vendors_share'] = 0
+    features.update(vendor_exposure(counterparties, vendor_spending, vendors_df))
 
-    #  Coverage (Updated Logic) 
-    # Calculate NOCF for the entire period from the P&L data
-    total_nocf = pnl_monthly_df['nocf'].sum()
-    
-    # Calculate Debt Service proxy from bank transaction data
-    # Sum of all outflows categorized as 'loan_repayment'
-    debt_service = bank_tx_df[bank_tx_df['category'] == 'loan_repayment']['amount'].sum()
-    
-    # DSCR Proxy = NOCF / Debt Service
-    features['dscr_proxy'] = total_nocf / debt_service if debt_service > 0 else 0
-    
-    # Calculate annualized revenue
-    features['annualized_revenue'] = pnl_monthly_df['revenue'].sum() * (12 / len(pnl_monthly_df))
+    #  Coverage 
+    # DSCR Proxy = NOCF over the period / debt service (outflows categorized as 'loan_repayment')
+    debt_service = totals['debt_service']
+    features['dscr_proxy'] = pnl['nocf_sum'] / debt_service if debt_service > 0 else 0
+    features['annualized_revenue'] = pnl['annualized_revenue']
 
     # Clean up NaNs and return
     return {k: 0 if pd.isna(v) else v for k, v in features.items()}
+
+
+def compute_features(frames, kernel=None):
+    """
+    Computes financial features from the frame bundle produced by load_business_data.
+    A bank_tx_kernel result already computed for the same frame can be passed in to reuse it.
+    """
+    if kernel is None:
+        kernel = bank_tx_kernel(frames['bank_tx'])
+    return _assemble_features(
+        kernel['daily_balance'], kernel['weekly_net_flow'], kernel, kernel['counterparties'],
+        kernel['counterparty_outflows'], frames['pnl_monthly'], frames.get('vendors')
+    )
+
+
+def compute_window_features(window):
+    """
+    Computes the same features as compute_features from a slice of the daily
+    aggregate (see daily_aggregate.slice_window), without touching raw transactions.
+    The vendor master, if any, is read from window['vendors'].
+    """
+    daily = window['daily']
+    vendor_spending = window['counterparty_outflows'].groupby('counterparty', observed=True)['amount'].sum()
+    totals = {
+        'total_inflows': daily['inflow_total'].sum(),
+        'credit_inflows': daily['inflow_credit'].sum(),
+        'nsf_count': daily['nsf_count'].sum(),
+        'returned_ach_count': daily['returned_ach_count'].sum(),
+        'vendor_payments': daily['due_payments'].sum(),
+        'late_payments': daily['late_payments'].sum(),
+        'debt_service': daily['debt_service'].sum(),
+    }
+    return _assemble_features(
+        daily['closing_balance'].to_numpy(dtype='float64'), daily['net_flow'].resample('W').sum().to_numpy(), totals,
+        vendor_spending.index, vendor_spending.to_numpy(), window['pnl_monthly'], window.get('vendors')
+    )
@@ -0,0 +1,182 @@
+import fcntl
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from app.services import business_store
+from app.services.daily_aggregate import WINDOW_MONTHS, build_daily_aggregate
+from app.services.data_validation import balance_continuity_errors
+from app.services.ingestion import BANK_TX_REQUIRED_COLUMNS
+from app.services.streaming import EMPTY_DAILY_COLUMNS
+
+# Per-day and per-counterparty aggregates of a business, kept in the business store as the
+# 'daily' dataset so new transactions (a daily bank feed) update its scores without the
+# history being uploaded or re-read. The dataset is seeded from the business's longest
+# stored upload and dropped whenever a new full upload is stored.
+#
+# Tables are appended in date order and never rewritten: an append that continues the last
+# stored day adds a second row for it, and rows of the same day are merged when read.
+# meta.json keeps the last day (its date, closing balance, net flow and the closing balance
+# of the day before), which is all the continuity checks on the next append need.
+DATASET = 'daily'
+DAILY_COLUMNS = EMPTY_DAILY_COLUMNS
+COUNTERPARTY_COLUMNS = ['date', 'counterparty', 'amount']
+
+
+class AppendRejectedError(ValueError):
+    """Raised for new transactions that cannot extend the stored days (e.g. dated before them)."""
+
+
+@contextmanager
+def locked(business_name):
+    """Serialises updates to one business's aggregates across worker processes."""
+    directory = business_store.STORE_DIR / business_name
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / '.daily.lock', 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _daily_rows(aggregate):
+    """The stored layout of build_daily_aggregate's 'daily': a date column plus DAILY_COLUMNS."""
+    daily = aggregate['daily'].reindex(columns=DAILY_COLUMNS, fill_value=0.0).astype('float64')
+    return daily.rename_axis('date').reset_index()
+
+
+def _last_day(daily_rows, net_flow, previous_closing_balance):
+    """meta.json's last_day for merged daily rows, whose first day closed after previous_closing_balance."""
+    if not len(daily_rows):
+        return None
+    closing_balance = daily_rows['closing_balance'].to_numpy()
+    return {
+        'date': daily_rows['date'].iloc[-1].strftime('%Y-%m-%d'),
+        'closing_balance': float(closing_balance[-1]),
+        'net_flow': float(net_flow[-1]),
+        'previous_closing_balance': float(closing_balance[-2] if len(closing_balance) > 1 else previous_closing_balance),
+    }
+
+
+def seed(business_name):
+    """Builds the daily dataset from the business's stored history, or its longest stored window. Returns its meta."""
+    datasets = business_store.list_datasets(business_name)
+    windows = [w for w in WINDOW_MONTHS if w in datasets]
+    if 'history' in datasets:
+        source = 'history'
+        windows = business_store.read_meta(business_name, 'history').get('windows', windows)
+    elif windows:
+        source = max(windows, key=WINDOW_MONTHS.get)
+    else:
+        raise LookupError(f"No stored data for {business_name}")
+
+    frames = business_store.load_frames(business_name, source, BANK_TX_REQUIRED_COLUMNS)
+    aggregate = build_daily_aggregate(frames['bank_tx'])
+    daily = _daily_rows(aggregate)
+    business_store.store_frames(business_name, DATASET, {
+        'daily': daily,
+        'counterparty_outflows': aggregate['counterparty_outflows'][COUNTERPARTY_COLUMNS],
+        'pnl_monthly': frames['pnl_monthly'],
+        'vendors': frames['vendors'],
+    }, source=source, windows=windows, last_day=_last_day(daily, daily['net_flow'].to_numpy(), np.nan))
+    return business_store.read_meta(business_name, DATASET)
+
+
+def load_meta(business_name):
+    """The daily dataset's meta, seeding the dataset first if the business has none."""
+    if DATASET in business_store.list_datasets(business_name):
+        return business_store.read_meta(business_name, DATASET)
+    return seed(business_name)
+
+
+def prepare_append(meta, bank_tx_df):
+    """
+    Aggregates new transactions and checks them against the last stored day. Returns
+    {'daily', 'counterparty_outflows', 'checks', 'last_day'}; checks holds the date-gap and
+    balance-continuity counts across the whole feed, boundary included, keyed like the
+    validate_data rules they stand in for.
+    """
+    aggregate = build_daily_aggregate(bank_tx_df)
+    daily = _daily_rows(aggregate)
+    if daily.empty:
+        raise AppendRejectedError("No dated transactions to append")
+
+    net_flow = daily['net_flow'].to_numpy(copy=True)
+    closing_balance = daily['closing_balance'].to_numpy()
+    dates = bank_tx_df['date']
+    gaps = int(dates.diff().dt.days.gt(1).sum())
+    previous_closing_balance = np.nan
+    last_day = meta.get('last_day')
+    if last_day is not None:
+        last_date = pd.Timestamp(last_day['date'])
+        first_date = daily['date'].iloc[0]
+        if first_date < last_date:
+            raise AppendRejectedError(
+                f"New transactions start on {first_date:%Y-%m-%d}, before the last stored day {last_date:%Y-%m-%d}"
+            )
+        if first_date == last_date:
+            # The stored day continues: its net change includes what was already stored
+            net_flow[0] += last_day['net_flow']
+            previous_closing_balance = last_day['previous_closing_balance']
+        else:
+            previous_closing_balance = last_day['closing_balance']
+        if pd.notna(dates.iloc[0]) and (dates.iloc[0] - last_date).days > 1:
+            gaps += 1
+
+    if np.isnan(previous_closing_balance):
+        continuity_errors = balance_continuity_errors(pd.Series(net_flow), pd.Series(closing_balance))
+    else:
+        continuity_errors = balance_continuity_errors(
+            pd.Series(np.concatenate([[0.0], net_flow])),
+            pd.Series(np.concatenate([[previous_closing_balance], closing_balance]))
+        )
+
+    return {
+        'daily': daily,
+        'counterparty_outflows': aggregate['counterparty_outflows'][COUNTERPARTY_COLUMNS],
+        'checks': {'bank_tx_missing_dates': gaps, 'balance_continuity_errors': continuity_errors},
+        'last_day': _last_day(daily, net_flow, previous_closing_balance),
+    }
+
+
+def apply_append(business_name, prepared, pnl_monthly_df=None):
+    """
+    Appends prepared rows to the stored aggregates in place. Uploaded P&L months replace the
+    stored months with the same label. Returns the updated meta.
+    """
+    meta = business_store.append_rows(business_name, DATASET, {
+        'daily': prepared['daily'], 'counterparty_outflows': prepared['counterparty_outflows'],
+    }, last_day=prepared['last_day'])
+    if pnl_monthly_df is not None:
+        stored = business_store.load_table(business_name, DATASET, 'pnl_monthly')
+        pnl = pd.concat([stored[~stored['month'].isin(pnl_monthly_df['month'])], pnl_monthly_df], ignore_index=True)
+        meta = business_store.replace_table(
+            business_name, DATASET, 'pnl_monthly', pnl.sort_values('month', kind='stable').reset_index(drop=True)
+        )
+    return meta
+
+
+def load_vendors(business_name, meta):
+    """The vendor master stored with the daily dataset, or None."""
+    if 'vendors' not in meta['tables']:
+        return None
+    return business_store.load_table(business_name, DATASET, 'vendors')
+
+
+def load_window_aggregate(business_name, meta, months):
+    """
+    The stored aggregates for the trailing `months` up to the last stored day, same-day rows
+    merged, in build_daily_aggregate's layout. Only rows inside the window are read. Returns
+    (aggregate, pnl_monthly_df, last day).
+    """
+    end_date = pd.Timestamp(meta['last_day']['date'])
+    start_date = end_date - pd.DateOffset(months=months)
+    daily = business_store.load_table(business_name, DATASET, 'daily', after=start_date)
+    how = {col: 'last' if col == 'closing_balance' else 'sum' for col in DAILY_COLUMNS}
+    aggregate = {
+        'daily': daily.groupby('date', sort=True).agg(how),
+        'counterparty_outflows': business_store.load_table(business_name, DATASET, 'counterparty_outflows', after=start_date),
+    }
+    return aggregate, business_store.load_table(business_name, DATASET, 'pnl_monthly'), end_date
@@ -0,0 +1,78 @@
+# pandas is imported by the readers: the server process loads this module only for the
+# required columns it checks upload headers against.
+
+#  Explicit dtypes so every file is parsed exactly once, into a fixed layout
+BANK_TX_DTYPES = {
+    'amount': 'float64',
+    'balance': 'float64',
+    'category': 'category',
+    'in_out': 'category',
+    # Interned: every payee string is parsed once into the categories and rows hold integer codes
+    'counterparty': 'category',
+}
+BANK_TX_DATE_COLUMNS = ['date', 'invoice_date', 'due_date']
+BANK_TX_REQUIRED_COLUMNS = ['date', 'amount', 'balance', 'category', 'in_out', 'counterparty', 'due_date']
+
+PNL_MONTHLY_DTYPES = {
+    'month': 'object',
+    'revenue': 'float64',
+    'cogs': 'float64',
+    'operating_expense': 'float64',
+    'other_income_expense': 'float64',
+}
+PNL_MONTHLY_REQUIRED_COLUMNS = ['month', 'revenue', 'cogs', 'operating_expense']
+
+VENDORS_DTYPES = {
+    'vendor_id': 'object',
+    'name': 'object',
+    'category': 'category',
+    'is_critical': 'boolean',
+}
+VENDORS_REQUIRED_COLUMNS = ['vendor_id', 'name']
+
+
+def _parse_dates(df, columns):
+    """Converts the date columns present in the frame to datetime64 in place."""
+    import pandas as pd
+    for col in columns:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+    return df
+
+
+def read_bank_tx(source):
+    """Parses a bank_tx CSV (path or file-like object) into a typed DataFrame."""
+    import pandas as pd
+    df = pd.read_csv(source, dtype=BANK_TX_DTYPES)
+    return _parse_dates(df, BANK_TX_DATE_COLUMNS)
+
+
+def read_pnl_monthly(source):
+    """Parses a pnl_monthly CSV (path or file-like object) into a typed DataFrame."""
+    import pandas as pd
+    return pd.read_csv(source, dtype=PNL_MONTHLY_DTYPES)
+
+
+def read_vendors(source):
+    """Parses a vendors CSV (path or file-like object) into a typed DataFrame."""
+    import pandas as pd
+    return pd.read_csv(source, dtype=VENDORS_DTYPES)
+
+
+def load_business_data(bank_tx_source, pnl_monthly_source, vendors_source=None):
+    """
+    Parses the uploaded files once and returns the frame bundle shared by
+    validate_data and compute_features.
+    """
+    return {
+        'bank_tx': read_bank_tx(bank_tx_source),
+        'pnl_monthly': read_pnl_monthly(pnl_monthly_source),
+        'vendors': read_vendors(vendors_source) if vendors_source is not None else None,
+    }
+
+
+def iter_bank_tx_chunks(source, chunksize):
+    """Yields typed bank_tx DataFrames of at most `chunksize` rows, for out-of-core processing."""
+    import pandas as pd
+    for chunk in pd.read_csv(source, dtype=BANK_TX_DTYPES, chunksize=chunksize):
+        yield _parse_dates(chunk, BANK_TX_DATE_COLUMNS)
@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import pickle
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from pathlib import Path
+
+from app.services.charts import ChartRenderer
+from app.services.memo_renderer import SPEC_SUFFIX
+from app.services.pdf_generator import render_credit_memo
+
+# Memos rendered per task; large enough to amortise the task round trip, small enough that
+# the chunks in flight (two per worker) keep memory flat however long the batch is
+DEFAULT_CHUNK_SIZE = 32
+
+_renderer = None
+
+
+def worker_renderer():
+    """
+    The calling process's long-lived ChartRenderer, so every memo a worker renders reuses
+    the same styled figures. Worker processes are single-threaded; threads must not share it.
+    """
+    global _renderer
+    if _renderer is None:
+        _renderer = ChartRenderer()
+    return _renderer
+
+
+def memo_filename(spec):
+    return f"Credit_Memo_{spec['business_name']}_{spec['window']}.pdf"
+
+
+def _load_spec(spec):
+    """Accepts a spec dict or the path of a spec saved by memo_renderer.save_memo_spec."""
+    if isinstance(spec, dict):
+        return spec, memo_filename(spec)
+    with open(spec, "rb") as f:
+        loaded = pickle.load(f)
+    name = Path(spec).name
+    return loaded, name[:-len(SPEC_SUFFIX)] if name.endswith(SPEC_SUFFIX) else memo_filename(loaded)
+
+
+def render_chunk(specs, output_dir=None):
+    """
+    Renders a chunk of memos in one worker. With output_dir each PDF is written there and
+    (filename, None) is returned; otherwise (filename, pdf_bytes) comes back to the caller.
+    """
+    renderer = worker_renderer()
+    rendered = []
+    for spec in specs:
+        spec, filename = _load_spec(spec)
+        memo = render_credit_memo(
+            spec["business_name"], spec["window"], spec["scorecard"], spec["features"],
+            spec["daily_balance"], spec["weekly_cash_flow"], renderer, spec.get("score_history"),
+            spec.get("covered_from")
+        )
+        if output_dir is None:
+            rendered.append((filename, memo))
+            continue
+        pdf_path = Path(output_dir) / filename
+        tmp_path = pdf_path.with_name(f"{filename}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(memo)
+        os.replace(tmp_path, pdf_path)
+        rendered.append((filename, None))
+    return rendered
+
+
+def render_memos(specs, output, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Renders many memos across worker processes into a directory (one PDF each) or, when
+    output ends in .zip, into a single archive written by this process.
+
+    specs is an iterable of spec dicts or spec file paths and is consumed lazily. progress,
+    if given, is called as progress(memos_done, seconds_elapsed) after every chunk.
+    Returns {'memos', 'seconds', 'memos_per_sec'}.
+    """
+    workers = workers or os.cpu_count() or 1
+    to_archive = str(output).endswith(".zip")
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    if not to_archive:
+        Path(output).mkdir(exist_ok=True)
+    output_dir = None if to_archive else str(output)
+
+    spec_iter = iter(specs)
+    start = time.perf_counter()
+    done = 0
+    # PDFs are already deflated, so the archive just stores them
+    archive = zipfile.ZipFile(output, "w", zipfile.ZIP_STORED) if to_archive else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            pending = set()
+
+            def refill():
+                while len(pending) < workers * 2:
+                    chunk = list(islice(spec_iter, chunk_size))
+                    if not chunk:
+                        return
+                    pending.add(pool.submit(render_chunk, chunk, output_dir))
+
+            refill()
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    for filename, memo in future.result():
+                        if archive is not None:
+                            archive.writestr(filename, memo)
+                        done += 1
+                if progress is not None:
+                    progress(done, time.perf_counter() - start)
+                refill()
+    finally:
+        if archive is not None:
+            archive.close()
+
+    seconds = time.perf_counter() - start
+    return {"memos": done, "seconds": seconds, "memos_per_sec": done / seconds if seconds > 0 else 0.0}
@@ -0,0 +1,107 @@
+import os
+import pickle
+import threading
+from pathlib import Path
+
+from app.services import metrics, workers
+
+# Memos are rendered off the scoring path: the scoring task saves a small spec next to where
+# the PDF will live, and the PDF is rendered from it on first download or by a background
+# pre-render when the pool has idle workers.
+SPEC_SUFFIX = ".memo.pkl"
+PRERENDER = os.environ.get("SCORING_PRERENDER_MEMOS", "1") != "0"
+
+_lock = threading.Lock()
+_rendering = {}
+
+
+def spec_path(pdf_path):
+    return Path(str(pdf_path) + SPEC_SUFFIX)
+
+
+def save_memo_spec(pdf_path, business_name, window, scorecard, features, daily_balance, weekly_cash_flow,
+                   score_history=None, covered_from=None):
+    """
+    Stores everything needed to render a memo later. Any previously rendered PDF is dropped.
+    covered_from is the first transaction day of a window the history only partly covers.
+    """
+    spec = {
+        "business_name": business_name,
+        "window": window,
+        "scorecard": scorecard,
+        "features": features,
+        "daily_balance": daily_balance,
+        "weekly_cash_flow": weekly_cash_flow,
+        "score_history": score_history,
+        "covered_from": covered_from,
+    }
+    path = spec_path(pdf_path)
+    tmp_path = Path(f"{path}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        pickle.dump(spec, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    try:
+        os.remove(pdf_path)
+    except FileNotFoundError:
+        pass
+
+
+def render_memo(pdf_path):
+    """Renders the PDF for a saved spec. Runs in a worker process; the PDF appears atomically."""
+    # Imported here so scoring-only workers never load matplotlib/fpdf
+    from app.services.memo_batch import worker_renderer
+    from app.services.pdf_generator import create_credit_memo
+
+    with open(spec_path(pdf_path), "rb") as f:
+        spec = pickle.load(f)
+    tmp_path = f"{pdf_path}.{os.getpid()}.tmp"
+    with metrics.stage('render_memo', spec["window"]):
+        create_credit_memo(
+            spec["business_name"], spec["window"], spec["scorecard"], spec["features"], tmp_path,
+            daily_balance=spec["daily_balance"], weekly_cash_flow=spec["weekly_cash_flow"],
+            chart_renderer=worker_renderer(), score_history=spec.get("score_history"),
+            covered_from=spec.get("covered_from")
+        )
+    os.replace(tmp_path, pdf_path)
+    return str(pdf_path)
+
+
+def ensure_memo(pdf_path, on_rendered=None):
+    """
+    Returns None when the PDF already exists, otherwise a future that renders it on the
+    scoring pool. Concurrent callers for the same memo share one render; on_rendered is
+    attached only to a newly started render. Raises FileNotFoundError when there is no
+    spec to render from, and workers.QueueFullError when the pool is saturated.
+    """
+    pdf_path = str(pdf_path)
+    with _lock:
+        future = _rendering.get(pdf_path)
+        if future is not None:
+            return future
+        if os.path.exists(pdf_path):
+            return None
+        if not spec_path(pdf_path).exists():
+            raise FileNotFoundError(pdf_path)
+        future = workers.submit(render_memo, pdf_path)
+        _rendering[pdf_path] = future
+
+    future.add_done_callback(lambda f: _render_done(pdf_path))
+    if on_rendered is not None:
+        future.add_done_callback(on_rendered)
+    return future
+
+
+def _render_done(pdf_path):
+    with _lock:
+        _rendering.pop(pdf_path, None)
+
+
+def prerender(pdf_paths, on_rendered=None):
+    """Starts background renders for memos not yet rendered, only while the pool has idle workers."""
+    for pdf_path in pdf_paths:
+        if workers.outstanding_tasks() >= workers.MAX_WORKERS:
+            return
+        try:
+            ensure_memo(pdf_path, on_rendered)
+        except (FileNotFoundError, workers.QueueFullError):
+            continue
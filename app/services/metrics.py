@@ -0,0 +1,255 @@
+import bisect
+import os
+import resource
+import threading
+import time
+from collections import defaultdict
+
+# Per-stage latency and resource metrics, exposed in Prometheus text format by GET /metrics.
+#
+# Pipeline code wraps each stage in `with stage(name, window=...)`. A stage records its wall
+# time, CPU time and peak RSS into histograms. Stages run in the pool's worker processes:
+# their observations are buffered there and shipped to the server process once per task
+# (see init_worker / run_task), where collect_from drains them into this registry.
+ENABLED = os.environ.get("SCORING_METRICS", "1") != "0"
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+MEMORY_BUCKETS = tuple(2 ** i * 1024 * 1024 for i in range(5, 15))  # 32 MiB .. 16 GiB
+
+# Row counts and upload sizes are labels, so they are reported as size classes (the smallest
+# bound at or above the value) to keep the number of series bounded
+ROW_CLASSES = ((1_000, '1k'), (10_000, '10k'), (100_000, '100k'), (1_000_000, '1M'), (10_000_000, '10M'))
+BYTE_CLASSES = ((64 * 1024, '64KiB'), (1024 ** 2, '1MiB'), (16 * 1024 ** 2, '16MiB'),
+                (256 * 1024 ** 2, '256MiB'), (4 * 1024 ** 3, '4GiB'))
+
+STAGE_LABELS = ('stage', 'window', 'rows', 'upload_bytes')
+
+_lock = threading.Lock()
+# (metric name, label values) -> [bucket counts..., +Inf count, sum]
+_histograms = {}
+_help = {}
+_gauges = {}
+
+_local = threading.local()
+_sink = None        # worker processes: queue the server drains
+_pending = []       # worker processes: observations not yet shipped
+_track_peak = False
+
+
+def size_class(value, classes):
+    """Label value for a row count or byte size: its size class, '+Inf' beyond the last, '' if unknown."""
+    if value is None:
+        return ''
+    for bound, label in classes:
+        if value <= bound:
+            return label
+    return '+Inf'
+
+
+#  Registry
+def _buckets_for(name):
+    return MEMORY_BUCKETS if name.endswith('_bytes') else DURATION_BUCKETS
+
+
+def observe(name, value, labels):
+    """Adds one observation to histogram `name`. labels is a tuple of (label, value) pairs."""
+    buckets = _buckets_for(name)
+    with _lock:
+        series = _histograms.get((name, labels))
+        if series is None:
+            series = _histograms[(name, labels)] = [0] * (len(buckets) + 2)
+        series[bisect.bisect_left(buckets, value)] += 1
+        series[-1] += value
+
+
+def _record(name, value, labels):
+    if _sink is not None:
+        _pending.append((name, value, labels))
+    else:
+        observe(name, value, labels)
+
+
+def describe(name, text):
+    _help[name] = text
+
+
+def set_gauge(name, fn, text):
+    """Registers a gauge whose value is read from fn() at scrape time."""
+    _gauges[name] = fn
+    _help[name] = text
+
+
+describe('scoring_stage_wall_seconds', 'Wall-clock time per pipeline stage.')
+describe('scoring_stage_cpu_seconds', 'CPU time (user + system) per pipeline stage.')
+describe('scoring_stage_peak_rss_bytes', 'Peak resident memory of the worker process during a stage.')
+describe('scoring_request_duration_seconds', 'HTTP request latency, measured in the server process.')
+
+
+#  Peak memory: Linux can reset a process's RSS high-water mark, so each stage sees its own peak
+def _read_peak_rss():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class stage:
+    """
+    Context manager timing one pipeline stage. rows / upload_bytes may be set on the
+    instance inside the block once they are known (e.g. after parsing).
+    Peak memory is only tracked in pool workers, which are single-threaded.
+    """
+    __slots__ = ('name', 'window', 'rows', 'upload_bytes', '_wall', '_cpu', '_peak')
+
+    def __init__(self, name, window='', rows=None, upload_bytes=None):
+        self.name = name
+        self.window = window
+        self.rows = rows
+        self.upload_bytes = upload_bytes
+
+    def __enter__(self):
+        if not ENABLED:
+            return self
+        if _track_peak:
+            stack = _stack()
+            if stack:
+                # The enclosing stage keeps the peak reached so far; this one starts afresh
+                stack[-1]._peak = max(stack[-1]._peak, _read_peak_rss())
+            _reset_peak_rss()
+            self._peak = 0
+            stack.append(self)
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not ENABLED:
+            return False
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        labels = tuple(zip(STAGE_LABELS, (
+            self.name, self.window, size_class(self.rows, ROW_CLASSES), size_class(self.upload_bytes, BYTE_CLASSES)
+        )))
+        _record('scoring_stage_wall_seconds', wall, labels)
+        _record('scoring_stage_cpu_seconds', cpu, labels)
+        if _track_peak:
+            stack = _stack()
+            stack.pop()
+            peak = max(self._peak, _read_peak_rss())
+            if stack:
+                stack[-1]._peak = max(stack[-1]._peak, peak)
+            _record('scoring_stage_peak_rss_bytes', peak, labels)
+        return False
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def source_bytes(*sources):
+    """Total size of upload sources: in-memory bytes or file paths (None is skipped)."""
+    total = 0
+    for source in sources:
+        if isinstance(source, (bytes, bytearray)):
+            total += len(source)
+        elif source is not None:
+            try:
+                total += os.path.getsize(source)
+            except (OSError, TypeError):
+                pass
+    return total
+
+
+#  Worker side: observations are shipped to the server once per task
+def init_worker(sink):
+    """Pool initializer: route this process's observations to the server's queue."""
+    global _sink, _track_peak
+    _sink = sink
+    _track_peak = ENABLED
+
+
+def run_task(fn, *args):
+    """Runs a pool task and ships the observations it made."""
+    try:
+        return fn(*args)
+    finally:
+        if _pending:
+            batch = list(_pending)
+            _pending.clear()
+            _sink.put(batch)
+
+
+#  Server side
+def collect_from(sink):
+    """Starts a daemon thread feeding worker observations from `sink` into the registry until None arrives."""
+    def drain():
+        while True:
+            batch = sink.get()
+            if batch is None:
+                return
+            for name, value, labels in batch:
+                observe(name, value, labels)
+
+    thread = threading.Thread(target=drain, name='metrics-collector', daemon=True)
+    thread.start()
+    return thread
+
+
+def _format_labels(labels, extra=()):
+    pairs = [f'{k}="{str(v)}"' for k, v in tuple(labels) + tuple(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """The registry in Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        histograms = {key: list(series) for key, series in _histograms.items()}
+
+    by_name = defaultdict(list)
+    for (name, labels), series in sorted(histograms.items()):
+        by_name[name].append((labels, series))
+
+    lines = []
+    for name, entries in by_name.items():
+        lines.append(f'# HELP {name} {_help.get(name, name)}')
+        lines.append(f'# TYPE {name} histogram')
+        buckets = _buckets_for(name)
+        for labels, series in entries:
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(series[-1])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+
+    for name, fn in _gauges.items():
+        lines.append(f'# HELP {name} {_help.get(name, name)}')
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {_format_value(fn())}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Drops every recorded observation (gauges stay registered)."""
+    with _lock:
+        _histograms.clear()
@@ -1,62 +1,99 @@
 from fpdf import FPDF
-import matplotlib.pyplot as plt
-from matplotlib.ticker import FuncFormatter
 from datetime import datetime
-import os
-import pandas as pd
+import tempfile
 
-def create_credit_memo(business_name, window, scorecard, features, output_path, bank_df):
-    """Generates a one-page Credit Memo PDF with data, flags, and informative charts."""
+from app.services import metrics
+from app.services.charts import ChartRenderer
+from app.services.feature_engineering import bank_tx_kernel, chart_series
+
+class MemoPDF(FPDF):
+    """FPDF that can place PNG images held in memory."""
+
+    def png_image(self, png, x=None, y=None, w=0, h=0):
+        # FPDF 1.7 only reads images from files, and parses one completely inside image(), so
+        # each chart goes through a private temporary file that is removed straight after
+        with tempfile.NamedTemporaryFile(prefix='memo-chart-', suffix='.png') as f:
+            f.write(png)
+            f.flush()
+            self.image(f.name, x=x, y=y, w=w, h=h, type='png')
+
+#  Static memo content, built once per process rather than per memo 
+# Pass/Watch thresholds; metrics without a rule always pass
+FLAG_RULES = {
+    "Days Cash on Hand": lambda value: value >= 15,
+    "Median Monthly NOCF": lambda value: value > 0,
+    "Weekly NCF Variability": lambda value: value < 0.3,
+    "NSF Count": lambda value: value < 2,
+    "Returned ACH Count": lambda value: value == 0,
+    "Vendor Late Proxy (%)": lambda value: value < 35,
+    "DSCR Proxy": lambda value: value >= 1.25,
+    "Draw on Credit Ratio (%)": lambda value: value < 20,
+    "Top Vendor Share (%)": lambda value: value < 35,
+    "% of Days Below Zero": lambda value: value == 0
+}
+
+POLICY_NOTE = "Policy Note: This is an automated credit assessment based on provided cashflow data."
+
+
+def get_flag(metric, value):
+    rule = FLAG_RULES.get(metric)
+    return '(Pass)' if rule is None or rule(value) else '(Watch)'
+
+
+def create_credit_memo(business_name, window, scorecard, features, output_path, bank_df=None,
+                       daily_balance=None, weekly_cash_flow=None, chart_renderer=None, score_history=None,
+                       covered_from=None):
+    """
+    Generates a one-page Credit Memo PDF with data, flags, and informative charts.
+    The chart series are normally the precomputed daily_balance / weekly_cash_flow
+    (see feature_engineering.chart_series); they are derived from bank_df only if missing.
+    A score_history Series (see rolling_history.rolling_scores) adds a third chart.
+    covered_from ('YYYY-MM-DD') marks a window the history only partly covers.
+    """
+    if daily_balance is None or weekly_cash_flow is None:
+        daily_balance, weekly_cash_flow = chart_series(bank_tx_kernel(bank_df))
+    memo = render_credit_memo(business_name, window, scorecard, features, daily_balance, weekly_cash_flow,
+                              chart_renderer, score_history, covered_from)
+    with open(output_path, 'wb') as f:
+        f.write(memo)
+
+
+def render_credit_memo(business_name, window, scorecard, features, daily_balance, weekly_cash_flow, chart_renderer=None,
+                       score_history=None, covered_from=None):
+    """
+    Renders the memo and returns the PDF bytes. Batch renders pass a long-lived
+    ChartRenderer so the chart figures are laid out once, not once per memo.
+    """
+    if chart_renderer is None:
+        chart_renderer = ChartRenderer()
     
-    charts_dir = "uploads/charts"
-    os.makedirs(charts_dir, exist_ok=True)
-
-    #  Chart Generation 
-    def millions_formatter(x, pos):
-        return f'{x / 1e6:.1f}M'
-
-    # Daily Balance Chart
-    plt.figure(figsize=(5, 3))
-    daily_balance = bank_df.groupby('date')['balance'].last()
-    plt.plot(daily_balance.index, daily_balance.values, color='#4285F4', linewidth=2)
-    plt.title("Daily Balance", fontsize=12, weight='bold')
-    plt.ylabel("Balance (USD)", fontsize=10)
-    ax = plt.gca()
-    ax.yaxis.set_major_formatter(FuncFormatter(millions_formatter))
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.xticks(rotation=30, ha='right')
-    plt.tight_layout()
-    balance_chart_path = os.path.join(charts_dir, f"balance_{business_name}_{window}.png")
-    plt.savefig(balance_chart_path, bbox_inches='tight', pad_inches=0.1)
-    plt.close()
-
-    # Weekly Net Cash Flow Chart
-    plt.figure(figsize=(5, 3))
-    weekly_cash_flow = bank_df.set_index('date').resample('W').apply(lambda x: x[x['in_out'] == 'in']['amount'].sum() - x[x['in_out'] == 'out']['amount'].sum())
-    colors = ['#34A853' if val >= 0 else '#EA4335' for val in weekly_cash_flow.values]
-    plt.bar(weekly_cash_flow.index, weekly_cash_flow.values, width=5, color=colors)
-    plt.title("Weekly Net Cash Flow", fontsize=12, weight='bold')
-    plt.ylabel("Net Flow (USD)", fontsize=10)
-    plt.axhline(0, color='grey', linewidth=0.8)
-    ax = plt.gca()
-    ax.yaxis.set_major_formatter(FuncFormatter(lambda x, pos: f'{x/1e3:.0f}K'))
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.xticks(rotation=30, ha='right')
-    plt.tight_layout()
-    cashflow_chart_path = os.path.join(charts_dir, f"cashflow_{business_name}_{window}.png")
-    plt.savefig(cashflow_chart_path, bbox_inches='tight', pad_inches=0.1)
-    plt.close()
+    #  Chart Generation (in memory)
+    with metrics.stage('render_charts', window):
+        balance_chart = chart_renderer.balance_png(daily_balance)
+        cashflow_chart = chart_renderer.cashflow_png(weekly_cash_flow)
+        score_chart = chart_renderer.score_png(score_history) if score_history is not None and len(score_history) else None
+
+    with metrics.stage('pdf_layout', window):
+        pdf = _layout_memo(business_name, window, scorecard, features, balance_chart, cashflow_chart, score_chart,
+                           covered_from)
+    # FPDF 1.7 keeps the document as a latin-1 string
+    with metrics.stage('pdf_output', window):
+        return pdf.output(dest='S').encode('latin1')
 
 
+def _layout_memo(business_name, window, scorecard, features, balance_chart, cashflow_chart, score_chart=None,
+                 covered_from=None):
+    """Lays out the one-page memo around the chart PNGs; returns the unserialized FPDF."""
     #  PDF Creation 
-    pdf = FPDF()
+    pdf = MemoPDF()
     pdf.add_page()
     pdf.set_font("Arial", 'B', 16)
 
     # Header & Summary
     pdf.cell(0, 10, f"Credit Memo: {business_name}", 0, 1, 'C')
     pdf.set_font("Arial", '', 10)
-    pdf.cell(0, 10, f"As-of Date: {datetime.now().strftime('%Y-%m-%d')} | Window: {window}", 0, 1, 'C')
+    window_label = f"{window} (partial: transactions from {covered_from})" if covered_from else window
+    pdf.cell(0, 10, f"As-of Date: {datetime.now().strftime('%Y-%m-%d')} | Window: {window_label}", 0, 1, 'C')
     pdf.ln(4)
     pdf.set_font("Arial", 'B', 12)
     pdf.cell(0, 10, "Summary", 0, 1, 'L')
@@ -68,22 +105,6 @@ def create_credit_memo(business_name, window, scorecard, features, output_path,
     pdf.cell(0, 10, summary_text, 1, 1, 'C', 1)
     pdf.ln(8)
 
-    #  Pass/Watch flags 
-    def get_flag(metric, value):
-        flags = {
-            "Days Cash on Hand": '(Pass)' if value >= 15 else '(Watch)',
-            "Median Monthly NOCF": '(Pass)' if value > 0 else '(Watch)',
-            "Weekly NCF Variability": '(Pass)' if value < 0.3 else '(Watch)',
-            "NSF Count": '(Pass)' if value < 2 else '(Watch)',
-            "Returned ACH Count": '(Pass)' if value == 0 else '(Watch)',
-            "Vendor Late Proxy (%)": '(Pass)' if value < 35 else '(Watch)',
-            "DSCR Proxy": '(Pass)' if value >= 1.25 else '(Watch)',
-            "Draw on Credit Ratio (%)": '(Pass)' if value < 20 else '(Watch)',
-            "Top Vendor Share (%)": '(Pass)' if value < 35 else '(Watch)',
-            "% of Days Below Zero": '(Pass)' if value == 0 else '(Watch)'
-        }
-        return flags.get(metric, '(Pass)')
-
     # Key Metrics Table
     pdf.set_font("Arial", 'B', 12)
     pdf.cell(0, 10, "Key Metrics", 0, 1, 'L')
@@ -151,20 +172,18 @@ def create_credit_memo(business_name, window, scorecard, features, output_path,
     # Charts
     pdf.set_font("Arial", 'B', 12)
     pdf.cell(0, 10, "Visuals", 0, 1, 'L')
-    pdf.image(balance_chart_path, x=pdf.get_x() + 5, y=pdf.get_y(), w=90)
-    pdf.image(cashflow_chart_path, x=pdf.get_x() + 105, y=pdf.get_y(), w=90)
+    if score_chart is None:
+        pdf.png_image(balance_chart, x=pdf.get_x() + 5, y=pdf.get_y(), w=90)
+        pdf.png_image(cashflow_chart, x=pdf.get_x() + 105, y=pdf.get_y(), w=90)
+    else:
+        # Three across, narrower, so the page still holds them
+        pdf.png_image(balance_chart, x=pdf.get_x(), y=pdf.get_y(), w=62)
+        pdf.png_image(cashflow_chart, x=pdf.get_x() + 64, y=pdf.get_y(), w=62)
+        pdf.png_image(score_chart, x=pdf.get_x() + 128, y=pdf.get_y(), w=62)
     
     # Footer
     pdf.set_y(-15)
     pdf.set_font("Arial", 'I', 7)
     pdf.set_text_color(128)
-    pdf.cell(0, 10, "Policy Note: This is an automated credit assessment based on provided cashflow data.", 0, 0, 'C')
-    
-    pdf.output(output_path)
-
-    # Clean up chart images
-    try:
-        os.remove(balance_chart_path)
-        os.remove(cashflow_chart_path)
-    except OSError as e:
-        print(f"Error removing chart files: {e}")
+    pdf.cell(0, 10, POLICY_NOTE, 0, 0, 'C')
+    return pdf
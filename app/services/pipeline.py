@@ -0,0 +1,456 @@
+import io
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from app.services import business_store, incremental, metrics, rolling_history
+from app.services.ingestion import BANK_TX_REQUIRED_COLUMNS, load_business_data, read_bank_tx, read_pnl_monthly
+from app.services.data_validation import validate_data
+from app.services.feature_engineering import bank_tx_kernel, chart_series, compute_features, compute_window_features
+from app.services.daily_aggregate import WINDOW_MONTHS, build_daily_aggregate, slice_window
+from app.services.scoring_engine import calculate_scorecard
+from app.services.memo_renderer import save_memo_spec
+from app.services.streaming import stream_business_data, validate_streamed_data, compute_streamed_features
+from app.services.uploads import STREAMING_THRESHOLD_BYTES
+
+# These functions are the CPU-bound part of a request and run in a worker process. Each
+# source is either the raw bytes of an upload, parsed straight from memory, or a file path
+# (large spilled uploads, bulk runs). The PDF memo is not rendered here: a memo spec is
+# saved and rendered later by app.services.memo_renderer. Data that passes validation is
+# kept in app.services.business_store so the business can be rescored without an upload.
+# Each stage is timed with app.services.metrics.stage.
+
+
+def _validation_error(validation):
+    return {"error": "Data validation failed", "details": validation.get("error") or validation["checks"]}
+
+
+def _open_source(source):
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+
+def _open_sources(*sources):
+    return [_open_source(source) for source in sources]
+
+
+def _is_large_file(source):
+    """True for a spilled upload (or bulk-run path) too big to load whole; see STREAMING_THRESHOLD_BYTES."""
+    return isinstance(source, (str, os.PathLike)) and os.path.getsize(source) > STREAMING_THRESHOLD_BYTES
+
+
+def _download_url(business_name, output_dir, pdf_filename):
+    """The memo's URL: output_dir is the request's workspace, uploads/<business>/<workspace id>."""
+    return f"/download/{business_name}/{Path(output_dir).name}/{pdf_filename}"
+
+
+def _window_chart_series(daily):
+    """Memo chart series from a daily aggregate (streamed or sliced)."""
+    return daily['closing_balance'], daily['net_flow'].resample('W').sum()
+
+
+def _store_frames(business_name, dataset, frames, **extra):
+    """Keeps validated frames for rescoring. Best effort: a full disk never fails the request."""
+    if not business_store.STORE_DATA:
+        return
+    try:
+        business_store.store_frames(business_name, dataset, frames, stored_at=datetime.now(), **extra)
+        # Appended days were built on the previous upload; the next append reseeds from this one
+        business_store.drop_dataset(business_name, incremental.DATASET)
+    except OSError:
+        pass
+
+
+def _score_frames(business_name, window, frames, output_dir, upload_bytes=None, kernel=None):
+    """
+    Features, scorecard and memo spec for one window's validated frame bundle. The
+    bank_tx_kernel built during validation can be passed in to reuse it.
+    """
+    rows = len(frames['bank_tx'])
+    with metrics.stage('compute_features', window, rows, upload_bytes):
+        if kernel is None:
+            kernel = bank_tx_kernel(frames['bank_tx'])
+        features = compute_features(frames, kernel)
+    with metrics.stage('calculate_scorecard', window, rows, upload_bytes):
+        scorecard = calculate_scorecard(features)
+
+    pdf_filename = f"Credit_Memo_{business_name}_{window}.pdf"
+    with metrics.stage('save_memo_spec', window, rows, upload_bytes):
+        save_memo_spec(Path(output_dir) / pdf_filename, business_name, window, scorecard, features, *chart_series(kernel))
+
+    return {
+        "scorecard": scorecard,
+        "features": features,
+        "pdf_download_url": _download_url(business_name, output_dir, pdf_filename)
+    }
+
+
+def _score_slice(business_name, window, aggregate, pnl_df, output_dir, rows=None, upload_bytes=None, end_date=None,
+                 score_history=None, vendors_df=None):
+    """
+    Features, scorecard and memo spec for one window sliced from a history's daily aggregate.
+    end_date anchors the window on that day rather than the last P&L month end. A
+    score_history Series is charted on the memo. A window that reaches back before the
+    history starts is scored on the days there are and flagged as 'partial_window'.
+    """
+    try:
+        with metrics.stage('compute_features', window, rows, upload_bytes):
+            window_slice = slice_window(aggregate, pnl_df, WINDOW_MONTHS[window], end_date)
+            window_slice['vendors'] = vendors_df
+            features = compute_window_features(window_slice)
+        with metrics.stage('calculate_scorecard', window, rows, upload_bytes):
+            scorecard = calculate_scorecard(features)
+
+        covered_from = window_slice['covered_from']
+        if covered_from is not None:
+            covered_from = covered_from.strftime('%Y-%m-%d')
+        pdf_filename = f"Credit_Memo_{business_name}_{window}.pdf"
+        with metrics.stage('save_memo_spec', window, rows, upload_bytes):
+            save_memo_spec(
+                Path(output_dir) / pdf_filename, business_name, window, scorecard, features,
+                *_window_chart_series(window_slice['daily']), score_history=score_history, covered_from=covered_from
+            )
+    except Exception as e:
+        raise RuntimeError(f"Error processing {window} data: {str(e)}") from e
+
+    result = {
+        "scorecard": scorecard,
+        "features": features,
+        "pdf_download_url": _download_url(business_name, output_dir, pdf_filename)
+    }
+    if covered_from is not None:
+        result["partial_window"] = {
+            "window_start": window_slice['window_start'].strftime('%Y-%m-%d'), "covered_from": covered_from
+        }
+    return result
+
+
+def score_window(business_name, window, bank_tx_source, pnl_monthly_source, vendors_source, output_dir):
+    """Runs ingestion, validation, features, scoring and the memo for one trailing window."""
+    if _is_large_file(bank_tx_source):
+        return score_window_streaming(business_name, window, bank_tx_source, pnl_monthly_source, vendors_source, output_dir)
+
+    upload_bytes = metrics.source_bytes(bank_tx_source, pnl_monthly_source, vendors_source)
+    with metrics.stage('score_window', window, upload_bytes=upload_bytes) as task:
+        with metrics.stage('read_csv', window, upload_bytes=upload_bytes) as step:
+            try:
+                frames = load_business_data(*_open_sources(bank_tx_source, pnl_monthly_source, vendors_source))
+            except (ValueError, KeyError) as e:
+                return {"error": "Data ingestion failed", "details": str(e)}
+            task.rows = step.rows = len(frames['bank_tx'])
+
+        shared = {}
+        with metrics.stage('validate_data', window, task.rows, upload_bytes):
+            validation = validate_data(frames, aggregates=shared)
+        if not validation["passed"]:
+            return _validation_error(validation)
+
+        with metrics.stage('store_data', window, task.rows, upload_bytes):
+            _store_frames(business_name, window, frames)
+        return _score_frames(business_name, window, frames, output_dir, upload_bytes, shared.get('bank_tx_kernel'))
+
+
+def _stream_validated(business_name, dataset, label, sources, upload_bytes, task, daily_counterparties=False,
+                      **extra):
+    """
+    Streams a large bank feed (see stream_business_data), validates it and stores it as
+    `dataset`, chunk by chunk as it is parsed; extra is kept with the stored dataset.
+    Returns (streamed, None), or (None, error) when ingestion or validation fails.
+    """
+    # Chunks are stored as they are parsed and the dataset is only committed if it validates
+    writer = business_store.DatasetWriter(business_name, dataset) if business_store.STORE_DATA else None
+
+    def store_chunk(chunk):
+        nonlocal writer
+        if writer is None:
+            return
+        try:
+            writer.append('bank_tx', chunk)
+        except OSError:
+            writer.abort()
+            writer = None
+
+    with metrics.stage('stream_csv', label, upload_bytes=upload_bytes) as step:
+        try:
+            streamed = stream_business_data(
+                *_open_sources(*sources), on_chunk=store_chunk, daily_counterparties=daily_counterparties
+            )
+        except (ValueError, KeyError) as e:
+            if writer is not None:
+                writer.abort()
+            return None, {"error": "Data ingestion failed", "details": str(e)}
+        task.rows = step.rows = streamed['row_count']
+
+    with metrics.stage('validate_data', label, task.rows, upload_bytes):
+        validation = validate_streamed_data(streamed)
+    if not validation["passed"]:
+        if writer is not None:
+            writer.abort()
+        return None, _validation_error(validation)
+
+    if writer is not None:
+        try:
+            for table in ('pnl_monthly', 'vendors'):
+                if streamed[table] is not None:
+                    writer.append(table, streamed[table])
+            writer.commit(stored_at=datetime.now(), **extra)
+            business_store.drop_dataset(business_name, incremental.DATASET)
+        except OSError:
+            writer.abort()
+    return streamed, None
+
+
+def score_window_streaming(business_name, window, bank_tx_source, pnl_monthly_source, vendors_source, output_dir):
+    """score_window for very large bank feeds: bank_tx is read in chunks with bounded memory."""
+    upload_bytes = metrics.source_bytes(bank_tx_source, pnl_monthly_source, vendors_source)
+    with metrics.stage('score_window', window, upload_bytes=upload_bytes) as task:
+        streamed, error = _stream_validated(
+            business_name, window, window, (bank_tx_source, pnl_monthly_source, vendors_source), upload_bytes, task
+        )
+        if error is not None:
+            return error
+
+        with metrics.stage('compute_features', window, task.rows, upload_bytes):
+            features = compute_streamed_features(streamed)
+        with metrics.stage('calculate_scorecard', window, task.rows, upload_bytes):
+            scorecard = calculate_scorecard(features)
+
+        pdf_filename = f"Credit_Memo_{business_name}_{window}.pdf"
+        daily = streamed['daily']
+        with metrics.stage('save_memo_spec', window, task.rows, upload_bytes):
+            save_memo_spec(
+                Path(output_dir) / pdf_filename, business_name, window, scorecard, features, *_window_chart_series(daily)
+            )
+
+        return {
+            "scorecard": scorecard,
+            "features": features,
+            "pdf_download_url": _download_url(business_name, output_dir, pdf_filename)
+        }
+
+
+def score_history(business_name, windows, bank_tx_source, pnl_monthly_source, vendors_source, output_dir):
+    """
+    Scores several trailing windows from a single history: parse and validate once,
+    aggregate per day once, then slice the aggregate for each window.
+    """
+    if _is_large_file(bank_tx_source):
+        return score_history_streaming(business_name, windows, bank_tx_source, pnl_monthly_source, vendors_source,
+                                       output_dir)
+
+    upload_bytes = metrics.source_bytes(bank_tx_source, pnl_monthly_source, vendors_source)
+    with metrics.stage('score_history', 'history', upload_bytes=upload_bytes) as task:
+        with metrics.stage('read_csv', 'history', upload_bytes=upload_bytes) as step:
+            try:
+                frames = load_business_data(*_open_sources(bank_tx_source, pnl_monthly_source, vendors_source))
+            except (ValueError, KeyError) as e:
+                return {w: {"error": "Data ingestion failed", "details": str(e)} for w in windows}
+            task.rows = step.rows = len(frames['bank_tx'])
+
+        # Validation's daily summary is the history's daily aggregate, sliced per window below
+        shared = {}
+        with metrics.stage('validate_data', 'history', task.rows, upload_bytes):
+            validation = validate_data(frames, aggregates=shared, daily_summary='daily_aggregate')
+        if not validation["passed"]:
+            return {w: _validation_error(validation) for w in windows}
+
+        with metrics.stage('store_data', 'history', task.rows, upload_bytes):
+            _store_frames(business_name, 'history', frames, windows=windows)
+        with metrics.stage('daily_aggregate', 'history', task.rows, upload_bytes):
+            aggregate = shared.get('daily_aggregate') or build_daily_aggregate(frames['bank_tx'])
+        return _score_history_slices(
+            business_name, windows, aggregate, frames['pnl_monthly'], frames['vendors'], output_dir, task.rows,
+            upload_bytes
+        )
+
+
+def score_history_streaming(business_name, windows, bank_tx_source, pnl_monthly_source, vendors_source, output_dir):
+    """
+    score_history for very large bank feeds: bank_tx is read in chunks and only the daily
+    aggregate, with outflows per (date, counterparty), is kept to slice the windows from.
+    """
+    upload_bytes = metrics.source_bytes(bank_tx_source, pnl_monthly_source, vendors_source)
+    with metrics.stage('score_history', 'history', upload_bytes=upload_bytes) as task:
+        streamed, error = _stream_validated(
+            business_name, 'history', 'history', (bank_tx_source, pnl_monthly_source, vendors_source), upload_bytes,
+            task, daily_counterparties=True, windows=windows
+        )
+        if error is not None:
+            return {w: error for w in windows}
+        return _score_history_slices(
+            business_name, windows, streamed, streamed['pnl_monthly'], streamed['vendors'], output_dir, task.rows,
+            upload_bytes
+        )
+
+
+def _score_history_slices(business_name, windows, aggregate, pnl_df, vendors_df, output_dir, rows, upload_bytes):
+    """Scores each window sliced from a history's daily aggregate, charting the rolling score on the memos."""
+    # The memos chart the rolling score over the history, computed once for every window
+    with metrics.stage('rolling_history', 'history', rows, upload_bytes):
+        score_history = rolling_history.rolling_scores(aggregate, pnl_df, vendors_df=vendors_df)['score']
+    return {
+        window: _score_slice(
+            business_name, window, aggregate, pnl_df, output_dir, rows, upload_bytes,
+            score_history=score_history, vendors_df=vendors_df
+        )
+        for window in windows
+    }
+
+
+def rescore_business(business_name, windows, output_dir):
+    """
+    Rescores a business from its stored data, with no upload or CSV parsing. Each window is
+    scored from its own stored upload if there is one, otherwise sliced from the stored
+    history. Only the bank_tx columns the features read are loaded, memory-mapped.
+    The data passed validation when it was stored, so it is not validated again.
+
+    windows=None rescores every stored window (or the history's windows). Returns
+    {window: result}, like score_history.
+    """
+    datasets = business_store.list_datasets(business_name)
+    if windows is None:
+        windows = [w for w in WINDOW_MONTHS if w in datasets]
+        if not windows and 'history' in datasets:
+            windows = business_store.read_meta(business_name, 'history').get('windows', list(WINDOW_MONTHS))
+
+    results = {}
+    history = aggregate = None
+    for window in windows:
+        if window in datasets:
+            with metrics.stage('rescore', window) as task:
+                with metrics.stage('load_stored', window) as step:
+                    frames = business_store.load_frames(business_name, window, BANK_TX_REQUIRED_COLUMNS)
+                    task.rows = step.rows = len(frames['bank_tx'])
+                results[window] = _score_frames(business_name, window, frames, output_dir)
+        elif 'history' in datasets:
+            with metrics.stage('rescore', window) as task:
+                if history is None:
+                    with metrics.stage('load_stored', 'history') as step:
+                        history = business_store.load_frames(business_name, 'history', BANK_TX_REQUIRED_COLUMNS)
+                        step.rows = len(history['bank_tx'])
+                    with metrics.stage('daily_aggregate', 'history', step.rows):
+                        aggregate = build_daily_aggregate(history['bank_tx'])
+                task.rows = len(history['bank_tx'])
+                results[window] = _score_slice(
+                    business_name, window, aggregate, history['pnl_monthly'], output_dir, task.rows,
+                    vendors_df=history['vendors']
+                )
+        else:
+            results[window] = {"error": "No stored data", "details": f"No stored data for the {window} window"}
+    return results
+
+
+def append_transactions(business_name, windows, bank_tx_source, pnl_monthly_source, output_dir):
+    """
+    Updates a stored business with new transactions only (e.g. the day's bank feed) and
+    rescores it. The transactions are validated on their own, with the date-gap and balance
+    continuity checks run against the last stored day, then folded into the stored per-day
+    and per-counterparty aggregates in place. Each window is then rescored from those
+    aggregates, anchored on the last transaction day so older days roll off. The cost
+    follows the size of the new file and of the windows, never the full history.
+
+    An uploaded pnl_monthly replaces the stored months it covers. windows=None rescores the
+    windows the business was last scored on. Returns {window: result}, like score_history.
+    """
+    upload_bytes = metrics.source_bytes(bank_tx_source, pnl_monthly_source)
+    with incremental.locked(business_name), metrics.stage('append', 'append', upload_bytes=upload_bytes) as task:
+        with metrics.stage('load_stored', 'append'):
+            meta = incremental.load_meta(business_name)
+        windows = windows or meta['windows']
+
+        with metrics.stage('read_csv', 'append', upload_bytes=upload_bytes) as step:
+            try:
+                bank_tx_df = read_bank_tx(_open_source(bank_tx_source))
+                pnl_df = read_pnl_monthly(_open_source(pnl_monthly_source)) if pnl_monthly_source is not None else None
+            except (ValueError, KeyError) as e:
+                return {w: {"error": "Data ingestion failed", "details": str(e)} for w in windows}
+            task.rows = step.rows = len(bank_tx_df)
+
+        with metrics.stage('validate_data', 'append', task.rows, upload_bytes):
+            try:
+                prepared = incremental.prepare_append(meta, bank_tx_df)
+            except incremental.AppendRejectedError as e:
+                return {w: {"error": "Append rejected", "details": str(e)} for w in windows}
+            validation = validate_data({'bank_tx': bank_tx_df, 'pnl_monthly': pnl_df}, precomputed=prepared['checks'])
+        if not validation["passed"]:
+            return {w: _validation_error(validation) for w in windows}
+
+        with metrics.stage('store_data', 'append', task.rows, upload_bytes):
+            meta = incremental.apply_append(business_name, prepared, pnl_df)
+        with metrics.stage('load_stored', 'append', task.rows):
+            aggregate, pnl_df, end_date = incremental.load_window_aggregate(
+                business_name, meta, max(WINDOW_MONTHS[w] for w in windows)
+            )
+            vendors_df = incremental.load_vendors(business_name, meta)
+
+        results = {}
+        for window in windows:
+            results[window] = _score_slice(
+                business_name, window, aggregate, pnl_df, output_dir, task.rows, upload_bytes, end_date,
+                vendors_df=vendors_df
+            )
+            results[window]["as_of"] = end_date.strftime('%Y-%m-%d')
+        return results
+
+
+def score_trajectory(business_name, window_days=None, days=None):
+    """
+    The daily score trajectory of a stored business (see rolling_history.rolling_scores):
+    the scorecard at each of the last `days` days up to its last transaction day, each from
+    the trailing window_days. Reads only that span of the stored daily aggregates, seeding
+    them from the stored uploads first if needed.
+
+    Returns {"as_of", "window_days", "history"}, history holding one list per column
+    (date, the features, score, grade, eligible_capital, ...), oldest day first.
+    """
+    window_days = rolling_history.WINDOW_DAYS if window_days is None else window_days
+    days = rolling_history.HISTORY_DAYS if days is None else days
+    with incremental.locked(business_name), metrics.stage('score_trajectory', 'history') as task:
+        with metrics.stage('load_stored', 'history') as step:
+            meta = incremental.load_meta(business_name)
+            # Calendar months covering every window, the shortest month counting 28 days
+            months = -(-(days + window_days) // 28)
+            aggregate, pnl_df, end_date = incremental.load_window_aggregate(business_name, meta, months)
+            vendors_df = incremental.load_vendors(business_name, meta)
+            task.rows = step.rows = len(aggregate['daily'])
+        with metrics.stage('rolling_history', 'history', task.rows):
+            trajectory = rolling_history.rolling_scores(aggregate, pnl_df, window_days, days, end_date, vendors_df)
+
+    history = {'date': trajectory.index.strftime('%Y-%m-%d').tolist()}
+    history.update({column: trajectory[column].tolist() for column in trajectory.columns})
+    return {"as_of": end_date.strftime('%Y-%m-%d'), "window_days": window_days, "history": history}
+
+
+#  Worker warm-up
+def _warm_up_sources(days=62):
+    """CSV bytes of a small, valid synthetic business: two months of daily inflows and outflows."""
+    bank_tx = ['date,amount,category,in_out,counterparty,balance,invoice_date,due_date']
+    balance = 10_000.0
+    for offset in range(days):
+        day = date(2025, 1, 1) + timedelta(days=offset)
+        balance += 1_000.0
+        bank_tx.append(f"{day},1000.00,customer_payment,in,Customer_{offset % 3},{balance:.2f},,")
+        balance -= 400.0
+        bank_tx.append(f"{day},400.00,utilities,out,Vendor_{offset % 4},{balance:.2f},"
+                       f"{day - timedelta(days=20)},{day + timedelta(days=10)}")
+    pnl_monthly = [
+        'month,revenue,cogs,operating_expense,other_income_expense',
+        '2025-01,31000,12000,6000,0',
+        '2025-02,28000,11000,5600,0',
+    ]
+    return "\n".join(bank_tx).encode(), "\n".join(pnl_monthly).encode()
+
+
+def warm_up(output_dir):
+    """
+    Scores a tiny synthetic business through both the single-window and the sliced-history
+    paths, so a fresh worker has imported and run everything before its first request.
+    Nothing is stored. Returns the path of the memo PDF, for the caller to render.
+    """
+    frames = load_business_data(*_open_sources(*_warm_up_sources()))
+    shared = {}
+    validate_data(frames, aggregates=shared)
+    _score_frames('warm_up', '1m', frames, output_dir, kernel=shared.get('bank_tx_kernel'))
+    aggregate = build_daily_aggregate(frames['bank_tx'])
+    score_history = rolling_history.rolling_scores(aggregate, frames['pnl_monthly'], 30, 30)['score']
+    result = _score_slice('warm_up', '1m', aggregate, frames['pnl_monthly'], output_dir, score_history=score_history)
+    return Path(output_dir) / result["pdf_download_url"].rsplit("/", 1)[1]
@@ -0,0 +1,258 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+# Every scored result, kept in an embedded SQLite database so portfolio questions (capital
+# and expected loss by grade, which businesses carry a reason code) are answered without
+# touching transaction data. `results` is the append-only log; `latest` holds the current
+# result of each (business, window) and `latest_reasons` its reason codes. `grade_rollup`
+# and `reason_rollup` are the counts and sums over `latest`, moved by the old and new
+# result in the same transaction as each insert, so summaries read a few rows per window.
+PORTFOLIO_DB = Path(os.environ.get("SCORING_PORTFOLIO_DB", "uploads/.portfolio.sqlite3"))
+RECORD_RESULTS = os.environ.get("SCORING_PORTFOLIO", "1") != "0"
+
+# Seconds a writer waits for another process's transaction before giving up
+BUSY_TIMEOUT = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    business TEXT NOT NULL,
+    window TEXT NOT NULL,
+    source TEXT NOT NULL,
+    policy_version TEXT,
+    scored_at TEXT NOT NULL,
+    as_of TEXT,
+    score REAL,
+    grade TEXT,
+    eligible_capital REAL,
+    expected_loss REAL,
+    reason_codes TEXT NOT NULL,
+    features TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_business ON results (business, window, id);
+
+CREATE TABLE IF NOT EXISTS latest (
+    business TEXT NOT NULL,
+    window TEXT NOT NULL,
+    result_id INTEGER NOT NULL,
+    score REAL,
+    grade TEXT,
+    eligible_capital REAL,
+    expected_loss REAL,
+    PRIMARY KEY (business, window)
+);
+CREATE INDEX IF NOT EXISTS latest_grade ON latest (window, grade);
+
+CREATE TABLE IF NOT EXISTS latest_reasons (
+    code TEXT NOT NULL,
+    window TEXT NOT NULL,
+    business TEXT NOT NULL,
+    PRIMARY KEY (code, window, business)
+);
+CREATE INDEX IF NOT EXISTS latest_reasons_business ON latest_reasons (business, window);
+
+CREATE TABLE IF NOT EXISTS grade_rollup (
+    window TEXT NOT NULL,
+    grade TEXT NOT NULL,
+    businesses INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    eligible_capital REAL NOT NULL,
+    expected_loss REAL NOT NULL,
+    PRIMARY KEY (window, grade)
+);
+
+CREATE TABLE IF NOT EXISTS reason_rollup (
+    window TEXT NOT NULL,
+    code TEXT NOT NULL,
+    businesses INTEGER NOT NULL,
+    PRIMARY KEY (window, code)
+);
+"""
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def _connect():
+    """A connection to PORTFOLIO_DB with the schema in place; WAL so readers never wait on a writer."""
+    with _schema_lock:
+        if str(PORTFOLIO_DB) not in _schema_ready:
+            PORTFOLIO_DB.parent.mkdir(parents=True, exist_ok=True)
+            with closing(sqlite3.connect(PORTFOLIO_DB, timeout=BUSY_TIMEOUT, isolation_level=None)) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+            _schema_ready.add(str(PORTFOLIO_DB))
+    conn = sqlite3.connect(PORTFOLIO_DB, timeout=BUSY_TIMEOUT, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _adjust_rollups(conn, window, grade, reason_codes, score, eligible_capital, expected_loss, sign):
+    """Adds (sign=1) or removes (sign=-1) one business's result in the window's rollups."""
+    conn.execute(
+        "INSERT INTO grade_rollup (window, grade, businesses, score_sum, eligible_capital, expected_loss) "
+        "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (window, grade) DO UPDATE SET "
+        "businesses = businesses + excluded.businesses, score_sum = score_sum + excluded.score_sum, "
+        "eligible_capital = eligible_capital + excluded.eligible_capital, "
+        "expected_loss = expected_loss + excluded.expected_loss",
+        (window, grade, sign, sign * score, sign * eligible_capital, sign * expected_loss)
+    )
+    conn.executemany(
+        "INSERT INTO reason_rollup (window, code, businesses) VALUES (?, ?, ?) "
+        "ON CONFLICT (window, code) DO UPDATE SET businesses = businesses + excluded.businesses",
+        [(window, code, sign) for code in reason_codes]
+    )
+
+
+def _replace_latest(conn, business_name, window, result_id, scorecard):
+    """Points (business, window) at a new result and moves the rollups from the old one to it."""
+    old = conn.execute(
+        "SELECT score, grade, eligible_capital, expected_loss FROM latest WHERE business = ? AND window = ?",
+        (business_name, window)
+    ).fetchone()
+    if old is not None:
+        old_codes = [row[0] for row in conn.execute(
+            "SELECT code FROM latest_reasons WHERE business = ? AND window = ?", (business_name, window)
+        )]
+        _adjust_rollups(conn, window, old['grade'], old_codes, old['score'], old['eligible_capital'],
+                        old['expected_loss'], -1)
+        conn.execute("DELETE FROM latest_reasons WHERE business = ? AND window = ?", (business_name, window))
+
+    codes = list(dict.fromkeys(scorecard['reason_codes']))
+    conn.execute(
+        "INSERT OR REPLACE INTO latest (business, window, result_id, score, grade, eligible_capital, expected_loss) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (business_name, window, result_id, scorecard['score'], scorecard['grade'], scorecard['eligible_capital'],
+         scorecard['expected_loss_annualized'])
+    )
+    conn.executemany(
+        "INSERT INTO latest_reasons (code, window, business) VALUES (?, ?, ?)",
+        [(code, window, business_name) for code in codes]
+    )
+    _adjust_rollups(conn, window, scorecard['grade'], codes, scorecard['score'], scorecard['eligible_capital'],
+                    scorecard['expected_loss_annualized'], 1)
+
+
+def record(business_name, results, source, policy_version=None, scored_at=None):
+    """
+    Persists a task's {window: result} mapping (as score_history returns it) and updates the
+    rollups, all in one transaction. Results without a scorecard (validation failures) are
+    skipped. source names the endpoint that scored it ('window', 'history', 'rescore',
+    'append'). Returns the number of results recorded.
+    """
+    scored = [(window, result) for window, result in results.items()
+              if isinstance(result, dict) and 'scorecard' in result]
+    if not scored:
+        return 0
+    scored_at = scored_at or datetime.now().isoformat(timespec='seconds')
+    with closing(_connect()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for window, result in scored:
+                scorecard = result['scorecard']
+                cursor = conn.execute(
+                    "INSERT INTO results (business, window, source, policy_version, scored_at, as_of, score, grade, "
+                    "eligible_capital, expected_loss, reason_codes, features) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (business_name, window, source, policy_version, scored_at, result.get('as_of'),
+                     scorecard['score'], scorecard['grade'], scorecard['eligible_capital'],
+                     scorecard['expected_loss_annualized'], json.dumps(scorecard['reason_codes']),
+                     json.dumps(result.get('features', {}), default=float))
+                )
+                _replace_latest(conn, business_name, window, cursor.lastrowid, scorecard)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    return len(scored)
+
+
+#  Queries: rollups and indexed lookups only
+def summary(window=None):
+    """
+    Per-window portfolio totals from the rollups: {window: {"businesses", "total_eligible_capital",
+    "total_expected_loss", "mean_score", "grades": {grade: same fields}}}.
+    """
+    query = "SELECT * FROM grade_rollup WHERE businesses > 0"
+    params = ()
+    if window is not None:
+        query += " AND window = ?"
+        params = (window,)
+    windows = {}
+    with closing(_connect()) as conn:
+        for row in conn.execute(query + " ORDER BY window, grade", params):
+            grades = windows.setdefault(row['window'], {})
+            grades[row['grade']] = (row['businesses'], row['score_sum'], row['eligible_capital'], row['expected_loss'])
+
+    def totals(businesses, score_sum, eligible_capital, expected_loss):
+        return {
+            "businesses": businesses,
+            "total_eligible_capital": eligible_capital,
+            "total_expected_loss": expected_loss,
+            "mean_score": score_sum / businesses,
+        }
+
+    report = {}
+    for name, grades in windows.items():
+        report[name] = totals(*(sum(values) for values in zip(*grades.values())))
+        report[name]["grades"] = {grade: totals(*values) for grade, values in grades.items()}
+    return report
+
+
+def reasons(window=None):
+    """{window: {reason code: businesses whose latest result carries it}}, most frequent first."""
+    query = "SELECT window, code, businesses FROM reason_rollup WHERE businesses > 0"
+    params = ()
+    if window is not None:
+        query += " AND window = ?"
+        params = (window,)
+    report = {}
+    with closing(_connect()) as conn:
+        for row in conn.execute(query + " ORDER BY window, businesses DESC, code", params):
+            report.setdefault(row['window'], {})[row['code']] = row['businesses']
+    return report
+
+
+def businesses(window=None, grade=None, reason=None, limit=100, offset=0):
+    """Latest results, optionally filtered on window, grade and reason code, by business name."""
+    query = (
+        "SELECT l.business, l.window, l.score, l.grade, l.eligible_capital, l.expected_loss, "
+        "r.reason_codes, r.scored_at, r.as_of, r.policy_version, r.source FROM latest l"
+    )
+    conditions, params = [], []
+    if reason is not None:
+        query += " JOIN latest_reasons c ON c.business = l.business AND c.window = l.window"
+        conditions.append("c.code = ?")
+        params.append(reason)
+    query += " JOIN results r ON r.id = l.result_id"
+    for column, value in (("l.window", window), ("l.grade", grade)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY l.business, l.window LIMIT ? OFFSET ?"
+    with closing(_connect()) as conn:
+        rows = conn.execute(query, (*params, limit, offset)).fetchall()
+    return [dict(row, reason_codes=json.loads(row['reason_codes'])) for row in rows]
+
+
+def business_history(business_name, window=None):
+    """Every recorded result of one business, oldest first, with its features."""
+    query = "SELECT * FROM results WHERE business = ?"
+    params = [business_name]
+    if window is not None:
+        query += " AND window = ?"
+        params.append(window)
+    with closing(_connect()) as conn:
+        rows = conn.execute(query + " ORDER BY id", params).fetchall()
+    return [
+        dict(row, reason_codes=json.loads(row['reason_codes']), features=json.loads(row['features']))
+        for row in rows
+    ]
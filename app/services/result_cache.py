@@ -0,0 +1,188 @@
+import ast
+import hashlib
+import importlib.util
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+#  Cache configuration (environment overridable)
+CACHE_DIR = Path(os.environ.get("SCORING_CACHE_DIR", "uploads/.cache"))
+MEMORY_ENTRIES = int(os.environ.get("SCORING_CACHE_MEMORY_ENTRIES", 256))
+DISK_BUDGET_BYTES = int(os.environ.get("SCORING_CACHE_DISK_MB", 512)) * 1024 * 1024
+
+# The policy version hashes the source of every app module the scoring and memo code can
+# reach, found by following imports (function-level ones included) from _POLICY_ROOTS, so
+# editing any of them (weights, thresholds, parsing, features, window slicing, checks, the
+# stored columns or memo layout) changes every key. A new module is covered as soon as it is
+# imported; only those in _NOT_POLICY_MODULES, which time, schedule or dispatch work without
+# touching a result, are left out. Sources are parsed, not imported: the server process
+# never loads pandas, matplotlib or fpdf.
+_POLICY_ROOTS = ['app.services.pipeline']
+_NOT_POLICY_MODULES = {'app.services.metrics', 'app.services.workers', 'app.services.tasks'}
+
+_lock = threading.Lock()
+_memory = OrderedDict()
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_policy_version = None
+
+
+def _imported_modules(module):
+    """The app modules a module's source imports, at any level, without importing it."""
+    tree = ast.parse(Path(importlib.util.find_spec(module).origin).read_bytes())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            yield from (alias.name for alias in node.names if alias.name.startswith('app.'))
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and (node.module or '').startswith('app.'):
+            package = importlib.util.find_spec(node.module).submodule_search_locations
+            for alias in node.names:
+                # `from app.services import pipeline` names a module; `from app.x import f` does not
+                submodule = f"{node.module}.{alias.name}"
+                yield submodule if package and importlib.util.find_spec(submodule) else node.module
+
+
+def policy_modules():
+    """Every module the policy version hashes, sorted: all app modules reachable from _POLICY_ROOTS."""
+    found, pending = set(), list(_POLICY_ROOTS)
+    while pending:
+        module = pending.pop()
+        if module in found or module in _NOT_POLICY_MODULES:
+            continue
+        found.add(module)
+        pending.extend(_imported_modules(module))
+    return sorted(found)
+
+
+def policy_version():
+    """Short hash of the source of every module that decides a result (see policy_modules)."""
+    global _policy_version
+    if _policy_version is None:
+        digest = hashlib.sha256()
+        for module in policy_modules():
+            digest.update(module.encode())
+            digest.update(Path(importlib.util.find_spec(module).origin).read_bytes())
+        _policy_version = digest.hexdigest()[:16]
+    return _policy_version
+
+
+def make_key(*parts):
+    """
+    Builds a cache key from content hashes of the uploaded files plus anything else the
+    result depends on (window, business name, as-of date). The policy version is always included.
+    """
+    digest = hashlib.sha256(policy_version().encode())
+    for part in parts:
+        digest.update(b"\0")
+        digest.update(str(part).encode())
+    return digest.hexdigest()
+
+
+def _disk_path(key):
+    return CACHE_DIR / f"{key}.pkl"
+
+
+def get(key):
+    """Returns the cached entry ({'result': ..., 'memos': {filename: bytes}}) or None."""
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            _memory.move_to_end(key)
+            _stats["memory_hits"] += 1
+            return entry
+
+    path = _disk_path(key)
+    try:
+        with open(path, "rb") as f:
+            entry = pickle.load(f)
+        # Refresh the mtime so disk eviction is least-recently-used
+        os.utime(path)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        with _lock:
+            _stats["misses"] += 1
+        return None
+
+    with _lock:
+        _stats["disk_hits"] += 1
+        _remember(key, entry)
+    return entry
+
+
+def put(key, result, memos):
+    """Stores a result and its memo bytes in both tiers, then enforces the disk budget."""
+    entry = {"result": result, "memos": memos}
+    with _lock:
+        _remember(key, entry)
+        _stats["stores"] += 1
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _disk_path(key)
+    tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "wb") as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    _enforce_disk_budget()
+
+
+def add_memo(key, filename, memo):
+    """Attaches a memo rendered after the result was stored. No-op if the entry was evicted."""
+    with _lock:
+        entry = _memory.get(key)
+    if entry is None:
+        try:
+            with open(_disk_path(key), "rb") as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return
+    memos = {**entry["memos"], filename: memo}
+    put(key, entry["result"], memos)
+
+
+def _remember(key, entry):
+    _memory[key] = entry
+    _memory.move_to_end(key)
+    while len(_memory) > MEMORY_ENTRIES:
+        _memory.popitem(last=False)
+
+
+def _enforce_disk_budget():
+    """Deletes least-recently-used entries until the disk tier fits its byte budget."""
+    entries = []
+    for path in CACHE_DIR.glob("*.pkl"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= DISK_BUDGET_BYTES:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+        with _lock:
+            _stats["evictions"] += 1
+
+
+def stats():
+    """Hit/miss counters plus the current size of each tier."""
+    with _lock:
+        result = dict(_stats, memory_entries=len(_memory))
+    result["disk_bytes"] = sum(p.stat().st_size for p in CACHE_DIR.glob("*.pkl")) if CACHE_DIR.exists() else 0
+    result["policy_version"] = policy_version()
+    return result
+
+
+def clear():
+    """Drops every entry from both tiers."""
+    with _lock:
+        _memory.clear()
+    if CACHE_DIR.exists():
+        for path in CACHE_DIR.glob("*.pkl"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
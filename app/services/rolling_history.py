@@ -0,0 +1,219 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from app.services.daily_aggregate import month_end_dates
+from app.services.feature_engineering import pnl_statistics, vendor_lookup
+from app.services.scoring_engine import calculate_scorecards
+
+# A score trajectory for credit monitoring: the scorecard at every day of the last
+# HISTORY_DAYS, each from the trailing WINDOW_DAYS. The window for day d holds the
+# transaction days in (d - WINDOW_DAYS, d] and the P&L months that ended in that span, and
+# scores exactly like compute_window_features on that slice of the daily aggregate.
+#
+# Nothing is re-sliced per day. Each per-day column of the daily aggregate becomes a
+# cumulative array once, so every window total is the difference of two entries; weekly
+# cash-flow variability comes from cumulative weekly sums and squares plus the two partial
+# edge weeks. Only the P&L statistics (a handful of distinct month sets) and top-vendor
+# shares (cumulative per-counterparty outflows) are not plain prefix sums.
+WINDOW_DAYS = int(os.environ.get("SCORING_ROLLING_WINDOW_DAYS", 90))
+HISTORY_DAYS = int(os.environ.get("SCORING_ROLLING_HISTORY_DAYS", 365))
+
+# Evaluation days are handled this many (day, counterparty) cells at a time
+BLOCK_CELLS = 2_000_000
+
+# Feature columns, in compute_window_features' order
+FEATURES = [
+    'average_daily_balance', 'percent_of_days_below_zero', 'days_cash_on_hand', 'median_monthly_nocf',
+    'weekly_net_cashflow_variability', 'draw_on_credit_ratio', 'nsf_count', 'returned_ach_count',
+    'vendor_late_proxy', 'mom_revenue_variability', '3_month_slope', 'seasonal_delta', 'top_vendor_share',
+    'top_5_vendors_share', 'critical_vendor_share', 'top_vendor_category_share', 'dscr_proxy', 'annualized_revenue',
+]
+
+
+def _cumulative(values):
+    """Prefix sums with a leading zero: window [lo, hi) totals are out[hi] - out[lo]."""
+    out = np.zeros(len(values) + 1, dtype=values.dtype)
+    np.cumsum(values, out=out[1:])
+    return out
+
+
+def _ratio(numerator, denominator, scale=1.0):
+    """numerator / denominator * scale where denominator > 0, else 0 (the scalar paths' guard)."""
+    out = np.zeros(len(numerator))
+    positive = denominator > 0
+    out[positive] = numerator[positive] / denominator[positive] * scale
+    return out
+
+
+def _month_features(pnl_monthly_df):
+    """The P&L-only window features, from the same pnl_statistics compute_window_features uses."""
+    stats = pnl_statistics(pnl_monthly_df)
+    return (
+        stats['avg_daily_expenses'], stats['median_monthly_nocf'], stats['nocf_sum'],
+        stats['mom_revenue_variability'], stats['3_month_slope'], stats['annualized_revenue'],
+    )
+
+
+def _weekly_variability(day_numbers, net_flow, lo, hi):
+    """
+    std / mean of resample('W') net flow sums over each window of rows [lo, hi), weeks ending
+    on Sunday and empty weeks counted as zero. 0 where the scalar path gives NaN or divides by 0.
+    """
+    out = np.zeros(len(lo))
+    if not len(day_numbers):
+        return out
+    weeks = (day_numbers + 3) // 7
+    weeks = weeks - weeks[0]
+    weekly = np.bincount(weeks, weights=net_flow)
+    flow_sums = _cumulative(net_flow)
+    weekly_squares = _cumulative(weekly ** 2)
+
+    several = (hi - lo) > 0
+    several[several] = weeks[hi[several] - 1] > weeks[lo[several]]
+    lo, hi = lo[several], hi[several]
+    first_week, last_week = weeks[lo], weeks[hi - 1]
+    first_week_end = np.searchsorted(weeks, first_week, side='right')
+    last_week_start = np.searchsorted(weeks, last_week, side='left')
+
+    # The edge weeks are cut by the window; the weeks between are whole
+    first = flow_sums[first_week_end] - flow_sums[lo]
+    last = flow_sums[hi] - flow_sums[last_week_start]
+    squares = first ** 2 + last ** 2 + weekly_squares[last_week] - weekly_squares[first_week + 1]
+    total = flow_sums[hi] - flow_sums[lo]
+    count = (last_week - first_week + 1).astype('float64')
+    mean = total / count
+    std = np.sqrt(np.maximum((squares - total * mean) / (count - 1), 0.0))
+    out[several] = np.where(mean != 0, std / np.where(mean != 0, mean, 1.0), 0.0)
+    return out
+
+
+def _vendor_shares(counterparty_outflows, vendors_df, start_dates, end_dates):
+    """
+    Top and top-5 counterparty, critical-vendor and top vendor-category shares of each
+    window's outflows, from cumulative per-counterparty totals.
+    """
+    shares = [np.zeros(len(end_dates)) for _ in range(4)]
+    if counterparty_outflows.empty:
+        return shares
+    top, top_5, critical, top_category = shares
+    codes, counterparties = pd.factorize(counterparty_outflows['counterparty'])
+    if not len(counterparties):
+        return shares
+    is_critical, category_codes, categories = vendor_lookup(counterparties, vendors_df)
+    # Counterparty -> vendor category membership, so category totals are one product per block
+    in_category = np.zeros((len(counterparties), len(categories)))
+    has_category = category_codes >= 0
+    in_category[np.flatnonzero(has_category), category_codes[has_category]] = 1.0
+    day_codes, days = pd.factorize(counterparty_outflows['date'].to_numpy(dtype='datetime64[ns]'), sort=True)
+    known = codes >= 0
+    width = len(counterparties)
+    totals = np.bincount(
+        day_codes[known] * width + codes[known], weights=counterparty_outflows['amount'].to_numpy(dtype='float64')[known],
+        minlength=len(days) * width
+    ).reshape(len(days), width)
+    cumulative = np.zeros((len(days) + 1, totals.shape[1]))
+    np.cumsum(totals, axis=0, out=cumulative[1:])
+
+    lo = np.searchsorted(days, start_dates, side='right')
+    hi = np.searchsorted(days, end_dates, side='right')
+    block = max(BLOCK_CELLS // max(totals.shape[1], 1), 1)
+    for begin in range(0, len(end_dates), block):
+        rows = slice(begin, begin + block)
+        spending = cumulative[hi[rows]] - cumulative[lo[rows]]
+        total = spending.sum(axis=1)
+        largest = -np.sort(-spending, axis=1)[:, :5] if spending.shape[1] <= 5 else \
+            -np.sort(-np.partition(spending, spending.shape[1] - 5, axis=1)[:, -5:], axis=1)
+        top[rows] = _ratio(largest[:, 0], total)
+        top_5[rows] = _ratio(largest.sum(axis=1), total)
+        critical[rows] = _ratio(spending[:, is_critical].sum(axis=1), total)
+        if len(categories):
+            top_category[rows] = _ratio((spending @ in_category).max(axis=1), total)
+    return shares
+
+
+def rolling_features(aggregate, pnl_monthly_df, window_days=None, days=None, end_date=None, vendors_df=None):
+    """
+    Features of the trailing window_days (default WINDOW_DAYS) at each of the `days` (default
+    HISTORY_DAYS) calendar days up to end_date (default: the last transaction day), from a
+    daily aggregate (see daily_aggregate.build_daily_aggregate). Days before the first
+    transaction day are left out. vendors_df is the vendor master, if any. Returns a
+    DataFrame indexed by day with compute_window_features' columns; each row matches it on
+    that day's window.
+    """
+    window_days = WINDOW_DAYS if window_days is None else window_days
+    days = HISTORY_DAYS if days is None else days
+    daily = aggregate['daily']
+    if end_date is None:
+        end_date = daily.index.max() if len(daily) else month_end_dates(pnl_monthly_df).max()
+    end_dates = pd.date_range(end=pd.Timestamp(end_date).normalize(), periods=days, freq='D', name='date')
+    if len(daily):
+        end_dates = end_dates[end_dates >= daily.index.min()]
+    start_dates = end_dates - pd.Timedelta(days=window_days)
+
+    #  Per-day columns: cumulative once, then two lookups per window
+    day_index = daily.index.to_numpy(dtype='datetime64[ns]')
+    lo = np.searchsorted(day_index, start_dates.to_numpy(), side='right')
+    hi = np.searchsorted(day_index, end_dates.to_numpy(), side='right')
+
+    def window_sum(column, dtype='float64'):
+        values = daily[column].to_numpy(dtype=dtype)
+        sums = _cumulative(values)
+        return sums[hi] - sums[lo]
+
+    balance = daily['closing_balance'].to_numpy(dtype='float64')
+    balance_count = _cumulative((~np.isnan(balance)).astype('int64'))
+    balance_count = balance_count[hi] - balance_count[lo]
+    balance_sums = _cumulative(np.where(np.isnan(balance), 0.0, balance))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        average_balance = np.where(balance_count > 0, (balance_sums[hi] - balance_sums[lo]) / balance_count, np.nan)
+        below_zero = _cumulative((balance < 0).astype('int64'))
+        percent_below_zero = np.where(hi > lo, (below_zero[hi] - below_zero[lo]) / (hi - lo) * 100, 0.0)
+
+    day_numbers = day_index.astype('datetime64[D]').astype('int64')
+    features = {
+        'average_daily_balance': np.nan_to_num(average_balance, nan=0.0),
+        'percent_of_days_below_zero': percent_below_zero,
+        'weekly_net_cashflow_variability': _weekly_variability(
+            day_numbers, daily['net_flow'].to_numpy(dtype='float64'), lo, hi
+        ),
+        'draw_on_credit_ratio': _ratio(window_sum('inflow_credit'), window_sum('inflow_total')),
+        'nsf_count': window_sum('nsf_count', 'int64'),
+        'returned_ach_count': window_sum('returned_ach_count', 'int64'),
+        'vendor_late_proxy': _ratio(window_sum('late_payments', 'int64'), window_sum('due_payments', 'int64'), 100),
+        'seasonal_delta': np.zeros(len(end_dates)),
+    }
+    (features['top_vendor_share'], features['top_5_vendors_share'], features['critical_vendor_share'],
+     features['top_vendor_category_share']) = _vendor_shares(
+        aggregate['counterparty_outflows'], vendors_df, start_dates.to_numpy(), end_dates.to_numpy()
+    )
+
+    #  P&L months ended inside each window: few distinct sets, each computed once
+    month_ends = month_end_dates(pnl_monthly_df).to_numpy()
+    order = np.argsort(month_ends, kind='stable')
+    month_lo = np.searchsorted(month_ends[order], start_dates.to_numpy(), side='right')
+    month_hi = np.searchsorted(month_ends[order], end_dates.to_numpy(), side='right')
+    spans, span_codes = np.unique(np.stack([month_lo, month_hi], axis=1), axis=0, return_inverse=True)
+    month_stats = np.array([
+        _month_features(pnl_monthly_df.iloc[np.sort(order[a:b])].reset_index(drop=True)) for a, b in spans
+    ], dtype='float64')[span_codes.reshape(-1)]
+    expenses, median_nocf, nocf_sum, revenue_variability, slope, annualized_revenue = month_stats.T
+
+    features['days_cash_on_hand'] = _ratio(features['average_daily_balance'], expenses)
+    features['median_monthly_nocf'] = np.nan_to_num(median_nocf, nan=0.0)
+    features['mom_revenue_variability'] = np.nan_to_num(revenue_variability, nan=0.0)
+    features['3_month_slope'] = np.nan_to_num(slope, nan=0.0)
+    features['annualized_revenue'] = np.nan_to_num(annualized_revenue, nan=0.0)
+    features['dscr_proxy'] = np.nan_to_num(_ratio(nocf_sum, window_sum('debt_service')), nan=0.0)
+
+    return pd.DataFrame({name: features[name] for name in FEATURES}, index=end_dates)
+
+
+def rolling_scores(aggregate, pnl_monthly_df, window_days=None, days=None, end_date=None, vendors_df=None):
+    """
+    The daily score trajectory: rolling_features plus the scorecard of every day (score,
+    grade, eligible_capital, expected_loss_annualized, reason_code_1..3), scored together.
+    """
+    features = rolling_features(aggregate, pnl_monthly_df, window_days, days, end_date, vendors_df)
+    return features.join(calculate_scorecards(features))
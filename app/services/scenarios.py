@@ -0,0 +1,179 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from app.services import scoring_engine as policy
+
+# What-if and stress testing of the scorecard policy over a book of stored feature sets
+# (e.g. a bulk_score.py results file). A scenario is one full set of policy parameters: the
+# constants calculate_scorecard uses, flattened into named numbers (see default_policy),
+# plus optional relative shifts of the features themselves. Scenarios are evaluated together
+# as broadcast (scenarios x businesses) arrays, a block of scenarios at a time, and only
+# their book-level aggregates are kept: grade mix, total eligible capital, total CECL-lite
+# expected loss and mean score.
+
+# Scenario block size: about this many (scenario, business) cells are held per array
+BLOCK_CELLS = 2_000_000
+
+# The features the score, capital and loss depend on (reason codes are not evaluated)
+FEATURES = policy.SCORED_FEATURES
+GRADES = policy.GRADES
+CUTOFF_GRADES = policy.CUTOFF_GRADES
+
+
+def default_policy():
+    """
+    The live scorecard policy as flat scenario parameters (policy.policy_parameters, less the
+    reason-code thresholds nothing here evaluates), plus zero feature shifts.
+    """
+    params = {name: value for name, value in policy.policy_parameters().items() if not name.startswith('reason_')}
+    # Deterministic stresses: each feature is scaled by (1 + shift), e.g. shift_median_monthly_nocf=-0.2
+    params.update({f'shift_{feature}': 0.0 for feature in FEATURES})
+    return params
+
+
+def policy_grid(axes=None):
+    """
+    Scenario table for every combination of the values in axes ({parameter: [values]}),
+    with the live policy for every other parameter. No axes gives the live policy alone.
+    """
+    defaults = default_policy()
+    axes = axes or {}
+    unknown = [name for name in axes if name not in defaults]
+    if unknown:
+        raise ValueError(f"Unknown policy parameters: {unknown}")
+    combinations = list(itertools.product(*axes.values()))
+    scenarios = pd.DataFrame({name: np.full(len(combinations), value) for name, value in defaults.items()})
+    for i, name in enumerate(axes):
+        scenarios[name] = [float(combo[i]) for combo in combinations]
+    return scenarios
+
+
+def monte_carlo(scenarios, draws):
+    """Repeats every scenario for `draws` feature-shock draws, numbered in a 'draw' column."""
+    repeated = scenarios.loc[scenarios.index.repeat(draws)].reset_index(drop=True)
+    repeated['draw'] = np.tile(np.arange(draws), len(scenarios))
+    return repeated
+
+
+def _check_cutoffs(scenarios):
+    cutoffs = scenarios[[f'cutoff_{grade}' for grade in CUTOFF_GRADES]].to_numpy()
+    if (np.diff(cutoffs, axis=1) > 0).any():
+        raise ValueError("Grade cutoffs must not increase from A to D")
+
+
+def _shocks(draws, shocks, n, seed, systemic):
+    """
+    Relative feature shocks for a block of draws: {feature: (len(draws), n) or (len(draws), 1)}.
+    Draw d always gets the same shocks, so scenarios that share a draw are compared on
+    common random numbers.
+    """
+    columns = 1 if systemic else n
+    z = np.stack([np.random.default_rng([seed, int(draw)]).standard_normal((len(shocks), columns)) for draw in draws])
+    return {feature: sigma * z[:, i, :] for i, (feature, sigma) in enumerate(shocks.items())}
+
+
+def _per_scenario_sum(values, rows):
+    return values.sum(axis=1) if values.ndim == 2 else np.full(rows, values.sum())
+
+
+def _evaluate_block(features, params, rows, shocked=None):
+    """
+    Aggregates for a block of `rows` scenarios. features holds (n,) arrays; params holds a
+    float for a parameter the whole block shares and a (rows, 1) array otherwise; shocked
+    holds optional (rows, n) or (rows, 1) relative shocks. Arrays are only (rows, n) from the
+    first step that depends on a varying parameter; policy.score_arrays does the scoring, as
+    it does for calculate_scorecards.
+    """
+    values = {}
+    for name in FEATURES:
+        shift = params[f'shift_{name}']
+        value = features[name] * (1 + shift) if np.any(shift) else features[name]
+        if shocked and name in shocked:
+            value = value * (1 + shocked[name])
+        values[name] = value
+    scored = policy.score_arrays(values, params, rows)
+    grade_idx, score = scored['grade_idx'], scored['score']
+
+    #  Book-level aggregates: one bincount gives every scenario's grade mix
+    if grade_idx.ndim == 1:
+        grade_counts = np.tile(np.bincount(grade_idx, minlength=len(GRADES)), (rows, 1))
+    else:
+        grade_counts = np.bincount(
+            (grade_idx + np.arange(rows)[:, None] * len(GRADES)).ravel(), minlength=rows * len(GRADES)
+        ).reshape(rows, len(GRADES))
+    return {
+        'grade_counts': grade_counts,
+        'total_eligible_capital': _per_scenario_sum(scored['eligible_capital'], rows),
+        'total_expected_loss': _per_scenario_sum(scored['expected_loss_annualized'], rows),
+        'mean_score': _per_scenario_sum(score, rows) / len(score.T) if len(score.T) else np.full(rows, np.nan),
+    }
+
+
+def evaluate_scenarios(features_df, scenarios=None, shocks=None, seed=0, systemic=False, block_cells=BLOCK_CELLS):
+    """
+    Evaluates every scenario against every business in features_df (one row per business,
+    with the FEATURES columns). scenarios is a table from policy_grid / monte_carlo (default:
+    the live policy). shocks ({feature: sigma}) multiplies each feature by (1 + sigma * z),
+    z standard normal per scenario 'draw' and business, or per draw for the whole book when
+    systemic is set.
+
+    Returns the scenarios table with, per scenario, the count and share of businesses in
+    each grade, total eligible capital, total expected loss and mean score.
+    """
+    scenarios = policy_grid() if scenarios is None else scenarios.reset_index(drop=True)
+    _check_cutoffs(scenarios)
+    if shocks:
+        unknown = [name for name in shocks if name not in FEATURES]
+        if unknown:
+            raise ValueError(f"Unknown features to shock: {unknown}")
+        draws = scenarios['draw'].to_numpy() if 'draw' in scenarios else np.zeros(len(scenarios), dtype='int64')
+    features = {name: np.asarray(features_df[name], dtype='float64') for name in FEATURES}
+    n = len(features_df)
+    defaults = default_policy()
+    columns = {name: scenarios[name].to_numpy(dtype='float64') if name in scenarios else np.full(len(scenarios), value)
+               for name, value in defaults.items()}
+
+    block = max(1, block_cells // max(n, 1))
+    parts = []
+    for start in range(0, len(scenarios), block):
+        stop = min(start + block, len(scenarios))
+        params = {}
+        for name, values in columns.items():
+            values = values[start:stop]
+            params[name] = float(values[0]) if (values == values[0]).all() else values[:, None]
+        shocked = _shocks(draws[start:stop], shocks, n, seed, systemic) if shocks else None
+        parts.append(_evaluate_block(features, params, stop - start, shocked))
+
+    grade_counts = np.concatenate([part['grade_counts'] for part in parts])
+    results = scenarios.copy()
+    for i, grade in enumerate(GRADES):
+        results[f'grade_{grade}'] = grade_counts[:, i]
+    for i, grade in enumerate(GRADES):
+        results[f'share_{grade}'] = grade_counts[:, i] / n if n else np.nan
+    for name in ('total_eligible_capital', 'total_expected_loss', 'mean_score'):
+        results[name] = np.concatenate([part[name] for part in parts])
+    return results
+
+
+SUMMARY_METRICS = ['total_eligible_capital', 'total_expected_loss', 'mean_score'] + [f'share_{grade}' for grade in GRADES]
+
+
+def summarize(results, by=None, percentiles=(0.05, 0.5, 0.95)):
+    """
+    Distribution of the book-level metrics across scenarios: mean and percentiles, per
+    combination of the `by` columns (e.g. the policy grid axes, across Monte Carlo draws).
+    """
+    def describe(group):
+        stats = {}
+        for metric in SUMMARY_METRICS:
+            values = group[metric].to_numpy()
+            stats[f'{metric}_mean'] = values.mean()
+            for q in percentiles:
+                stats[f'{metric}_p{round(q * 100):02d}'] = np.quantile(values, q)
+        return pd.Series(stats)
+
+    if not by:
+        return describe(results).to_frame().T
+    return results.groupby(list(by), sort=False)[SUMMARY_METRICS].apply(describe).reset_index()
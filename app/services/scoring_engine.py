@@ -1,23 +1,61 @@
 import numpy as np
+import pandas as pd
+
+#  Scoring policy, shared by the single-business and batch scorers
+WEIGHTS = {'Liquidity': 0.25, 'Cash flow': 0.35, 'Discipline': 0.20, 'Stability': 0.10, 'Concentration': 0.10}
+# Minimum score for each grade, best first; anything below the last cutoff is 'E'
+GRADE_CUTOFFS = [('A', 80), ('B', 70), ('C', 60), ('D', 45)]
+BASE_MULTIPLES = {'A': 4.0, 'B': 3.0, 'C': 2.0, 'D': 1.0, 'E': 0}
+PD_BY_GRADE = {'A': 0.015, 'B': 0.03, 'C': 0.06, 'D': 0.12, 'E': 0.25}
+GRADES = ['A', 'B', 'C', 'D', 'E']
+# Eligible capital adjustments: (threshold, multiplier applied past it)
+VOLATILITY_FLOOR = 0.6               # the volatility discount never goes below this
+LIQUIDITY_GUARD = (15, 0.5)          # days cash on hand below the threshold
+DISCIPLINE_PENALTY = (2, 0.8)        # NSF count at or above the threshold
+CONCENTRATION_PENALTY = (0.35, 0.85) # top vendor share above the threshold
+REVENUE_CAP = 0.15                   # eligible capital is at most this share of annualized revenue
+MIN_CAPITAL = 5000                   # floor for grades A and B
+# CECL-lite loss given default: no NSF and never overdrawn / otherwise; exposure at default share
+LGD_CLEAN, LGD_DEFAULT = 0.35, 0.45
+EAD_FACTOR = 0.70
+# Component normalisation to 0-100: liquidity is full at this many days cash on hand, each NSF
+# costs NSF_POINTS, and top vendor share past the floor costs CONCENTRATION_POINTS per unit
+LIQUIDITY_FULL_DAYS = 30
+NSF_POINTS = 20
+CONCENTRATION_FLOOR, CONCENTRATION_POINTS = 0.2, 200
+MISSING_COMPONENT_SCORE = 50         # a variability that could not be computed
+DEFAULT_VOLATILITY = 0.5             # stands in for a missing or zero weekly variability in the discount
+# Reason-code thresholds: risk codes fire past them, positive codes within them
+REASON_THRESHOLDS = {
+    'LOW_LIQ': 15,                   # days cash on hand below
+    'REV_VAR': 0.3,                  # MoM revenue variability above
+    'HIGH_CONC': 0.35,               # top vendor share above
+    'NSF_EVENTS': 2,                 # NSF count at or above
+    'LOW_DSCR': 1.25,                # DSCR proxy below
+    'REV_STABLE': 0.1,               # MoM revenue variability below
+    'CASH_BUFFER': 15,               # days cash on hand at or above
+    'CONSISTENT_CASHFLOW': 0.3,      # weekly net cash flow variability below
+    'DIVERSIFIED_VENDORS': 0.2,      # top vendor share below
+}
 
 def calculate_scorecard(features):
     """Calculates the scorecard based on the computed features."""
     
     #  1. Normalized the features to a 0-100 scale 
-    liquidity_score = np.clip((features['days_cash_on_hand'] / 30) * 100, 0, 100)
+    liquidity_score = np.clip((features['days_cash_on_hand'] / LIQUIDITY_FULL_DAYS) * 100, 0, 100)
     
     # If median cash flow is negative, the score is 0. Otherwise, it's based on variability.
     if features['median_monthly_nocf'] < 0:
         cash_flow_score = 0
     else:
-        cash_flow_score = np.clip((1 - features['weekly_net_cashflow_variability']) * 100, 0, 100) if features['weekly_net_cashflow_variability'] is not None else 50
+        cash_flow_score = np.clip((1 - features['weekly_net_cashflow_variability']) * 100, 0, 100) if features['weekly_net_cashflow_variability'] is not None else MISSING_COMPONENT_SCORE
         
-    stability_score = np.clip((1 - features['mom_revenue_variability']) * 100, 0, 100) if features['mom_revenue_variability'] is not None else 50
-    discipline_score = 100 - np.clip(features['nsf_count'] * 20, 0, 100)
-    concentration_score = 100 - np.clip((features['top_vendor_share'] - 0.2) * 200, 0, 100)
+    stability_score = np.clip((1 - features['mom_revenue_variability']) * 100, 0, 100) if features['mom_revenue_variability'] is not None else MISSING_COMPONENT_SCORE
+    discipline_score = 100 - np.clip(features['nsf_count'] * NSF_POINTS, 0, 100)
+    concentration_score = 100 - np.clip((features['top_vendor_share'] - CONCENTRATION_FLOOR) * CONCENTRATION_POINTS, 0, 100)
 
     #  2. CFX-Lite Score 
-    weights = {'Liquidity': 0.25, 'Cash flow': 0.35, 'Discipline': 0.20, 'Stability': 0.10, 'Concentration': 0.10}
+    weights = WEIGHTS
     score = sum([
         liquidity_score * weights['Liquidity'],
         cash_flow_score * weights['Cash flow'],
@@ -28,50 +66,51 @@ def calculate_scorecard(features):
 
     #  3. Grade 
     grade = 'E'
-    if score >= 80: grade = 'A'
-    elif score >= 70: grade = 'B'
-    elif score >= 60: grade = 'C'
-    elif score >= 45: grade = 'D'
+    for candidate, cutoff in GRADE_CUTOFFS:
+        if score >= cutoff:
+            grade = candidate
+            break
 
     #  4. Eligible Capital 
-    base_multiples = {'A': 4.0, 'B': 3.0, 'C': 2.0, 'D': 1.0, 'E': 0}
+    base_multiples = BASE_MULTIPLES
     # If the grade is poor, base capital will be low or zero.
     base_capital = features['median_monthly_nocf'] * base_multiples[grade]
     
     # Ensure base capital isn't negative, which makes no sense.
     base_capital = max(0, base_capital)
 
-    volatility_discount = max(0.6, 1 - (features['weekly_net_cashflow_variability'] or 0.5))
-    liquidity_guard = 0.5 if features['days_cash_on_hand'] < 15 else 1.0
-    discipline_penalty = 0.8 if features['nsf_count'] >= 2 else 1.0
-    concentration_penalty = 0.85 if features['top_vendor_share'] > 0.35 else 1.0
+    volatility_discount = max(VOLATILITY_FLOOR, 1 - (features['weekly_net_cashflow_variability'] or DEFAULT_VOLATILITY))
+    liquidity_guard = LIQUIDITY_GUARD[1] if features['days_cash_on_hand'] < LIQUIDITY_GUARD[0] else 1.0
+    discipline_penalty = DISCIPLINE_PENALTY[1] if features['nsf_count'] >= DISCIPLINE_PENALTY[0] else 1.0
+    concentration_penalty = CONCENTRATION_PENALTY[1] if features['top_vendor_share'] > CONCENTRATION_PENALTY[0] else 1.0
     adjusted_capital = base_capital * volatility_discount * liquidity_guard * discipline_penalty * concentration_penalty
 
-    revenue_cap = 0.15 * features['annualized_revenue']
+    revenue_cap = REVENUE_CAP * features['annualized_revenue']
     eligible_capital = min(adjusted_capital, revenue_cap)
-    if grade in ['A', 'B']: eligible_capital = max(eligible_capital, 5000)
+    if grade in ['A', 'B']: eligible_capital = max(eligible_capital, MIN_CAPITAL)
 
     #  5. CECL-lite Expected Loss 
-    pd_by_grade = {'A': 0.015, 'B': 0.03, 'C': 0.06, 'D': 0.12, 'E': 0.25}
-    lgd = 0.35 if features['nsf_count'] == 0 and features['percent_of_days_below_zero'] == 0 else 0.45
-    ead = 0.70 * eligible_capital
+    pd_by_grade = PD_BY_GRADE
+    lgd = LGD_CLEAN if features['nsf_count'] == 0 and features['percent_of_days_below_zero'] == 0 else LGD_DEFAULT
+    ead = EAD_FACTOR * eligible_capital
     expected_loss_annualized = pd_by_grade[grade] * lgd * ead
 
     #  6. Reason Codes 
+    thresholds = REASON_THRESHOLDS
     reasons = []
-    if features['days_cash_on_hand'] < 15: reasons.append('LOW_LIQ')
-    if features['mom_revenue_variability'] > 0.3: reasons.append('REV_VAR')
-    if features['top_vendor_share'] > 0.35: reasons.append('HIGH_CONC')
-    if features['nsf_count'] >= 2: reasons.append('NSF_EVENTS')
-    if features['dscr_proxy'] < 1.25: reasons.append('LOW_DSCR')
+    if features['days_cash_on_hand'] < thresholds['LOW_LIQ']: reasons.append('LOW_LIQ')
+    if features['mom_revenue_variability'] > thresholds['REV_VAR']: reasons.append('REV_VAR')
+    if features['top_vendor_share'] > thresholds['HIGH_CONC']: reasons.append('HIGH_CONC')
+    if features['nsf_count'] >= thresholds['NSF_EVENTS']: reasons.append('NSF_EVENTS')
+    if features['dscr_proxy'] < thresholds['LOW_DSCR']: reasons.append('LOW_DSCR')
     if features['median_monthly_nocf'] < 0: reasons.append('NEGATIVE_CASHFLOW')
 
     if not reasons:
-        if features['mom_revenue_variability'] < 0.1: reasons.append('REV_STABLE')
-        if features['days_cash_on_hand'] >= 15: reasons.append('CASH_BUFFER')
+        if features['mom_revenue_variability'] < thresholds['REV_STABLE']: reasons.append('REV_STABLE')
+        if features['days_cash_on_hand'] >= thresholds['CASH_BUFFER']: reasons.append('CASH_BUFFER')
         if features['nsf_count'] == 0: reasons.append('NO_NSF')
-        if features['weekly_net_cashflow_variability'] < 0.3: reasons.append('CONSISTENT_CASHFLOW')
-        if features['top_vendor_share'] < 0.2: reasons.append('DIVERSIFIED_VENDORS')
+        if features['weekly_net_cashflow_variability'] < thresholds['CONSISTENT_CASHFLOW']: reasons.append('CONSISTENT_CASHFLOW')
+        if features['top_vendor_share'] < thresholds['DIVERSIFIED_VENDORS']: reasons.append('DIVERSIFIED_VENDORS')
 
     return {
         'score': score,
@@ -80,3 +119,180 @@ def calculate_scorecard(features):
         'expected_loss_annualized': expected_loss_annualized,
         'reason_codes': reasons[:3]
     }
+
+
+#  Batch scoring
+# Reason codes in the order calculate_scorecard appends them: risk codes first, then the
+# positive codes that are only reported when no risk code fired.
+RISK_REASON_CODES = ['LOW_LIQ', 'REV_VAR', 'HIGH_CONC', 'NSF_EVENTS', 'LOW_DSCR', 'NEGATIVE_CASHFLOW']
+POSITIVE_REASON_CODES = ['REV_STABLE', 'CASH_BUFFER', 'NO_NSF', 'CONSISTENT_CASHFLOW', 'DIVERSIFIED_VENDORS']
+# The features score_arrays reads
+SCORED_FEATURES = [
+    'days_cash_on_hand', 'median_monthly_nocf', 'weekly_net_cashflow_variability', 'mom_revenue_variability',
+    'nsf_count', 'top_vendor_share', 'annualized_revenue', 'percent_of_days_below_zero',
+]
+CUTOFF_GRADES = [grade for grade, _ in GRADE_CUTOFFS]
+
+def _weight_name(component):
+    return 'weight_' + component.lower().replace(' ', '_')
+
+def policy_parameters():
+    """
+    The scoring policy above flattened into named floats. score_arrays and the reason-code
+    flags read these, so the batch scorer and the stress engine (which varies them per
+    scenario) evaluate the same definitions.
+    """
+    params = {_weight_name(component): weight for component, weight in WEIGHTS.items()}
+    params.update({f'cutoff_{grade}': cutoff for grade, cutoff in GRADE_CUTOFFS})
+    params.update({f'multiple_{grade}': BASE_MULTIPLES[grade] for grade in GRADES})
+    params.update({f'pd_{grade}': PD_BY_GRADE[grade] for grade in GRADES})
+    params.update({
+        'liquidity_full_days': LIQUIDITY_FULL_DAYS, 'nsf_points': NSF_POINTS,
+        'concentration_floor': CONCENTRATION_FLOOR, 'concentration_points': CONCENTRATION_POINTS,
+        'missing_component_score': MISSING_COMPONENT_SCORE, 'default_volatility': DEFAULT_VOLATILITY,
+        'volatility_floor': VOLATILITY_FLOOR,
+        'liquidity_guard_days': LIQUIDITY_GUARD[0], 'liquidity_guard_factor': LIQUIDITY_GUARD[1],
+        'discipline_penalty_nsf': DISCIPLINE_PENALTY[0], 'discipline_penalty_factor': DISCIPLINE_PENALTY[1],
+        'concentration_penalty_share': CONCENTRATION_PENALTY[0],
+        'concentration_penalty_factor': CONCENTRATION_PENALTY[1],
+        'revenue_cap': REVENUE_CAP, 'min_capital': MIN_CAPITAL,
+        'lgd_clean': LGD_CLEAN, 'lgd_default': LGD_DEFAULT, 'ead_factor': EAD_FACTOR,
+    })
+    params.update({f'reason_{code.lower()}': threshold for code, threshold in REASON_THRESHOLDS.items()})
+    return {name: float(value) for name, value in params.items()}
+
+def _feature_array(features_df, name):
+    return np.asarray(features_df[name], dtype='float64')
+
+def _lookup(table, grade_idx, rows):
+    """Per-grade parameter values (scalars or (rows, 1) arrays, in GRADES order) at grade_idx."""
+    if all(np.ndim(value) == 0 for value in table):
+        return np.array(table)[grade_idx]
+    table = np.hstack([np.broadcast_to(value, (rows, 1)) for value in table])
+    return np.take_along_axis(table, np.broadcast_to(grade_idx, (rows, grade_idx.shape[-1])), axis=1)
+
+def score_arrays(values, params, rows=1):
+    """
+    Score, grade index (into GRADES), eligible capital and expected loss for arrays of the
+    SCORED_FEATURES under the policy_parameters in params. Feature values are (n,) arrays or,
+    for the stress engine, (rows, n) / (rows, 1); a parameter is a float or a (rows, 1) array
+    and everything broadcasts. Mirrors calculate_scorecard.
+    """
+    days_cash, nocf = values['days_cash_on_hand'], values['median_monthly_nocf']
+    weekly_var, mom_var = values['weekly_net_cashflow_variability'], values['mom_revenue_variability']
+    nsf, top_vendor = values['nsf_count'], values['top_vendor_share']
+    missing_score = params['missing_component_score']
+
+    #  1. Normalized scores (a missing variability is NaN here, None in the scalar path)
+    liquidity_score = np.clip((days_cash / params['liquidity_full_days']) * 100, 0, 100)
+    cash_flow_score = np.where(
+        nocf < 0, 0.0, np.where(np.isnan(weekly_var), missing_score, np.clip((1 - weekly_var) * 100, 0, 100))
+    )
+    stability_score = np.where(np.isnan(mom_var), missing_score, np.clip((1 - mom_var) * 100, 0, 100))
+    discipline_score = 100 - np.clip(nsf * params['nsf_points'], 0, 100)
+    concentration_score = 100 - np.clip((top_vendor - params['concentration_floor']) * params['concentration_points'], 0, 100)
+
+    #  2. CFX-Lite Score (summed in the same order as the scalar path)
+    score = (
+        liquidity_score * params['weight_liquidity']
+        + cash_flow_score * params['weight_cash_flow']
+        + discipline_score * params['weight_discipline']
+        + stability_score * params['weight_stability']
+        + concentration_score * params['weight_concentration']
+    )
+
+    #  3. Grade: the first cutoff reached, best first
+    grade_idx = np.full(score.shape, len(GRADES) - 1, dtype='int64')
+    for i in reversed(range(len(CUTOFF_GRADES))):
+        grade_idx = np.where(score >= params[f'cutoff_{CUTOFF_GRADES[i]}'], i, grade_idx)
+
+    #  4. Eligible Capital
+    base_capital = nocf * _lookup([params[f'multiple_{grade}'] for grade in GRADES], grade_idx, rows)
+    base_capital = np.where(base_capital > 0, base_capital, 0.0)
+
+    # `weekly_var or DEFAULT_VOLATILITY` in the scalar path also replaces an exact zero
+    effective_var = np.where(np.isnan(weekly_var) | (weekly_var == 0), params['default_volatility'], weekly_var)
+    volatility_discount = np.maximum(1 - effective_var, params['volatility_floor'])
+    liquidity_guard = np.where(days_cash < params['liquidity_guard_days'], params['liquidity_guard_factor'], 1.0)
+    discipline_penalty = np.where(nsf >= params['discipline_penalty_nsf'], params['discipline_penalty_factor'], 1.0)
+    concentration_penalty = np.where(
+        top_vendor > params['concentration_penalty_share'], params['concentration_penalty_factor'], 1.0
+    )
+    adjusted_capital = base_capital * volatility_discount * liquidity_guard * discipline_penalty * concentration_penalty
+
+    revenue_cap = params['revenue_cap'] * values['annualized_revenue']
+    eligible_capital = np.where(revenue_cap < adjusted_capital, revenue_cap, adjusted_capital)
+    eligible_capital = np.where(
+        (grade_idx <= 1) & (params['min_capital'] > eligible_capital), params['min_capital'], eligible_capital
+    )
+
+    #  5. CECL-lite Expected Loss
+    pds = _lookup([params[f'pd_{grade}'] for grade in GRADES], grade_idx, rows)
+    lgd = np.where((nsf == 0) & (values['percent_of_days_below_zero'] == 0), params['lgd_clean'], params['lgd_default'])
+    expected_loss_annualized = pds * lgd * (params['ead_factor'] * eligible_capital)
+
+    return {
+        'score': score,
+        'grade_idx': grade_idx,
+        'eligible_capital': eligible_capital,
+        'expected_loss_annualized': expected_loss_annualized,
+    }
+
+def reason_flags(values, params):
+    """Boolean (n, len(RISK_REASON_CODES)) and (n, len(POSITIVE_REASON_CODES)) flags for top_reason_codes."""
+    days_cash, nocf = values['days_cash_on_hand'], values['median_monthly_nocf']
+    mom_var, nsf, top_vendor = values['mom_revenue_variability'], values['nsf_count'], values['top_vendor_share']
+    risk_flags = np.column_stack([
+        days_cash < params['reason_low_liq'],
+        mom_var > params['reason_rev_var'],
+        top_vendor > params['reason_high_conc'],
+        nsf >= params['reason_nsf_events'],
+        values['dscr_proxy'] < params['reason_low_dscr'],
+        nocf < 0,
+    ])
+    positive_flags = np.column_stack([
+        mom_var < params['reason_rev_stable'],
+        days_cash >= params['reason_cash_buffer'],
+        nsf == 0,
+        values['weekly_net_cashflow_variability'] < params['reason_consistent_cashflow'],
+        top_vendor < params['reason_diversified_vendors'],
+    ])
+    return risk_flags, positive_flags
+
+def top_reason_codes(risk_flags, positive_flags, limit=3):
+    """
+    Picks the first `limit` reason codes per row from boolean flag matrices of shape
+    (n, len(RISK_REASON_CODES)) and (n, len(POSITIVE_REASON_CODES)). Positive codes only
+    count on rows where no risk flag is set. Returns an (n, limit) object array padded with None.
+    """
+    flags = np.concatenate([risk_flags, positive_flags & ~risk_flags.any(axis=1, keepdims=True)], axis=1)
+    codes = np.array(RISK_REASON_CODES + POSITIVE_REASON_CODES + [None], dtype=object)
+    # Stable sort puts the set flags first while keeping their original order
+    order = np.argsort(~flags, axis=1, kind='stable')[:, :limit]
+    picked = np.take_along_axis(flags, order, axis=1)
+    return codes[np.where(picked, order, len(codes) - 1)]
+
+def calculate_scorecards(features_df):
+    """
+    Vectorized calculate_scorecard: scores a columnar table of features, one row per business.
+
+    Accepts a DataFrame (or dict of equal-length arrays) with the feature columns produced by
+    compute_features and returns a DataFrame on the same index with score, grade,
+    eligible_capital, expected_loss_annualized and reason_code_1..3 (None when fewer apply).
+    Results match calling calculate_scorecard on each row.
+    """
+    index = features_df.index if isinstance(features_df, pd.DataFrame) else None
+    values = {name: _feature_array(features_df, name) for name in SCORED_FEATURES + ['dscr_proxy']}
+    params = policy_parameters()
+    scored = score_arrays(values, params)
+    reason_codes = top_reason_codes(*reason_flags(values, params))
+
+    return pd.DataFrame({
+        'score': scored['score'],
+        'grade': np.array(GRADES, dtype=object)[scored['grade_idx']],
+        'eligible_capital': scored['eligible_capital'],
+        'expected_loss_annualized': scored['expected_loss_annualized'],
+        'reason_code_1': reason_codes[:, 0],
+        'reason_code_2': reason_codes[:, 1],
+        'reason_code_3': reason_codes[:, 2],
+    }, index=index)
@@ -0,0 +1,229 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from app.services.ingestion import iter_bank_tx_chunks, read_pnl_monthly, read_vendors
+from app.services.daily_aggregate import build_daily_aggregate
+from app.services.data_validation import balance_continuity_errors, category_coverage_low, validate_data
+from app.services.feature_engineering import compute_window_features, vendor_lookup
+
+# Rows parsed per chunk; peak memory is roughly one chunk plus per-day and per-counterparty state
+DEFAULT_CHUNKSIZE = 250_000
+# Per-counterparty outflow totals kept while streaming; beyond this many payees the
+# concentration features are approximate, within the reported vendor_share_error_bound
+COUNTERPARTY_CAPACITY = int(os.environ.get("SCORING_COUNTERPARTY_CAPACITY", 10_000))
+# Hash buckets spilled to disk for duplicate detection; one bucket is in memory at a time
+DUPLICATE_BUCKETS = 64
+EMPTY_DAILY_COLUMNS = [
+    'closing_balance', 'net_flow', 'outflow_total', 'nsf_count', 'returned_ach_count',
+    'due_payments', 'late_payments', 'debt_service', 'inflow_credit', 'inflow_total'
+]
+
+
+def _merge_daily(accumulated, chunk_daily):
+    """Folds one chunk's daily aggregate into the running one (file order is kept for 'last')."""
+    if accumulated is None:
+        return chunk_daily
+    combined = pd.concat([accumulated, chunk_daily]).fillna(0.0)
+    how = {col: 'sum' for col in combined.columns}
+    how['closing_balance'] = 'last'
+    return combined.groupby(level=0, sort=True).agg(how)
+
+
+class _DuplicateCounter:
+    """
+    Counts exact duplicate rows (as DataFrame.duplicated would) in bounded memory. Each
+    chunk's 64-bit row hashes are spilled to on-disk buckets partitioned by hash, so equal
+    rows always land in the same bucket; at the end each bucket is loaded on its own and
+    duplicates are rows minus distinct hashes. Works for feeds in any row order.
+    """
+
+    def __init__(self, buckets=DUPLICATE_BUCKETS):
+        self.buckets = buckets
+        self._dir = tempfile.TemporaryDirectory(prefix='bank_tx_hashes_')
+        self._files = [open(os.path.join(self._dir.name, f'{i}.bin'), 'wb') for i in range(buckets)]
+
+    def update(self, chunk):
+        hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        bucket = hashes % np.uint64(self.buckets)
+        order = np.argsort(bucket, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(bucket.astype('int64'), minlength=self.buckets))])
+        sorted_hashes = hashes[order]
+        for i in range(self.buckets):
+            if bounds[i + 1] > bounds[i]:
+                sorted_hashes[bounds[i]:bounds[i + 1]].tofile(self._files[i])
+
+    def count(self):
+        duplicates = 0
+        for f in self._files:
+            f.close()
+            bucket_hashes = np.fromfile(f.name, dtype='uint64')
+            duplicates += len(bucket_hashes) - len(np.unique(bucket_hashes))
+        return int(duplicates)
+
+    def close(self):
+        for f in self._files:
+            f.close()
+        self._dir.cleanup()
+
+
+class _CounterpartyTotals:
+    """
+    Outflow totals per counterparty in bounded memory: at most `capacity` are kept, as a
+    mergeable Misra-Gries summary. While a feed has no more distinct payees than that, the
+    totals are exact. Past it, each chunk's overflow is trimmed by subtracting the
+    (capacity + 1)-th largest total from every total and dropping those left at zero. Every
+    kept total then undercounts by at most `error`, which never exceeds the total outflows
+    / (capacity + 1), and any payee with more than `error` of outflows is still kept.
+    Outflows to critical vendors and per vendor category are joined per chunk and kept
+    exactly, since the vendor master is small.
+    """
+
+    def __init__(self, vendors_df, capacity=COUNTERPARTY_CAPACITY):
+        self.vendors = vendors_df
+        self.capacity = capacity
+        self.totals = pd.Series(dtype='float64')
+        self.error = 0.0
+        self.total = 0.0
+        self.critical = 0.0
+        self.by_category = np.zeros(0)
+
+    def update(self, chunk_totals):
+        chunk_totals.index = chunk_totals.index.astype(object)
+        spending = chunk_totals.to_numpy()
+        is_critical, category_codes, categories = vendor_lookup(chunk_totals.index, self.vendors)
+        known = category_codes >= 0
+        self.total += spending.sum()
+        self.critical += spending[is_critical].sum()
+        by_category = np.bincount(category_codes[known], weights=spending[known], minlength=len(categories))
+        self.by_category = by_category if not len(self.by_category) else self.by_category + by_category
+
+        totals = self.totals.add(chunk_totals, fill_value=0.0)
+        if len(totals) > self.capacity:
+            cut = len(totals) - self.capacity - 1
+            threshold = np.partition(totals.to_numpy(), cut)[cut]
+            totals = totals - threshold
+            totals = totals[totals > 0]
+            self.error += threshold
+        self.totals = totals
+
+    def features(self):
+        """The concentration features, each share a lower bound within vendor_share_error_bound."""
+        features = dict.fromkeys(
+            ['top_vendor_share', 'top_5_vendors_share', 'critical_vendor_share', 'top_vendor_category_share',
+             'vendor_share_error_bound'], 0
+        )
+        if self.total > 0 and len(self.totals):
+            top_5 = np.sort(self.totals.to_numpy())[-5:]
+            features.update({
+                'top_vendor_share': top_5[-1] / self.total,
+                'top_5_vendors_share': top_5.sum() / self.total,
+                'critical_vendor_share': self.critical / self.total,
+                'top_vendor_category_share': self.by_category.max() / self.total if len(self.by_category) else 0,
+                'vendor_share_error_bound': self.error / self.total,
+            })
+        return features
+
+
+def stream_business_data(bank_tx_source, pnl_monthly_source, vendors_source=None, chunksize=DEFAULT_CHUNKSIZE,
+                         on_chunk=None, daily_counterparties=False):
+    """
+    Reads bank_tx in chunks and keeps only bounded accumulators: the per-day aggregate,
+    per-counterparty outflow totals (at most COUNTERPARTY_CAPACITY of them) and the running
+    bank_tx data-quality counters. P&L and vendors are small and read whole. on_chunk, if
+    given, is called with each parsed bank_tx chunk (e.g. to store it).
+
+    daily_counterparties=True also keeps outflows per (date, counterparty), as
+    build_daily_aggregate returns them, so trailing windows can be sliced from the result
+    (see daily_aggregate.slice_window). That state grows with the distinct payees per day
+    rather than staying bounded, but never with the number of rows.
+    """
+    vendors_df = read_vendors(vendors_source) if vendors_source is not None else None
+    daily = None
+    counterparty_days = []
+    counterparty_totals = _CounterpartyTotals(vendors_df)
+    duplicates = _DuplicateCounter()
+    checks = {'bank_tx_missing_dates': 0, 'bank_tx_duplicate_rows': 0, 'bank_tx_negative_or_empty_amounts': 0}
+    missing_categories = total_transactions = 0
+    last_date = pd.NaT
+
+    try:
+        for chunk in iter_bank_tx_chunks(bank_tx_source, chunksize):
+            if chunk.empty:
+                continue
+            if on_chunk is not None:
+                on_chunk(chunk)
+            #  Row-level checks, carried across chunk boundaries
+            dates = chunk['date']
+            gaps = int(dates.diff().dt.days.gt(1).sum())
+            if pd.notna(last_date) and pd.notna(dates.iloc[0]) and (dates.iloc[0] - last_date).days > 1:
+                gaps += 1
+            checks['bank_tx_missing_dates'] += gaps
+            last_date = dates.iloc[-1]
+            checks['bank_tx_negative_or_empty_amounts'] += int(((chunk['amount'] < 0) | chunk['amount'].isnull()).sum())
+            missing_categories += int(chunk['category'].isnull().sum())
+            total_transactions += len(chunk)
+            duplicates.update(chunk)
+
+            #  Aggregates the features need
+            chunk_aggregate = build_daily_aggregate(chunk)
+            daily = _merge_daily(daily, chunk_aggregate['daily'])
+            if daily_counterparties:
+                counterparty_days.append(chunk_aggregate['counterparty_outflows'])
+            counterparty_totals.update(
+                chunk_aggregate['counterparty_outflows'].groupby('counterparty', observed=True)['amount'].sum()
+            )
+
+        checks['bank_tx_duplicate_rows'] = duplicates.count()
+    finally:
+        duplicates.close()
+
+    if daily is None:
+        daily = pd.DataFrame(
+            {col: pd.Series(dtype='float64') for col in EMPTY_DAILY_COLUMNS}, index=pd.DatetimeIndex([], name='date')
+        )
+    checks['balance_continuity_errors'] = (
+        balance_continuity_errors(daily['net_flow'], daily['closing_balance']) if len(daily) else 0
+    )
+    checks['category_coverage_low'] = category_coverage_low(missing_categories, total_transactions)
+
+    if daily_counterparties and counterparty_days:
+        # A day cut by a chunk boundary has rows in two chunks' aggregates
+        counterparty_outflows = pd.concat(counterparty_days).groupby(
+            ['date', 'counterparty'], observed=True, sort=True
+        )['amount'].sum().reset_index()
+    elif daily_counterparties:
+        counterparty_outflows = pd.DataFrame({
+            'date': pd.Series(dtype='datetime64[ns]'), 'counterparty': pd.Series(dtype=object),
+            'amount': pd.Series(dtype='float64'),
+        })
+    else:
+        counterparty_outflows = counterparty_totals.totals.rename_axis('counterparty').rename('amount').reset_index()
+
+    return {
+        'daily': daily,
+        'counterparty_outflows': counterparty_outflows,
+        'concentration': counterparty_totals.features(),
+        'bank_tx_checks': checks,
+        'row_count': total_transactions,
+        'pnl_monthly': read_pnl_monthly(pnl_monthly_source),
+        'vendors': vendors_df,
+    }
+
+
+def validate_streamed_data(streamed):
+    """validate_data on the streamed data: the bank_tx rules use the counts taken while streaming."""
+    precomputed = dict(streamed['bank_tx_checks'], bank_tx_empty=1 if streamed['row_count'] == 0 else 0)
+    return validate_data(streamed, precomputed=precomputed)
+
+
+def compute_streamed_features(streamed):
+    """
+    Same features as compute_features, computed from the streamed accumulators, plus
+    vendor_share_error_bound: 0 unless the feed had more than COUNTERPARTY_CAPACITY payees.
+    """
+    features = compute_window_features(streamed)
+    features.update(streamed['concentration'])
+    return features
@@ -0,0 +1,43 @@
+import tempfile
+
+# Entry points the server submits to the scoring pool. A task is pickled as a reference to
+# one of these functions, and this module imports nothing heavy, so the server process never
+# loads pandas itself: each function imports the pipeline when it runs, in the worker.
+
+
+def score_window(*args):
+    from app.services.pipeline import score_window
+    return score_window(*args)
+
+
+def score_history(*args):
+    from app.services.pipeline import score_history
+    return score_history(*args)
+
+
+def rescore_business(*args):
+    from app.services.pipeline import rescore_business
+    return rescore_business(*args)
+
+
+def append_transactions(*args):
+    from app.services.pipeline import append_transactions
+    return append_transactions(*args)
+
+
+def score_trajectory(*args):
+    from app.services.pipeline import score_trajectory
+    return score_trajectory(*args)
+
+
+def warm_up():
+    """
+    Primes a fresh worker before it takes traffic: imports the pipeline, scores a synthetic
+    business (see pipeline.warm_up) and renders its memo, which sets up matplotlib's backend
+    and fonts and fpdf. Everything is written to a scratch directory and removed.
+    """
+    from app.services.memo_renderer import render_memo
+    from app.services.pipeline import warm_up
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        render_memo(warm_up(output_dir))
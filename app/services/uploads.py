@@ -0,0 +1,125 @@
+import csv
+import hashlib
+import os
+from pathlib import Path
+
+from app.services.ingestion import BANK_TX_REQUIRED_COLUMNS, PNL_MONTHLY_REQUIRED_COLUMNS, VENDORS_REQUIRED_COLUMNS
+
+#  Upload limits (environment overridable)
+MAX_UPLOAD_BYTES = int(os.environ.get("SCORING_MAX_UPLOAD_MB", 1024)) * 1024 * 1024
+MAX_UPLOAD_ROWS = int(os.environ.get("SCORING_MAX_UPLOAD_ROWS", 20_000_000))
+# Keep a copy of every raw upload in its request's workspace (uploads/<business_name>/<id>/) for audit
+AUDIT_UPLOADS = os.environ.get("SCORING_AUDIT_UPLOADS", "0") == "1"
+# bank_tx files larger than this are spilled to disk and processed in chunks instead of loaded whole
+STREAMING_THRESHOLD_BYTES = int(os.environ.get("SCORING_STREAMING_THRESHOLD_MB", 256)) * 1024 * 1024
+
+BLOCK_BYTES = 1024 * 1024
+
+REQUIRED_COLUMNS = {
+    "bank_tx": BANK_TX_REQUIRED_COLUMNS,
+    "pnl_monthly": PNL_MONTHLY_REQUIRED_COLUMNS,
+    "vendors": VENDORS_REQUIRED_COLUMNS,
+}
+
+
+class UploadRejectedError(Exception):
+    """Raised while reading an upload that breaks a limit (413) or lacks required columns (400)."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _check_header(first_block, kind, label):
+    header_line = first_block.split(b"\n", 1)[0].decode("utf-8-sig", errors="replace")
+    columns = {c.strip() for c in next(csv.reader([header_line]), [])}
+    missing = [c for c in REQUIRED_COLUMNS[kind] if c not in columns]
+    if missing:
+        raise UploadRejectedError(400, f"{label} is missing required columns: {missing}")
+
+
+def read_upload(upload, kind, label, persist_path, spill=True):
+    """
+    Reads one upload block by block, enforcing the size and row limits and checking the header
+    as data arrives, and hashes it on the way. Returns (source, sha256): source is the raw bytes,
+    ready to be parsed in a worker, or persist_path when the file is too big to be scored in
+    memory (it is then streamed from disk). With spill=False, for callers that have no streaming
+    path, such a file is rejected with a 413 instead. In audit mode the raw file is also kept at
+    persist_path. The file is written under a temporary name and renamed into place once complete.
+    """
+    if upload.size is not None and upload.size > MAX_UPLOAD_BYTES:
+        raise UploadRejectedError(413, f"{label} is {upload.size} bytes; the limit is {MAX_UPLOAD_BYTES}")
+
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    tmp_path = Path(f"{persist_path}.tmp")
+    out = open(tmp_path, "wb") if AUDIT_UPLOADS else None
+    total_bytes = newlines = 0
+    try:
+        while block := upload.file.read(BLOCK_BYTES):
+            if total_bytes == 0:
+                _check_header(block, kind, label)
+            total_bytes += len(block)
+            if total_bytes > MAX_UPLOAD_BYTES:
+                raise UploadRejectedError(413, f"{label} is larger than the {MAX_UPLOAD_BYTES} byte limit")
+            # Lines, less the header, bound the row count (quoted newlines only overcount)
+            newlines += block.count(b"\n")
+            if newlines - 1 > MAX_UPLOAD_ROWS:
+                raise UploadRejectedError(413, f"{label} has more than the {MAX_UPLOAD_ROWS} row limit")
+            digest.update(block)
+
+            if buffer is not None and total_bytes > STREAMING_THRESHOLD_BYTES:
+                if not spill:
+                    raise UploadRejectedError(
+                        413, f"{label} is larger than the {STREAMING_THRESHOLD_BYTES} byte limit for in-memory scoring"
+                    )
+                # Too big to score in memory: spill to disk for the chunked streaming path
+                if out is None:
+                    out = open(tmp_path, "wb")
+                    out.write(buffer)
+                buffer = None
+            if out is not None:
+                out.write(block)
+            if buffer is not None:
+                buffer += block
+    except BaseException:
+        if out is not None:
+            out.close()
+            tmp_path.unlink(missing_ok=True)
+        raise
+    if out is not None:
+        out.close()
+        os.replace(tmp_path, persist_path)
+
+    if total_bytes == 0:
+        raise UploadRejectedError(400, f"{label} is empty")
+    return (buffer if buffer is not None else str(persist_path)), digest.hexdigest()
+
+
+def read_uploads(workspace, suffix, bank_tx, pnl_monthly, vendors, spill=True):
+    """
+    Reads one set of uploads (see read_upload) into a request's workspace. Returns their
+    sources (vendors is None if absent) and their content hashes, which key the result cache.
+    spill=False rejects a bank_tx too big to score in memory instead of spilling it.
+    """
+    sources, digests = [], []
+    for kind, upload in (("bank_tx", bank_tx), ("pnl_monthly", pnl_monthly), ("vendors", vendors)):
+        #  Checking if optional vendors file was uploaded 
+        if upload is None or not upload.filename:
+            sources.append(None)
+            digests.append(None)
+            continue
+        source, digest = read_upload(upload, kind, f"{kind} ({suffix})", workspace / f"{kind}_{suffix}.csv", spill)
+        sources.append(source)
+        digests.append(digest)
+    return tuple(sources), tuple(digests)
+
+
+def discard_spilled(sources):
+    """Removes the on-disk copies of spilled uploads once scored, unless they are kept for audit."""
+    if AUDIT_UPLOADS:
+        return
+    for source in sources:
+        if isinstance(source, str):
+            Path(source).unlink(missing_ok=True)
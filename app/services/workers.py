@@ -0,0 +1,161 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from app.services import metrics, tasks
+
+#  Pool configuration (environment overridable)
+MAX_WORKERS = int(os.environ.get("SCORING_MAX_WORKERS", os.cpu_count() or 1))
+# Submissions allowed to wait behind the busy workers before new ones are rejected
+MAX_QUEUE_DEPTH = int(os.environ.get("SCORING_MAX_QUEUE_DEPTH", MAX_WORKERS * 4))
+# Finished jobs kept around for polling; the oldest are dropped beyond this
+MAX_RETAINED_JOBS = int(os.environ.get("SCORING_MAX_RETAINED_JOBS", 1000))
+# Start every worker when the app starts and prime it (see tasks.warm_up) before it takes tasks
+WARM_UP = os.environ.get("SCORING_WARM_UP", "1") != "0"
+
+
+class QueueFullError(Exception):
+    """Raised when the scoring pool already has MAX_WORKERS + MAX_QUEUE_DEPTH tasks outstanding."""
+
+
+_pool = None
+_metrics_sink = None
+_lock = threading.Lock()
+_outstanding = 0
+_jobs = OrderedDict()
+
+
+def _init_worker(sink):
+    """
+    Pool initializer: warms the worker up, then routes its metrics to the server. The
+    warm-up's own stages stay in the worker and never reach /metrics.
+    """
+    if WARM_UP:
+        try:
+            tasks.warm_up()
+        except Exception:
+            # A worker that failed to warm up still scores; its first request pays instead.
+            # An initializer that raises would break the whole pool.
+            pass
+    metrics.init_worker(sink)
+
+
+def _ready():
+    return os.getpid()
+
+
+def get_pool():
+    """Returns the shared process pool, creating it on first use."""
+    global _pool, _metrics_sink
+    with _lock:
+        if _pool is None:
+            # spawn keeps workers clear of the server's threads and matplotlib state
+            context = multiprocessing.get_context("spawn")
+            # Workers ship their stage metrics back over this queue, once per task
+            _metrics_sink = context.SimpleQueue()
+            metrics.collect_from(_metrics_sink)
+            _pool = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS, mp_context=context,
+                initializer=_init_worker, initargs=(_metrics_sink,)
+            )
+        return _pool
+
+
+def start_workers():
+    """
+    Starts all MAX_WORKERS processes now instead of on first use. Returns futures that
+    finish as the workers, warmed up, take their first (no-op) task.
+    """
+    pool = get_pool()
+    return [pool.submit(_ready) for _ in range(MAX_WORKERS)]
+
+
+def shutdown_pool():
+    """Stops the worker processes; called when the app shuts down."""
+    global _pool, _metrics_sink
+    with _lock:
+        pool, _pool = _pool, None
+        sink, _metrics_sink = _metrics_sink, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+    if sink is not None:
+        sink.put(None)
+
+
+def outstanding_tasks():
+    """Number of tasks currently running or waiting in the pool."""
+    return _outstanding
+
+
+def queue_depth():
+    """Tasks waiting for a free worker."""
+    return max(0, _outstanding - MAX_WORKERS)
+
+
+metrics.set_gauge('scoring_tasks_outstanding', outstanding_tasks, 'Tasks running or waiting in the scoring pool.')
+metrics.set_gauge('scoring_queue_depth', queue_depth, 'Tasks waiting for a free scoring worker.')
+
+
+def _task_done(_future):
+    global _outstanding
+    with _lock:
+        _outstanding -= 1
+
+
+def submit(fn, *args):
+    """Submits a task to the pool, enforcing the queue-depth bound. Returns a concurrent Future."""
+    global _outstanding
+    pool = get_pool()
+    with _lock:
+        if _outstanding >= MAX_WORKERS + MAX_QUEUE_DEPTH:
+            raise QueueFullError(f"Scoring queue is full ({_outstanding} tasks outstanding)")
+        _outstanding += 1
+    try:
+        future = pool.submit(metrics.run_task, fn, *args)
+    except Exception:
+        _task_done(None)
+        raise
+    future.add_done_callback(_task_done)
+    return future
+
+
+#  Async job registry
+def create_job(tasks, merge_results=False):
+    """
+    Registers a job made of named pool futures (e.g. one per window) and returns its id.
+    Each task's result becomes the value under its name in the job result; with
+    merge_results the task results (dicts keyed by window) are merged instead.
+    """
+    job_id = uuid.uuid4().hex
+    with _lock:
+        _jobs[job_id] = {"created_at": time.time(), "tasks": tasks, "merge_results": merge_results}
+        while len(_jobs) > MAX_RETAINED_JOBS:
+            _jobs.popitem(last=False)
+    return job_id
+
+
+def get_job(job_id):
+    """Returns the job's status and, once finished, its result or error. None if unknown."""
+    job = _jobs.get(job_id)
+    if job is None:
+        return None
+
+    futures = job["tasks"].values()
+    if all(f.done() for f in futures):
+        errors = {name: str(f.exception()) for name, f in job["tasks"].items() if f.exception() is not None}
+        if errors:
+            return {"job_id": job_id, "status": "failed", "errors": errors}
+        if job["merge_results"]:
+            result = {}
+            for f in futures:
+                result.update(f.result())
+        else:
+            result = {name: f.result() for name, f in job["tasks"].items()}
+        return {"job_id": job_id, "status": "done", "result": result}
+
+    status = "running" if any(f.running() or f.done() for f in futures) else "queued"
+    return {"job_id": job_id, "status": status}
@@ -0,0 +1,178 @@
+import fcntl
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from app.services import metrics
+
+# Every request writes into a workspace of its own, <uploads>/<business>/<workspace id>/:
+# its spilled or audit copies of the uploads, its memo specs and PDFs. Concurrent requests
+# for one business never touch each other's files, and a download URL names the exact
+# artifact its request produced. Files appear by temp-then-rename, so a reader sees a whole
+# file or none.
+#
+# A retention collector thread removes workspaces unused for MAX_AGE_SECONDS, then the least
+# recently used ones while the total exceeds DISK_BUDGET_BYTES. A download or a result-cache
+# hit marks its workspace as used. Workspaces this process still has work in flight for, or
+# that any process used within MIN_IDLE_SECONDS, are never removed. Several server processes
+# can share the disk: a lock file lets one of them collect at a time.
+MAX_AGE_SECONDS = float(os.environ.get("SCORING_WORKSPACE_MAX_AGE_HOURS", 7 * 24)) * 3600
+DISK_BUDGET_BYTES = int(os.environ.get("SCORING_WORKSPACE_DISK_MB", 4096)) * 1024 * 1024
+COLLECT_INTERVAL_SECONDS = float(os.environ.get("SCORING_WORKSPACE_COLLECT_SECONDS", 300))
+MIN_IDLE_SECONDS = 3600
+
+LOCK_FILE = '.retention.lock'
+
+_lock = threading.Lock()
+_active = Counter()
+_last_collection = {"workspaces": 0, "bytes": 0}
+
+metrics.set_gauge('scoring_workspaces', lambda: _last_collection["workspaces"],
+                  'Request workspaces on disk at the last retention pass.')
+metrics.set_gauge('scoring_workspace_bytes', lambda: _last_collection["bytes"],
+                  'Bytes in request workspaces at the last retention pass.')
+
+
+def is_workspace(name):
+    """True for a workspace id: 32 lowercase hex digits."""
+    return len(name) == 32 and all(c in '0123456789abcdef' for c in name)
+
+
+def create(business_dir):
+    """Makes a new, empty workspace under a business's upload directory and returns its path."""
+    path = Path(business_dir) / uuid.uuid4().hex
+    path.mkdir(parents=True)
+    return path
+
+
+def hold(path):
+    """Marks a workspace as in use by a task of this process until the matching release."""
+    with _lock:
+        _active[str(path)] += 1
+
+
+def release(path):
+    """Ends a hold; a workspace left empty (nothing spilled, kept or rendered) is removed."""
+    with _lock:
+        _active[str(path)] -= 1
+        if _active[str(path)] > 0:
+            return
+        del _active[str(path)]
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+
+
+def touch(path):
+    """Marks a workspace as just used, for the collector's LRU order."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def atomic_write_bytes(path, data):
+    """Writes a file by temp-then-rename, so readers never see it half written."""
+    tmp_path = Path(f"{path}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _usage(path):
+    """(bytes, last used): total file size and the newest mtime of the workspace or its files."""
+    size, last_used = 0, os.stat(path).st_mtime
+    for entry in os.scandir(path):
+        stat = entry.stat(follow_symlinks=False)
+        size += stat.st_size
+        last_used = max(last_used, stat.st_mtime)
+    return size, last_used
+
+
+def _workspaces(root):
+    """(path, bytes, last used) of every workspace under root."""
+    found = []
+    for business in os.scandir(root):
+        if business.name.startswith('.') or not business.is_dir(follow_symlinks=False):
+            continue
+        for entry in os.scandir(business.path):
+            if is_workspace(entry.name) and entry.is_dir(follow_symlinks=False):
+                try:
+                    found.append((entry.path, *_usage(entry.path)))
+                except FileNotFoundError:
+                    pass
+    return found
+
+
+def collect(root, max_age_seconds=None, budget_bytes=None, now=None):
+    """
+    One retention pass over the workspaces under root: removes those unused for
+    max_age_seconds (default MAX_AGE_SECONDS), then the least recently used while the rest
+    exceed budget_bytes (default DISK_BUDGET_BYTES). 0 turns a limit off. Returns
+    {"removed", "freed_bytes", "workspaces", "bytes"}, the last two counting what is kept.
+    """
+    max_age_seconds = MAX_AGE_SECONDS if max_age_seconds is None else max_age_seconds
+    budget_bytes = DISK_BUDGET_BYTES if budget_bytes is None else budget_bytes
+    now = time.time() if now is None else now
+    with _lock:
+        active = set(_active)
+
+    found = sorted(_workspaces(root), key=lambda workspace: workspace[2])
+    total = sum(size for _, size, _ in found)
+    removed = freed = 0
+    kept = []
+    for path, size, last_used in found:
+        idle = now - last_used
+        expired = max_age_seconds and idle > max_age_seconds
+        over_budget = budget_bytes and total > budget_bytes
+        if path in active or idle < MIN_IDLE_SECONDS or not (expired or over_budget or size == 0):
+            kept.append(size)
+            continue
+        # Used since the scan (a cache hit restoring its memo)? Then it stays
+        try:
+            if _usage(path)[1] > last_used:
+                kept.append(size)
+                continue
+        except FileNotFoundError:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed += 1
+        freed += size
+
+    _last_collection.update(workspaces=len(kept), bytes=sum(kept))
+    return {"removed": removed, "freed_bytes": freed, "workspaces": len(kept), "bytes": sum(kept)}
+
+
+def start_collector(root, interval_seconds=None):
+    """
+    Runs collect(root) every interval_seconds (default COLLECT_INTERVAL_SECONDS) on a daemon
+    thread until the returned event is set. A pass is skipped while another process holds
+    the lock file.
+    """
+    interval_seconds = COLLECT_INTERVAL_SECONDS if interval_seconds is None else interval_seconds
+    stop = threading.Event()
+
+    def run():
+        while True:
+            try:
+                with open(Path(root) / LOCK_FILE, 'a') as lock_file:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        pass
+                    else:
+                        collect(root)
+            except OSError:
+                # A pass that fails (a vanished directory, a full disk) is retried next interval
+                pass
+            if stop.wait(interval_seconds):
+                return
+
+    threading.Thread(target=run, name='workspace-collector', daemon=True).start()
+    return stop
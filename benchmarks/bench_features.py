@@ -0,0 +1,204 @@
+"""
+Parity harness and benchmark for the fused feature kernel.
+
+Checks that compute_features matches the original multi-pass implementation (kept below as
+legacy_compute_features) on the fixtures in data/ and on seeded synthetic feeds with dirty
+rows, then times both at the requested size.
+
+    python -m benchmarks.bench_features --rows 1000000
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.services.ingestion import load_business_data
+from app.services.feature_engineering import compute_features
+
+IN_CATEGORIES = ['customer_payment', 'investment_income', 'asset_sale', 'refund', 'credit']
+OUT_CATEGORIES = ['payroll', 'rent', 'utilities', 'supplier_payment', 'loan_repayment', 'tax_payment',
+                  'marketing_spend', 'software_subscription', 'T&E', 'nsf_fee', 'returned_ach']
+
+
+def legacy_compute_features(bank_tx_df, pnl_monthly_df):
+    """The pre-kernel compute_features, verbatim apart from working on copies of its inputs."""
+    bank_tx_df = bank_tx_df.copy()
+    pnl_monthly_df = pnl_monthly_df.copy()
+    features = {}
+
+    daily_balance = bank_tx_df.groupby('date')['balance'].last()
+    features['average_daily_balance'] = daily_balance.mean()
+    features['percent_of_days_below_zero'] = (daily_balance < 0).mean() * 100
+    avg_daily_expenses = pnl_monthly_df['operating_expense'].mean() / 30
+    features['days_cash_on_hand'] = features['average_daily_balance'] / avg_daily_expenses if avg_daily_expenses > 0 else 0
+
+    pnl_monthly_df['nocf'] = pnl_monthly_df['revenue'] - pnl_monthly_df['cogs'] - pnl_monthly_df['operating_expense']
+    features['median_monthly_nocf'] = pnl_monthly_df['nocf'].median()
+
+    bank_tx_df['signed_amount'] = np.where(bank_tx_df['in_out'] == 'in', bank_tx_df['amount'], -bank_tx_df['amount'])
+    weekly_cash_flow = bank_tx_df.set_index('date')['signed_amount'].resample('W').sum()
+    features['weekly_net_cashflow_variability'] = weekly_cash_flow.std() / weekly_cash_flow.mean() if weekly_cash_flow.mean() != 0 else 0
+
+    inflows_df = bank_tx_df[bank_tx_df['in_out'] == 'in']
+    total_inflows = inflows_df['amount'].sum()
+    credit_inflows = inflows_df[inflows_df['category'] == 'credit']['amount'].sum()
+    features['draw_on_credit_ratio'] = credit_inflows / total_inflows if total_inflows > 0 else 0
+
+    features['nsf_count'] = int((bank_tx_df['category'] == 'nsf_fee').sum())
+    features['returned_ach_count'] = int((bank_tx_df['category'] == 'returned_ach').sum())
+
+    vendor_payments = bank_tx_df[(bank_tx_df['in_out'] == 'out') & (bank_tx_df['due_date'].notna())].copy()
+    if not vendor_payments.empty:
+        vendor_payments['payment_date'] = pd.to_datetime(vendor_payments['date'])
+        vendor_payments['due_date'] = pd.to_datetime(vendor_payments['due_date'])
+        late_payments = (vendor_payments['payment_date'] > vendor_payments['due_date']).sum()
+        total_payments = len(vendor_payments)
+        features['vendor_late_proxy'] = (late_payments / total_payments) * 100 if total_payments > 0 else 0
+    else:
+        features['vendor_late_proxy'] = 0
+
+    features['mom_revenue_variability'] = pnl_monthly_df['revenue'].pct_change().std()
+    if len(pnl_monthly_df) >= 3:
+        revenue_trend = np.polyfit(range(len(pnl_monthly_df['revenue'][-3:])), pnl_monthly_df['revenue'][-3:], 1)
+        features['3_month_slope'] = revenue_trend[0]
+    else:
+        features['3_month_slope'] = 0
+    features['seasonal_delta'] = 0
+
+    outgoing_transactions = bank_tx_df[bank_tx_df['in_out'] == 'out']
+    if not outgoing_transactions.empty:
+        vendor_spending = outgoing_transactions.groupby('counterparty', observed=True)['amount'].sum()
+        total_spending = vendor_spending.sum()
+        features['top_vendor_share'] = vendor_spending.max() / total_spending if total_spending > 0 else 0
+        features['top_5_vendors_share'] = vendor_spending.nlargest(5).sum() / total_spending if total_spending > 0 else 0
+    else:
+        features['top_vendor_share'] = 0
+        features['top_5_vendors_share'] = 0
+
+    total_nocf = pnl_monthly_df['nocf'].sum()
+    debt_service = bank_tx_df[bank_tx_df['category'] == 'loan_repayment']['amount'].sum()
+    features['dscr_proxy'] = total_nocf / debt_service if debt_service > 0 else 0
+    features['annualized_revenue'] = pnl_monthly_df['revenue'].sum() * (12 / len(pnl_monthly_df))
+
+    return {k: 0 if pd.isna(v) else v for k, v in features.items()}
+
+
+def reference_vendor_exposure(bank_tx_df, vendors_df):
+    """The vendors.csv features (not in the legacy implementation) from a plain pandas join."""
+    spending = bank_tx_df[bank_tx_df['in_out'] == 'out'].groupby('counterparty', observed=True)['amount'].sum()
+    total = spending.sum()
+    if vendors_df is None or total <= 0:
+        return {'critical_vendor_share': 0, 'top_vendor_category_share': 0}
+    columns = ['category', 'is_critical']
+    counterparties = spending.index.astype(object)
+    vendor = vendors_df.drop_duplicates('vendor_id').set_index('vendor_id')[columns].reindex(counterparties)
+    by_name = vendors_df.drop_duplicates('name').set_index('name')[columns].reindex(counterparties)
+    unmatched = ~counterparties.isin(vendors_df['vendor_id'])
+    vendor.loc[unmatched] = by_name.loc[unmatched]
+    critical = vendor['is_critical'].fillna(False).astype(bool).to_numpy()
+    by_category = spending.groupby(vendor['category'].to_numpy(), observed=True).sum()
+    return {
+        'critical_vendor_share': spending[critical].sum() / total,
+        'top_vendor_category_share': by_category.max() / total if len(by_category) else 0,
+    }
+
+
+def synthetic_vendors(seed=0):
+    """A vendor master matching some counterparties by vendor_id and others by name."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'vendor_id': [f'Counterparty_{i}' for i in range(1, 31)] + [f'V{i}' for i in range(40, 60)],
+        'name': [f'Vendor {i}' for i in range(1, 31)] + [f'Counterparty_{i}' for i in range(40, 60)],
+        'category': pd.Categorical(rng.choice(['software', 'logistics', 'supplies', None], 50)),
+        'is_critical': pd.array(rng.random(50) < 0.3, dtype='boolean'),
+    })
+
+
+def synthetic_bank_tx(rows, seed=0, months=6, dirty=False):
+    """Seeded bank_tx frame shaped like data/*/bank_tx.csv, typed the way ingestion types it."""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp('2025-07-31')
+    start = end - pd.DateOffset(months=months)
+    day_offsets = np.sort(rng.integers(1, (end - start).days + 1, size=rows))
+    dates = start + pd.to_timedelta(day_offsets, unit='D')
+    is_in = rng.random(rows) < 0.45
+    category = np.where(is_in, rng.choice(IN_CATEGORIES, rows), rng.choice(OUT_CATEGORIES, rows, p=[0.11] * 9 + [0.005, 0.005]))
+    amount = np.round(rng.lognormal(8, 1.2, rows), 2)
+    signed = np.where(is_in, amount, -amount)
+    due = dates - pd.to_timedelta(rng.integers(15, 45, rows), unit='D') + pd.to_timedelta(30 + rng.integers(-5, 10, rows), unit='D')
+    df = pd.DataFrame({
+        'date': dates,
+        'amount': amount,
+        'category': pd.Categorical(category),
+        'in_out': pd.Categorical(np.where(is_in, 'in', 'out')),
+        'counterparty': pd.Categorical(np.char.add('Counterparty_', rng.integers(1, 100, rows).astype(str))),
+        'balance': np.round(20_000_000 + np.cumsum(signed), 2),
+        'invoice_date': pd.NaT,
+        'due_date': pd.Series(due).where(~is_in),
+    })
+    if dirty:
+        idx = rng.integers(0, rows, size=max(rows // 200, 5))
+        df.loc[idx[0::4], 'amount'] = np.nan
+        df.loc[idx[1::4], 'category'] = np.nan
+        df.loc[idx[2::4], 'counterparty'] = np.nan
+        df.loc[idx[3::4], 'balance'] = np.nan
+    return df
+
+
+def synthetic_pnl(months=6, seed=0):
+    rng = np.random.default_rng(seed)
+    revenue = np.round(rng.uniform(2_000_000, 5_000_000, months), 2)
+    return pd.DataFrame({
+        'month': pd.period_range(end='2025-07', periods=months, freq='M').astype(str),
+        'revenue': revenue, 'cogs': np.round(revenue * 0.5, 2), 'operating_expense': np.round(revenue * 0.3, 2),
+        'other_income_expense': 0.0,
+    })
+
+
+def check_parity(frames, label, rtol=1e-9):
+    """Asserts the kernel matches the legacy implementation and leaves its inputs untouched."""
+    bank_columns, pnl_columns = list(frames['bank_tx'].columns), list(frames['pnl_monthly'].columns)
+    expected = legacy_compute_features(frames['bank_tx'], frames['pnl_monthly'])
+    expected.update(reference_vendor_exposure(frames['bank_tx'], frames.get('vendors')))
+    actual = compute_features(frames)
+    assert sorted(actual) == sorted(expected), f"{label}: feature keys differ"
+    mismatches = {k: (actual[k], expected[k]) for k in expected if not np.isclose(actual[k], expected[k], rtol=rtol, atol=1e-12)}
+    assert not mismatches, f"{label}: {mismatches}"
+    assert list(frames['bank_tx'].columns) == bank_columns and list(frames['pnl_monthly'].columns) == pnl_columns, \
+        f"{label}: inputs were mutated"
+    print(f"  parity ok: {label}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print("Parity checks")
+    for window_dir in sorted(Path('data').glob('*/trailing_*m')):
+        check_parity(load_business_data(window_dir / 'bank_tx.csv', window_dir / 'pnl_monthly.csv'), str(window_dir))
+    for seed, dirty in [(1, False), (2, True), (3, True)]:
+        frames = {'bank_tx': synthetic_bank_tx(20_000, seed=seed, dirty=dirty), 'pnl_monthly': synthetic_pnl(seed=seed),
+                  'vendors': synthetic_vendors(seed)}
+        check_parity(frames, f"synthetic seed={seed} dirty={dirty}")
+
+    print(f"Benchmark at {args.rows:,} rows (best of {args.repeat})")
+    frames = {'bank_tx': synthetic_bank_tx(args.rows), 'pnl_monthly': synthetic_pnl()}
+    timings = {}
+    for name, fn in [('legacy', lambda: legacy_compute_features(frames['bank_tx'], frames['pnl_monthly'])),
+                     ('kernel', lambda: compute_features(frames))]:
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+        print(f"  {name:<7} {best * 1000:9.1f} ms")
+    print(f"  speedup {timings['legacy'] / timings['kernel']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark for batch memo rendering.
+
+Builds memo specs from the fixtures in data/, checks that a batch-rendered memo matches a
+one-off render, then times one-off create_credit_memo calls against render_memos writing a
+zip archive across worker processes.
+
+    python -m benchmarks.bench_memos --memos 2000 --workers 8
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+import zipfile
+from itertools import cycle, islice
+from pathlib import Path
+
+from app.services.ingestion import load_business_data
+from app.services.feature_engineering import bank_tx_kernel, chart_series, compute_features
+from app.services.scoring_engine import calculate_scorecard
+from app.services.pdf_generator import create_credit_memo, render_credit_memo
+from app.services.memo_batch import memo_filename, render_memos
+
+
+def fixture_specs(data_dir='data'):
+    """One memo spec per fixture business/window."""
+    specs = []
+    for window_dir in sorted(Path(data_dir).glob('*/trailing_*m')):
+        vendors_path = window_dir / 'vendors.csv'
+        frames = load_business_data(window_dir / 'bank_tx.csv', window_dir / 'pnl_monthly.csv',
+                                    vendors_path if vendors_path.exists() else None)
+        kernel = bank_tx_kernel(frames['bank_tx'])
+        features = compute_features(frames, kernel)
+        daily_balance, weekly_cash_flow = chart_series(kernel)
+        specs.append({
+            'business_name': window_dir.parent.name, 'window': window_dir.name.split('_')[1],
+            'scorecard': calculate_scorecard(features), 'features': features,
+            'daily_balance': daily_balance, 'weekly_cash_flow': weekly_cash_flow,
+        })
+    return specs
+
+
+def synthetic_specs(base_specs, count):
+    """Lazily yields `count` specs cycling through the fixtures under distinct business names."""
+    for i, spec in enumerate(islice(cycle(base_specs), count)):
+        yield dict(spec, business_name=f"{spec['business_name']}_{i:06d}")
+
+
+def without_timestamp(pdf):
+    start = pdf.index(b'/CreationDate')
+    return pdf[:start] + pdf[pdf.index(b')', start):]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--memos', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--single', type=int, default=20, help='One-off renders timed for the baseline')
+    args = parser.parse_args(argv)
+
+    base_specs = fixture_specs()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Parity: the batch path (reused figures, in-memory charts) against one-off renders
+        render_memos(base_specs, Path(tmp) / 'parity.zip', workers=1)
+        with zipfile.ZipFile(Path(tmp) / 'parity.zip') as archive:
+            for spec in base_specs:
+                one_off = render_credit_memo(spec['business_name'], spec['window'], spec['scorecard'], spec['features'],
+                                             spec['daily_balance'], spec['weekly_cash_flow'])
+                match = without_timestamp(archive.read(memo_filename(spec))) == without_timestamp(one_off)
+                print(f"parity {memo_filename(spec)}: {'ok' if match else 'MISMATCH'}")
+
+        start = time.perf_counter()
+        for spec in synthetic_specs(base_specs, args.single):
+            create_credit_memo(spec['business_name'], spec['window'], spec['scorecard'], spec['features'],
+                               str(Path(tmp) / memo_filename(spec)), daily_balance=spec['daily_balance'],
+                               weekly_cash_flow=spec['weekly_cash_flow'])
+        single_rate = args.single / (time.perf_counter() - start)
+        print(f"one-off create_credit_memo, 1 process: {single_rate:.1f} memos/sec")
+
+        archive_path = Path(tmp) / 'memos.zip'
+        stats = render_memos(synthetic_specs(base_specs, args.memos), archive_path, workers=args.workers)
+        print(f"render_memos, {args.workers} workers, zip: {stats['memos']} memos in {stats['seconds']:.1f}s, "
+              f"{stats['memos_per_sec']:.1f} memos/sec ({archive_path.stat().st_size / 1e6:.1f} MB)")
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        peak_children_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+        print(f"peak RSS: parent {peak_mb:.0f} MB, largest worker {peak_children_mb:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
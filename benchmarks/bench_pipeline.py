@@ -0,0 +1,225 @@
+"""
+Reproducible benchmark suite for every pipeline stage at scaled data sizes.
+
+For each size, generates a seeded synthetic business shaped like the fixtures in data/ (a 6m
+bank feed, its trailing 3m slice, monthly P&L and a vendor list) and times validate_data,
+compute_features, calculate_scorecard, create_credit_memo and a full /score/ request through
+an in-process test client. Results are written as JSON; --compare flags regressions against a
+saved baseline and exits non-zero if there are any.
+
+    python -m benchmarks.bench_pipeline --sizes 10k,100k,1M,10M --output baseline.json
+    python -m benchmarks.bench_pipeline --sizes 10k,100k,1M --compare baseline.json
+    python -m benchmarks.bench_pipeline --compare baseline.json --current results.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.services.data_validation import validate_data
+from app.services.feature_engineering import compute_features
+from app.services.scoring_engine import calculate_scorecard
+from benchmarks.bench_features import synthetic_bank_tx, synthetic_pnl
+
+DEFAULT_SIZES = '10k,100k,1M,10M'
+# A stage regresses if its median is this much slower than the baseline's...
+DEFAULT_THRESHOLD = 0.10
+# ...and by more than this, so sub-millisecond jitter is never flagged
+NOISE_FLOOR_SECONDS = 0.002
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip('km')) * scale)
+
+
+def synthetic_vendors(seed=0, count=100):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'vendor_id': [f'V{i}' for i in range(1, count + 1)],
+        'name': [f'Vendor Name {i}' for i in range(1, count + 1)],
+        'category': pd.Categorical(rng.choice(['supplies', 'logistics', 'rent', 'utilities', 'software', 'marketing'], count)),
+        'is_critical': pd.array(rng.random(count) < 0.2, dtype='boolean'),
+    })
+
+
+def synthetic_business(rows, seed):
+    """Frame bundles for a 6m feed of `rows` transactions and its trailing 3m slice."""
+    bank_tx = synthetic_bank_tx(rows, seed=seed, months=6)
+    pnl = synthetic_pnl(months=6, seed=seed)
+    vendors = synthetic_vendors(seed=seed)
+    cutoff = bank_tx['date'].max() - pd.DateOffset(months=3)
+    return {
+        '6m': {'bank_tx': bank_tx, 'pnl_monthly': pnl, 'vendors': vendors},
+        '3m': {'bank_tx': bank_tx[bank_tx['date'] > cutoff].reset_index(drop=True),
+               'pnl_monthly': pnl.tail(3).reset_index(drop=True), 'vendors': vendors},
+    }
+
+
+def to_csv_bytes(df):
+    return df.to_csv(index=False, date_format='%Y-%m-%d').encode()
+
+
+def time_runs(fn, repeat, warmup, before=None):
+    """Runs fn warmup + repeat times (calling before() untimed ahead of each); returns the timed seconds."""
+    timings = []
+    for i in range(warmup + repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        fn()
+        if i >= warmup:
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(stage, rows, timings):
+    median = statistics.median(timings)
+    return {
+        'stage': stage, 'rows': rows, 'repeat': len(timings),
+        'median_seconds': median, 'min_seconds': min(timings), 'max_seconds': max(timings),
+        'rows_per_second': rows / median if median > 0 else None,
+    }
+
+
+def bench_size(rows, seed, repeat, warmup, client, tmp):
+    """Times every stage on one synthetic business; returns a result row per stage."""
+    from app.services import result_cache
+    from app.services.pdf_generator import create_credit_memo
+
+    business = synthetic_business(rows, seed)
+    frames = business['6m']
+    features = compute_features(frames)
+    scorecard = calculate_scorecard(features)
+    memo_path = str(Path(tmp) / 'memo.pdf')
+    runs = {
+        'validate_data': lambda: validate_data(frames),
+        'compute_features': lambda: compute_features(frames),
+        'calculate_scorecard': lambda: calculate_scorecard(features),
+        'create_credit_memo': lambda: create_credit_memo(
+            'Bench Corp', '6m', scorecard, features, memo_path, bank_df=frames['bank_tx']
+        ),
+    }
+    results = []
+    for stage, fn in runs.items():
+        results.append(summarize(stage, rows, time_runs(fn, repeat, warmup)))
+        print(f"  {rows:>12,} {stage:<20} {results[-1]['median_seconds'] * 1000:10.1f} ms")
+
+    uploads = {}
+    for window, window_frames in business.items():
+        for table in ('bank_tx', 'pnl_monthly', 'vendors'):
+            uploads[f'{table}_{window}'] = (f'{table}.csv', to_csv_bytes(window_frames[table]), 'text/csv')
+    del business, frames
+
+    def score_request():
+        response = client.post('/score/', data={'business_name': f'bench_{rows}'}, files=uploads)
+        response.raise_for_status()
+        assert 'error' not in response.json()['6m'], response.json()['6m']
+
+    # Every request must run the pipeline, not come back from the result cache
+    results.append(summarize('score_request', rows, time_runs(score_request, repeat, warmup, before=result_cache.clear)))
+    print(f"  {rows:>12,} {'score_request':<20} {results[-1]['median_seconds'] * 1000:10.1f} ms")
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'), 'git_commit': commit,
+        'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+        'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+    }
+
+
+def run(sizes, seed, repeat, warmup):
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the app's cache, store, portfolio and memos out of the working tree, and leave
+        # the pool free for the timed requests
+        os.environ['SCORING_CACHE_DIR'] = str(Path(tmp) / 'cache')
+        os.environ['SCORING_STORE_DIR'] = str(Path(tmp) / 'store')
+        os.environ['SCORING_PORTFOLIO_DB'] = str(Path(tmp) / 'portfolio.sqlite3')
+        os.environ['SCORING_PRERENDER_MEMOS'] = '0'
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        results = []
+        with TestClient(app) as client:
+            for rows in sizes:
+                results.extend(bench_size(rows, seed, repeat, warmup, client, tmp))
+        for rows in sizes:
+            shutil.rmtree(Path('uploads', f'bench_{rows}'), ignore_errors=True)
+    return {'environment': environment(), 'seed': seed, 'repeat': repeat, 'warmup': warmup, 'results': results}
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Prints current against baseline per stage and size; returns the regressions."""
+    base = {(r['stage'], r['rows']): r for r in baseline['results']}
+    regressions = []
+    print(f"  {'rows':>12} {'stage':<20} {'baseline':>12} {'current':>12} {'change':>8}")
+    for result in current['results']:
+        key = (result['stage'], result['rows'])
+        if key not in base:
+            print(f"  {result['rows']:>12,} {result['stage']:<20} {'-':>12} {result['median_seconds'] * 1000:9.1f} ms      new")
+            continue
+        before, after = base[key]['median_seconds'], result['median_seconds']
+        change = (after - before) / before if before > 0 else 0.0
+        regressed = change > threshold and after - before > NOISE_FLOOR_SECONDS
+        if regressed:
+            regressions.append(dict(result, baseline_median_seconds=before, change=change))
+        print(f"  {result['rows']:>12,} {result['stage']:<20} {before * 1000:9.1f} ms {after * 1000:9.1f} ms"
+              f" {change:+7.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Comma-separated transaction counts, e.g. 10k,1M')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--output', default='bench_results.json', help='Where to write this run\'s results')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline results file to check for regressions')
+    parser.add_argument('--current', metavar='RESULTS', help='With --compare: compare this file instead of running')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Slowdown (fraction of the baseline median) flagged as a regression')
+    args = parser.parse_args(argv)
+
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        sizes = [parse_size(size) for size in args.sizes.split(',')]
+        print(f"Benchmarking sizes {sizes} (seed {args.seed}, median of {args.repeat})")
+        current = run(sizes, args.seed, args.repeat, args.warmup)
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} ({baseline['environment'].get('git_commit') or 'unknown commit'})")
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == '__main__':
+    main()
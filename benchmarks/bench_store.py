@@ -0,0 +1,83 @@
+"""
+Benchmark for the columnar business store against the CSV uploads it replaces on rescoring.
+
+For each fixture in data/ and a seeded synthetic feed, stores the parsed frames and compares
+bytes on disk, CSV parse time against a memory-mapped load of the columns scoring needs, and
+both end to end through compute_features. Features from stored data must match the CSVs.
+
+    python -m benchmarks.bench_store --rows 1000000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services import business_store
+from app.services.ingestion import BANK_TX_REQUIRED_COLUMNS, load_business_data
+from app.services.feature_engineering import compute_features
+from benchmarks.bench_features import synthetic_bank_tx, synthetic_pnl
+
+TABLE_FILES = ['bank_tx.csv', 'pnl_monthly.csv', 'vendors.csv']
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare(label, csv_dir, repeat):
+    """Stores one business's CSVs and prints size and timing side by side."""
+    paths = [csv_dir / name if (csv_dir / name).exists() else None for name in TABLE_FILES]
+    business = label.replace('/', '_').replace(' ', '_')
+    business_store.store_frames(business, 'bench', load_business_data(*paths))
+
+    def from_csv():
+        return compute_features(load_business_data(*paths))
+
+    def load_stored():
+        return business_store.load_frames(business, 'bench', BANK_TX_REQUIRED_COLUMNS)
+
+    def from_store():
+        return compute_features(load_stored())
+
+    expected, actual = from_csv(), from_store()
+    mismatches = {k: (actual[k], expected[k]) for k in expected if not np.isclose(actual[k], expected[k], rtol=1e-12)}
+    assert not mismatches, f"{label}: {mismatches}"
+
+    csv_bytes = sum(p.stat().st_size for p in paths if p is not None)
+    store_bytes = business_store.stored_bytes(business, 'bench')
+    parse, load = best_of(lambda: load_business_data(*paths), repeat), best_of(load_stored, repeat)
+    csv_total, store_total = best_of(from_csv, repeat), best_of(from_store, repeat)
+    print(f"  {label:<28} {csv_bytes / 1e6:8.2f} MB {store_bytes / 1e6:8.2f} MB"
+          f" {parse * 1000:9.1f} ms {load * 1000:8.2f} ms {csv_total * 1000:9.1f} ms {store_total * 1000:9.1f} ms"
+          f" {csv_total / store_total:6.1f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        business_store.STORE_DIR = Path(tmp) / 'store'
+        print(f"  {'dataset':<28} {'csv':>11} {'stored':>11} {'parse':>12} {'load':>11}"
+              f" {'csv+feat':>12} {'store+feat':>12} {'speedup':>7}")
+        for window_dir in sorted(Path('data').glob('*/trailing_*m')):
+            compare(f"{window_dir.parent.name}/{window_dir.name}", window_dir, args.repeat)
+
+        synthetic_dir = Path(tmp) / 'synthetic'
+        synthetic_dir.mkdir()
+        synthetic_bank_tx(args.rows).to_csv(synthetic_dir / 'bank_tx.csv', index=False, date_format='%Y-%m-%d')
+        synthetic_pnl().to_csv(synthetic_dir / 'pnl_monthly.csv', index=False)
+        compare(f"synthetic {args.rows:,} rows", synthetic_dir, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
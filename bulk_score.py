@@ -0,0 +1,179 @@
+"""
+Offline bulk scoring for nightly portfolio runs.
+
+Walks a tree shaped like data/<business>/trailing_<N>m/{bank_tx,pnl_monthly,vendors}.csv,
+runs validation, feature engineering and scoring for every business in parallel worker
+processes, and appends one row per business/window to a single results CSV.
+
+Businesses already present in the results file are skipped, so an interrupted run can
+simply be restarted. Businesses with a window that ended in an error (a worker crash, a
+full disk) are scored again; validation failures are final.
+
+    python bulk_score.py data --output bulk_scores.csv --workers 8 [--pdf-dir memos]
+"""
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from app.services.ingestion import load_business_data
+from app.services.data_validation import validate_data
+from app.services.feature_engineering import bank_tx_kernel, chart_series, compute_features
+from app.services.scoring_engine import calculate_scorecard
+
+WINDOW_DIR_PATTERN = re.compile(r'^trailing_(\d+)m$')
+
+FEATURE_COLUMNS = [
+    'average_daily_balance', 'percent_of_days_below_zero', 'days_cash_on_hand', 'median_monthly_nocf',
+    'weekly_net_cashflow_variability', 'draw_on_credit_ratio', 'nsf_count', 'returned_ach_count',
+    'vendor_late_proxy', 'mom_revenue_variability', '3_month_slope', 'seasonal_delta',
+    'top_vendor_share', 'top_5_vendors_share', 'critical_vendor_share', 'top_vendor_category_share',
+    'dscr_proxy', 'annualized_revenue'
+]
+# scored_at stays last so a row torn by a crash mid-write can be detected on resume
+RESULT_COLUMNS = (
+    ['business', 'window', 'status', 'error'] + FEATURE_COLUMNS
+    + ['score', 'grade', 'eligible_capital', 'expected_loss_annualized', 'reason_codes', 'pdf_path', 'scored_at']
+)
+
+
+def find_businesses(data_dir):
+    """Returns {business_name: [(window, window_dir), ...]} for every business under data_dir."""
+    businesses = {}
+    for business_dir in sorted(Path(data_dir).iterdir()):
+        if not business_dir.is_dir():
+            continue
+        windows = []
+        for window_dir in business_dir.iterdir():
+            match = WINDOW_DIR_PATTERN.match(window_dir.name)
+            if match and (window_dir / 'bank_tx.csv').exists() and (window_dir / 'pnl_monthly.csv').exists():
+                windows.append((int(match.group(1)), f'{match.group(1)}m', window_dir))
+        if windows:
+            businesses[business_dir.name] = [(w, d) for _, w, d in sorted(windows)]
+    return businesses
+
+
+def score_business_windows(business_name, windows, pdf_dir=None):
+    """Scores every window of one business. Runs in a worker process; returns result rows."""
+    rows = []
+    for window, window_dir in windows:
+        row = {'business': business_name, 'window': window, 'status': 'ok', 'error': None}
+        try:
+            vendors_path = window_dir / 'vendors.csv'
+            frames = load_business_data(
+                window_dir / 'bank_tx.csv', window_dir / 'pnl_monthly.csv',
+                vendors_path if vendors_path.exists() else None
+            )
+            shared = {}
+            validation = validate_data(frames, aggregates=shared)
+            if not validation['passed']:
+                row.update(status='validation_failed', error=str(validation.get('error') or validation['checks']))
+            else:
+                kernel = shared.get('bank_tx_kernel') or bank_tx_kernel(frames['bank_tx'])
+                features = compute_features(frames, kernel)
+                scorecard = calculate_scorecard(features)
+                row.update(features)
+                row.update({k: v for k, v in scorecard.items() if k != 'reason_codes'})
+                row['reason_codes'] = '|'.join(scorecard['reason_codes'])
+                if pdf_dir:
+                    # Imported lazily so runs without memos skip matplotlib/fpdf entirely
+                    from app.services.memo_batch import worker_renderer
+                    from app.services.pdf_generator import create_credit_memo
+                    pdf_path = Path(pdf_dir) / business_name / f'Credit_Memo_{business_name}_{window}.pdf'
+                    pdf_path.parent.mkdir(parents=True, exist_ok=True)
+                    daily_balance, weekly_cash_flow = chart_series(kernel)
+                    create_credit_memo(business_name, window, scorecard, features, str(pdf_path),
+                                       daily_balance=daily_balance, weekly_cash_flow=weekly_cash_flow,
+                                       chart_renderer=worker_renderer())
+                    row['pdf_path'] = str(pdf_path)
+        except Exception as e:
+            row.update(status='error', error=f'{type(e).__name__}: {e}')
+        row['scored_at'] = datetime.now().isoformat(timespec='seconds')
+        rows.append(row)
+    return rows
+
+
+def load_finished(output_path):
+    """
+    Returns the businesses already in the results file. Rows torn by a crash mid-write
+    (missing the trailing scored_at column) are dropped, and so are all rows of a business
+    with a window in 'error' status, so it is scored again; the file is rewritten without them.
+    """
+    if not output_path.exists() or output_path.stat().st_size == 0:
+        return set()
+    existing = pd.read_csv(output_path, on_bad_lines='skip', dtype={'business': str})
+    if 'scored_at' not in existing.columns:
+        return set()
+    complete = existing[existing['scored_at'].notna()]
+    # Errors are transient (a crashed worker, a full disk), unlike validation failures
+    retry = set(complete.loc[complete['status'] == 'error', 'business'])
+    complete = complete[~complete['business'].isin(retry)]
+    if len(complete) != len(existing):
+        tmp_path = output_path.with_suffix(output_path.suffix + '.tmp')
+        complete.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, output_path)
+    return set(complete['business'])
+
+
+def append_rows(output_path, rows):
+    """Appends rows to the results CSV in one write, creating the header on first use."""
+    write_header = not output_path.exists() or output_path.stat().st_size == 0
+    df = pd.DataFrame(rows).reindex(columns=RESULT_COLUMNS)
+    with open(output_path, 'a', newline='') as f:
+        f.write(df.to_csv(index=False, header=write_header))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score every business under a data directory.')
+    parser.add_argument('data_dir', nargs='?', default='data', help='Directory of <business>/trailing_<N>m folders')
+    parser.add_argument('--output', default='bulk_scores.csv', help='Results CSV (appended to; used for resume)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--pdf-dir', default=None, help='Also render credit memos into this directory')
+    parser.add_argument('--restart', action='store_true', help='Ignore existing results and start over')
+    args = parser.parse_args(argv)
+
+    output_path = Path(args.output)
+    if args.restart and output_path.exists():
+        output_path.unlink()
+
+    businesses = find_businesses(args.data_dir)
+    finished = load_finished(output_path)
+    pending = {name: windows for name, windows in businesses.items() if name not in finished}
+    skipped = len(businesses) - len(pending)
+    print(f"Found {len(businesses)} businesses; {skipped} already scored, {len(pending)} to go.")
+
+    start = time.perf_counter()
+    done = failures = windows_scored = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(score_business_windows, name, windows, args.pdf_dir): name for name, windows in pending.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                rows = future.result()
+            except Exception as e:
+                rows = [{'business': name, 'window': None, 'status': 'error', 'error': f'{type(e).__name__}: {e}',
+                         'scored_at': datetime.now().isoformat(timespec='seconds')}]
+            append_rows(output_path, rows)
+            done += 1
+            windows_scored += len(rows)
+            statuses = ', '.join(f"{r['window']}={r['status']}" for r in rows)
+            if any(r['status'] != 'ok' for r in rows):
+                failures += 1
+            elapsed = time.perf_counter() - start
+            print(f"[{done}/{len(pending)}] {name}: {statuses} ({done / elapsed:.1f} businesses/sec)")
+
+    elapsed = time.perf_counter() - start
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"Scored {done} businesses ({windows_scored} windows) in {elapsed:.1f}s: "
+          f"{rate:.2f} businesses/sec; {failures} with errors; {skipped} skipped. Results: {output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,130 +1,274 @@
-import pandas as pd
-import numpy as np
+import argparse
+import multiprocessing
 import os
-from datetime import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+#  Business profiles: revenue range, cost ratios and [low, high) counts of NSF fees / returned ACHs
+PROFILES = {
+    'healthy': {'revenue': (3_000_000, 5_000_000), 'cogs_ratio': 0.45, 'op_ex_ratio': 0.25, 'nsf': (0, 1), 'ach': (0, 1)},
+    'stable': {'revenue': (2_500_000, 4_000_000), 'cogs_ratio': 0.55, 'op_ex_ratio': 0.35, 'nsf': (0, 2), 'ach': (0, 2)},
+    'struggling': {'revenue': (2_000_000, 3_500_000), 'cogs_ratio': 0.65, 'op_ex_ratio': 0.45, 'nsf': (2, 5), 'ach': (2, 5)},
+}
+DEFAULT_PROFILE_MIX = {'healthy': 0.6, 'stable': 0.2, 'struggling': 0.2}
+
+IN_CATEGORIES = ['customer_payment', 'investment_income', 'asset_sale', 'refund', 'credit']
+OUT_CATEGORIES = ['payroll', 'rent', 'utilities', 'supplier_payment', 'loan_repayment', 'tax_payment', 'marketing_spend', 'software_subscription', 'T&E']
+BANK_TX_CATEGORIES = IN_CATEGORIES + OUT_CATEGORIES + ['nsf_fee', 'returned_ach']
+COUNTERPARTIES = np.array([f'Counterparty_{i}' for i in range(1, 100)], dtype=object)
+VENDOR_CATEGORIES = ['supplies', 'rent', 'utilities', 'marketing', 'logistics', 'software']
+
+# Per-day transaction counts are drawn from [15, 30) inflows and [20, 40) outflows;
+# tx_per_day rescales both so their mean total is tx_per_day
+IN_PER_DAY = (15, 30)
+OUT_PER_DAY = (20, 40)
+MEAN_TX_PER_DAY = (sum(IN_PER_DAY) - 1) / 2 + (sum(OUT_PER_DAY) - 1) / 2
+
+# Businesses per task when generating a portfolio across processes
+SHARD_SIZE = 64
+
+
+def _spread(rng, month_of_row, totals, num_months):
+    """Splits each month's total across that month's rows with Dirichlet(1) weights (normalized exponentials)."""
+    weights = rng.standard_exponential(len(month_of_row))
+    month_weight = np.bincount(month_of_row, weights=weights, minlength=num_months)
+    return weights / month_weight[month_of_row] * totals[month_of_row]
+
 
-def generate_business_data(business_name, total_months):
-    """Generates a coherent set of financial data for a single business over a specified period."""
-    end_date = pd.to_datetime('today').normalize()
+def _draw_days(rng, month_of_row, first_day, days_in_month):
+    """A uniformly random day of the row's month, as a position in the window's day range."""
+    return first_day[month_of_row] + (rng.random(len(month_of_row)) * days_in_month[month_of_row]).astype('int64')
+
+
+def generate_business_data(business_name, total_months, profile=None, tx_per_day=None, rng=None, end_date=None):
+    """
+    Generates a coherent set of financial data for a single business over a specified period.
+    Everything is drawn as whole arrays from `rng` (a numpy Generator), so a seeded generator
+    and a fixed end_date reproduce the business exactly.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    end_date = pd.Timestamp(end_date if end_date is not None else 'today').normalize()
     start_date = end_date - pd.DateOffset(months=total_months)
-    
+
     #  1. Defining a business profile to make it more randomized
-    profile = np.random.choice(['healthy', 'stable', 'struggling'], p=[0.6, 0.2, 0.2])
-    print(f"Generating {total_months}m of data for '{business_name}' with profile: {profile}")
+    if profile is None:
+        profile = rng.choice(list(DEFAULT_PROFILE_MIX), p=list(DEFAULT_PROFILE_MIX.values()))
+    settings = PROFILES[profile]
 
     #  2. Generating P&L data for the full period
     months_range = pd.date_range(end=end_date, periods=total_months, freq='ME')
     num_months = len(months_range)
-
-    if profile == 'healthy':
-        revenue = np.round(np.random.uniform(3_000_000, 5_000_000, size=num_months), 2)
-        cogs_ratio, op_ex_ratio = (0.45, 0.25)
-    elif profile == 'stable':
-        revenue = np.round(np.random.uniform(2_500_000, 4_000_000, size=num_months), 2)
-        cogs_ratio, op_ex_ratio = (0.55, 0.35)
-    else: # struggling
-        revenue = np.round(np.random.uniform(2_000_000, 3_500_000, size=num_months), 2)
-        cogs_ratio, op_ex_ratio = (0.65, 0.45)
-
+    revenue = np.round(rng.uniform(*settings['revenue'], size=num_months), 2)
     pnl_monthly_df = pd.DataFrame({
         'month': months_range,
         'revenue': revenue,
-        'cogs': np.round(revenue * cogs_ratio, 2),
-        'operating_expense': np.round(revenue * op_ex_ratio, 2),
-        'other_income_expense': np.round(np.random.uniform(-50_000, 50_000, size=num_months), 2)
+        'cogs': np.round(revenue * settings['cogs_ratio'], 2),
+        'operating_expense': np.round(revenue * settings['op_ex_ratio'], 2),
+        'other_income_expense': np.round(rng.uniform(-50_000, 50_000, size=num_months), 2)
     })
 
-    #  3. Generating rest of the data
-    all_transactions = []
-    dates_in_window = pd.to_datetime(pd.date_range(start=start_date, end=end_date, freq='D'))
-    
-    in_categories = ['customer_payment', 'investment_income', 'asset_sale', 'refund', 'credit']
-    out_categories = ['payroll', 'rent', 'utilities', 'supplier_payment', 'loan_repayment', 'tax_payment', 'marketing_spend', 'software_subscription', 'T&E']
-
-    for _, row in pnl_monthly_df.iterrows():
-        month_dates = [d for d in dates_in_window if d.month == row['month'].month and d.year == row['month'].year]
-        if not month_dates: continue
-        
-        num_inflows = np.random.randint(15, 30) * len(month_dates)
-        inflow_amounts = np.random.dirichlet(np.ones(num_inflows)) * row['revenue']
-        
-        num_outflows = np.random.randint(20, 40) * len(month_dates)
-        total_outflow_target = row['cogs'] + row['operating_expense']
-        outflow_amounts = np.random.dirichlet(np.ones(num_outflows)) * total_outflow_target
-
-        for amount in inflow_amounts:
-            all_transactions.append({'date': np.random.choice(month_dates), 'amount': amount, 'category': np.random.choice(in_categories), 'in_out': 'in'})
-        for amount in outflow_amounts:
-            all_transactions.append({'date': np.random.choice(month_dates), 'amount': amount, 'category': np.random.choice(out_categories), 'in_out': 'out'})
-
-    bank_tx_df = pd.DataFrame(all_transactions)
-    
+    #  3. Generating transactions, all months at once
+    dates_in_window = pd.date_range(start=start_date, end=end_date, freq='D')
+    day_month = months_range.to_period('M').get_indexer(dates_in_window.to_period('M'))
+    days_in_month = np.bincount(day_month[day_month >= 0], minlength=num_months)
+    # Days past the last month end (a partial current month) belong to no P&L month
+    in_pnl = np.flatnonzero(day_month >= 0)
+    first_day = in_pnl[np.minimum(np.searchsorted(day_month[in_pnl], np.arange(num_months)), len(in_pnl) - 1)]
+
+    scale = 1.0 if tx_per_day is None else tx_per_day / MEAN_TX_PER_DAY
+    num_inflows = np.rint(rng.integers(*IN_PER_DAY, size=num_months) * scale * days_in_month).astype('int64')
+    num_outflows = np.rint(rng.integers(*OUT_PER_DAY, size=num_months) * scale * days_in_month).astype('int64')
+
+    in_month = np.repeat(np.arange(num_months), num_inflows)
+    out_month = np.repeat(np.arange(num_months), num_outflows)
+    in_amounts = _spread(rng, in_month, revenue, num_months)
+    out_amounts = _spread(rng, out_month, pnl_monthly_df['cogs'].to_numpy() + pnl_monthly_df['operating_expense'].to_numpy(), num_months)
+
     #  Putting in some nsf and ach checks to make it more realistic
-    nsf_events = []
-    if profile == 'struggling':
-        num_nsf = np.random.randint(2, 5)
-        num_ach = np.random.randint(2, 5)
-    elif profile == 'stable':
-        num_nsf = np.random.randint(0, 2)
-        num_ach = np.random.randint(0, 2)
-    else: # healthy
-        num_nsf, num_ach = 0, 0
-        
-    for _ in range(num_nsf):
-        nsf_events.append({'date': np.random.choice(dates_in_window), 'amount': np.round(np.random.uniform(25, 50), 2), 'category': 'nsf_fee', 'in_out': 'out'})
-    for _ in range(num_ach):
-        nsf_events.append({'date': np.random.choice(dates_in_window), 'amount': np.round(np.random.uniform(500, 2000), 2), 'category': 'returned_ach', 'in_out': 'out'})
-
-    if nsf_events:
-        bank_tx_df = pd.concat([bank_tx_df, pd.DataFrame(nsf_events)], ignore_index=True)
-
-    bank_tx_df = bank_tx_df.sort_values(by='date').reset_index(drop=True)
-    bank_tx_df['amount'] = bank_tx_df['amount'].round(2)
-    bank_tx_df['counterparty'] = [f'Counterparty_{i}' for i in np.random.randint(1, 100, size=len(bank_tx_df))]
-
-    initial_balance = np.round(np.random.uniform(15_000_000, 25_000_000), 2)
-    signed_amounts = np.where(bank_tx_df['in_out'] == 'in', bank_tx_df['amount'], -bank_tx_df['amount'])
-    bank_tx_df['balance'] = np.round(initial_balance + signed_amounts.cumsum(), 2)
-    
+    num_nsf = rng.integers(*settings['nsf'])
+    num_ach = rng.integers(*settings['ach'])
+
+    day = np.concatenate([
+        _draw_days(rng, in_month, first_day, days_in_month),
+        _draw_days(rng, out_month, first_day, days_in_month),
+        rng.integers(0, len(dates_in_window), size=num_nsf + num_ach),
+    ])
+    amount = np.concatenate([
+        in_amounts, out_amounts, rng.uniform(25, 50, size=num_nsf), rng.uniform(500, 2000, size=num_ach)
+    ])
+    category_code = np.concatenate([
+        rng.integers(0, len(IN_CATEGORIES), size=len(in_month)),
+        len(IN_CATEGORIES) + rng.integers(0, len(OUT_CATEGORIES), size=len(out_month)),
+        np.full(num_nsf, BANK_TX_CATEGORIES.index('nsf_fee')),
+        np.full(num_ach, BANK_TX_CATEGORIES.index('returned_ach')),
+    ])
+    is_in = np.arange(len(day)) < len(in_month)
+
+    order = np.argsort(day, kind='stable')
+    day, amount, category_code, is_in = day[order], np.round(amount[order], 2), category_code[order], is_in[order]
+    bank_tx_df = pd.DataFrame({
+        'date': dates_in_window[day],
+        'amount': amount,
+        'category': pd.Categorical.from_codes(category_code, BANK_TX_CATEGORIES),
+        'in_out': pd.Categorical.from_codes(np.where(is_in, 0, 1), ['in', 'out']),
+        'counterparty': COUNTERPARTIES[rng.integers(0, len(COUNTERPARTIES), size=len(day))],
+    })
+
+    initial_balance = np.round(rng.uniform(15_000_000, 25_000_000), 2)
+    bank_tx_df['balance'] = np.round(initial_balance + np.where(is_in, amount, -amount).cumsum(), 2)
+
     return pnl_monthly_df, bank_tx_df
 
-def save_sliced_data(business_name, full_pnl, full_bank_tx, months_to_save):
-    """Slices the full dataset to the specified window and saves the files."""
+
+def slice_business_data(full_pnl, full_bank_tx, months_to_save, rng=None):
+    """
+    Cuts the trailing window from a generated history and adds the invoice / due dates and a
+    vendor list. Returns a frame bundle typed the way app.services.ingestion parses the files.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
     end_date = full_pnl['month'].max()
     start_date = end_date - pd.DateOffset(months=months_to_save)
 
-    pnl_slice = full_pnl[full_pnl['month'] > start_date].copy()
-    bank_tx_slice = full_bank_tx[full_bank_tx['date'] > start_date].copy()
-
+    pnl_slice = full_pnl[full_pnl['month'] > start_date].reset_index(drop=True)
     pnl_slice['month'] = pnl_slice['month'].dt.strftime('%Y-%m')
+    bank_tx_slice = full_bank_tx[full_bank_tx['date'] > start_date].reset_index(drop=True)
 
-    bank_tx_slice['invoice_date'] = pd.NaT
-    bank_tx_slice['due_date'] = pd.NaT
-    outflow_mask = bank_tx_slice['in_out'] == 'out'
-    num_outflows = outflow_mask.sum()
+    outflow_mask = (bank_tx_slice['in_out'] == 'out').to_numpy()
+    num_outflows = int(outflow_mask.sum())
+    invoice_date = np.full(len(bank_tx_slice), np.datetime64('NaT'), dtype='datetime64[ns]')
+    due_date = invoice_date.copy()
     if num_outflows > 0:
-        invoice_offsets = pd.to_timedelta(np.random.randint(15, 45, size=num_outflows), unit='d')
-        due_offsets = pd.to_timedelta(30 + np.random.randint(-5, 10, size=num_outflows), unit='d')
-        invoice_dates_calculated = bank_tx_slice.loc[outflow_mask, 'date'] - invoice_offsets
-        bank_tx_slice.loc[outflow_mask, 'invoice_date'] = invoice_dates_calculated
-        due_dates_calculated = bank_tx_slice.loc[outflow_mask, 'invoice_date'] + due_offsets
-        bank_tx_slice.loc[outflow_mask, 'due_date'] = due_dates_calculated
-        bank_tx_slice['invoice_date'] = bank_tx_slice['invoice_date'].dt.strftime('%Y-%m-%d')
-        bank_tx_slice['due_date'] = bank_tx_slice['due_date'].dt.strftime('%Y-%m-%d')
-    
-    output_dir = f'data/{business_name}/trailing_{months_to_save}m'
-    os.makedirs(output_dir, exist_ok=True)
-    bank_tx_slice.to_csv(f'{output_dir}/bank_tx.csv', index=False)
-    pnl_slice.to_csv(f'{output_dir}/pnl_monthly.csv', index=False)
-    
-    vendors_data = {'vendor_id': [f'V{i}' for i in range(1, 101)], 'name': [f'Vendor Name {i}' for i in range(1, 101)], 'category': np.random.choice(['supplies', 'rent', 'utilities', 'marketing', 'logistics', 'software'], size=100), 'is_critical': np.random.choice([True, False], size=100, p=[0.3, 0.7])}
-    pd.DataFrame(vendors_data).to_csv(f'{output_dir}/vendors.csv', index=False)
+        invoice_offsets = pd.to_timedelta(rng.integers(15, 45, size=num_outflows), unit='d').to_numpy()
+        due_offsets = pd.to_timedelta(30 + rng.integers(-5, 10, size=num_outflows), unit='d').to_numpy()
+        invoice_date[outflow_mask] = bank_tx_slice['date'].to_numpy()[outflow_mask] - invoice_offsets
+        due_date[outflow_mask] = invoice_date[outflow_mask] + due_offsets
+    bank_tx_slice['invoice_date'] = invoice_date
+    bank_tx_slice['due_date'] = due_date
 
+    vendors = pd.DataFrame({
+        'vendor_id': [f'V{i}' for i in range(1, 101)],
+        'name': [f'Vendor Name {i}' for i in range(1, 101)],
+        'category': pd.Categorical(rng.choice(VENDOR_CATEGORIES, size=100)),
+        'is_critical': pd.array(rng.random(100) < 0.3, dtype='boolean'),
+    })
+    return {'bank_tx': bank_tx_slice, 'pnl_monthly': pnl_slice, 'vendors': vendors}
+
+
+def save_sliced_data(business_name, full_pnl, full_bank_tx, months_to_save, rng=None, output_dir='data', output_format='csv'):
+    """
+    Slices the full dataset to the specified window and saves the files: CSVs under
+    <output_dir>/<business>/trailing_<n>m/, or (output_format='store') a dataset in the
+    columnar business store, ready for POST /rescore/{business_name}.
+    """
+    frames = slice_business_data(full_pnl, full_bank_tx, months_to_save, rng)
+    if output_format == 'store':
+        from app.services import business_store
+        business_store.store_frames(business_name, f'{months_to_save}m', frames, generated=True)
+        return
+
+    window_dir = os.path.join(output_dir, business_name, f'trailing_{months_to_save}m')
+    os.makedirs(window_dir, exist_ok=True)
+    for table, df in frames.items():
+        df.to_csv(os.path.join(window_dir, f'{table}.csv'), index=False, date_format='%Y-%m-%d')
+
+
+#  Portfolio generation: businesses are sharded across processes, each with its own seed
+def _generate_shard(names, seeds, options):
+    rows = 0
+    for name, seed in zip(names, seeds):
+        rng = np.random.default_rng(seed)
+        profile = rng.choice(list(options['profile_mix']), p=list(options['profile_mix'].values()))
+        full_pnl, full_bank_tx = generate_business_data(
+            name, options['months'], profile, options['tx_per_day'], rng, options['end_date']
+        )
+        for window in options['windows']:
+            save_sliced_data(name, full_pnl, full_bank_tx, window, rng, options['output_dir'], options['output_format'])
+        rows += len(full_bank_tx)
+    return len(names), rows
 
-if __name__ == "__main__":
-    for name in ['business_a', 'business_b']:
-        full_pnl_df, full_bank_tx_df = generate_business_data(name, 6)
-        save_sliced_data(name, full_pnl_df, full_bank_tx_df, 6)
-        save_sliced_data(name, full_pnl_df, full_bank_tx_df, 3)
 
-    print("Data generated successfully in the 'data' directory.")
+def generate_portfolio(names, months=6, windows=(6, 3), tx_per_day=None, profile_mix=None, seed=0,
+                       end_date=None, output_dir='data', output_format='csv', workers=None, progress=None):
+    """
+    Generates and saves many businesses across worker processes. Business i always gets the
+    i-th child of SeedSequence(seed), so the output does not depend on the number of workers.
+    Returns {'businesses', 'transactions', 'seconds'}.
+    """
+    options = {
+        'months': months, 'windows': list(windows), 'tx_per_day': tx_per_day,
+        'profile_mix': profile_mix or DEFAULT_PROFILE_MIX,
+        # Fixed once so every shard cuts the same windows even across midnight
+        'end_date': pd.Timestamp(end_date if end_date is not None else 'today').normalize(),
+        'output_dir': output_dir, 'output_format': output_format,
+    }
+    seeds = np.random.SeedSequence(seed).spawn(len(names))
+    shards = [(names[i:i + SHARD_SIZE], seeds[i:i + SHARD_SIZE]) for i in range(0, len(names), SHARD_SIZE)]
+
+    start = time.perf_counter()
+    businesses = transactions = 0
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = (_generate_shard(shard_names, shard_seeds, options) for shard_names, shard_seeds in shards)
+        for done, rows in results:
+            businesses, transactions = businesses + done, transactions + rows
+            if progress is not None:
+                progress(businesses, transactions, time.perf_counter() - start)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [pool.submit(_generate_shard, shard_names, shard_seeds, options) for shard_names, shard_seeds in shards]
+            for future in futures:
+                done, rows = future.result()
+                businesses, transactions = businesses + done, transactions + rows
+                if progress is not None:
+                    progress(businesses, transactions, time.perf_counter() - start)
+    return {'businesses': businesses, 'transactions': transactions, 'seconds': time.perf_counter() - start}
+
+
+def _parse_profile_mix(text):
+    mix = {}
+    for part in text.split(','):
+        profile, weight = part.split('=')
+        if profile.strip() not in PROFILES:
+            raise argparse.ArgumentTypeError(f"Unknown profile {profile!r}; choose from {list(PROFILES)}")
+        mix[profile.strip()] = float(weight)
+    total = sum(mix.values())
+    return {profile: weight / total for profile, weight in mix.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generates synthetic businesses: the sample data, or a load-test portfolio.")
+    parser.add_argument('--count', type=int, help="Number of businesses, named <prefix>_000000 ... (default: business_a and business_b)")
+    parser.add_argument('--prefix', default='business')
+    parser.add_argument('--months', type=int, default=6, help="Length of the generated history")
+    parser.add_argument('--windows', default='6,3', help="Trailing windows saved per business, in months")
+    parser.add_argument('--tx-per-day', type=float, help="Mean transactions per day (default: about 52)")
+    parser.add_argument('--profile-mix', type=_parse_profile_mix, default=DEFAULT_PROFILE_MIX,
+                        help="e.g. healthy=0.6,stable=0.2,struggling=0.2")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--end-date', help="Last day of the history (default: today)")
+    parser.add_argument('--output', default='data', help="CSV output directory")
+    parser.add_argument('--format', choices=['csv', 'store'], default='csv',
+                        help="csv files, or the columnar business store (SCORING_STORE_DIR)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    names = ['business_a', 'business_b'] if args.count is None else [f'{args.prefix}_{i:06d}' for i in range(args.count)]
+    windows = [int(w) for w in args.windows.split(',')]
+
+    def report(businesses, transactions, seconds):
+        print(f"{businesses}/{len(names)} businesses, {transactions:,} transactions, "
+              f"{businesses / seconds:.1f} businesses/sec", flush=True)
+
+    stats = generate_portfolio(
+        names, args.months, windows, args.tx_per_day, args.profile_mix, args.seed, args.end_date,
+        args.output, args.format, args.workers, report
+    )
+    print(f"Generated {stats['businesses']} businesses ({stats['transactions']:,} transactions) in {stats['seconds']:.1f}s"
+          f" into {'the business store' if args.format == 'store' else repr(args.output)}.")
+
+
+if __name__ == "__main__":
+    main()
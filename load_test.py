@@ -0,0 +1,332 @@
+"""
+Load test for the scoring API, fully offline on one machine.
+
+Starts the app with uvicorn on a local port (or targets --url), then replays multipart
+/score/ uploads built from data/<business>/trailing_{3,6}m and downloads the memos they
+link to. Requests run from --concurrency client threads, either as fast as possible or at
+a fixed --rate of /score/ requests per second (open loop: latency counts from each
+request's scheduled start, so a slow server cannot hide its queueing delay).
+
+Reports throughput, p50/p95/p99 latency and errors per endpoint, plus the server-side stage
+breakdown taken from the difference in /metrics before and after the run.
+
+    python load_test.py data --requests 200 --concurrency 8 --rate 4 --output load_report.json
+"""
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+import numpy as np
+
+WINDOWS = ('3m', '6m')
+TABLES = ('bank_tx', 'pnl_monthly', 'vendors')
+NAME_PREFIX = 'loadtest'
+STAGE_METRIC = re.compile(r'^scoring_stage_(wall|cpu)_seconds_(sum|count)\{stage="([^"]*)"[^}]*\} (\S+)$')
+
+
+#  Request payloads
+def find_fixtures(data_dir):
+    """{business: {field name: (filename, bytes)}} for every business with 3m and 6m uploads."""
+    fixtures = {}
+    for business_dir in sorted(Path(data_dir).iterdir()):
+        files = {}
+        for window in WINDOWS:
+            window_dir = business_dir / f'trailing_{window}'
+            for table in TABLES:
+                path = window_dir / f'{table}.csv'
+                if path.exists():
+                    files[f'{table}_{window}'] = (path.name, path.read_bytes())
+        if all(f'{table}_{window}' in files for window in WINDOWS for table in ('bank_tx', 'pnl_monthly')):
+            fixtures[business_dir.name] = files
+    return fixtures
+
+
+def encode_multipart(fields, files):
+    """A multipart/form-data body and its content type."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: text/csv\r\n\r\n'.encode()
+        )
+        parts.append(content)
+        parts.append(b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+#  HTTP: one keep-alive connection per client thread
+class Client:
+    def __init__(self, host, port, timeout):
+        self.host, self.port, self.timeout = host, port, timeout
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        """Returns (status, response body); status 0 means the connection failed."""
+        for attempt in range(2):
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                self._local.conn = None
+                # A kept-alive connection may have been closed by the server; retry once on a new one
+                if attempt:
+                    return 0, b''
+        return 0, b''
+
+
+#  Server lifecycle
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, workdir, env_overrides):
+    """Starts uvicorn on 127.0.0.1:port and waits until it answers."""
+    env = dict(os.environ, **env_overrides)
+    log = open(Path(workdir) / 'server.log', 'wb')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+        stdout=log, stderr=subprocess.STDOUT, env=env
+    )
+    client = Client('127.0.0.1', port, timeout=5)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        if client.request('GET', '/metrics')[0] == 200:
+            return process
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server did not start; see {log.name}:\n{Path(log.name).read_text()[-2000:]}")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+#  Server-side stage breakdown
+def scrape_stages(client):
+    """{stage: {'wall_sum', 'wall_count', 'cpu_sum', 'cpu_count'}} summed over every label set."""
+    status, body = client.request('GET', '/metrics')
+    stages = defaultdict(lambda: defaultdict(float))
+    if status != 200:
+        return stages
+    for line in body.decode().splitlines():
+        match = STAGE_METRIC.match(line)
+        if match:
+            kind, field, stage, value = match.groups()
+            stages[stage][f'{kind}_{field}'] += float(value)
+    return stages
+
+
+def stage_breakdown(before, after):
+    breakdown = {}
+    for stage, totals in after.items():
+        count = totals['wall_count'] - before.get(stage, {}).get('wall_count', 0)
+        if count <= 0:
+            continue
+        wall = totals['wall_sum'] - before.get(stage, {}).get('wall_sum', 0)
+        cpu = totals['cpu_sum'] - before.get(stage, {}).get('cpu_sum', 0)
+        breakdown[stage] = {'count': int(count), 'mean_wall_ms': wall / count * 1000, 'mean_cpu_ms': cpu / count * 1000,
+                            'total_wall_seconds': wall}
+    return dict(sorted(breakdown.items(), key=lambda item: -item[1]['total_wall_seconds']))
+
+
+#  Load generation
+def run_load(client, fixtures, requests, concurrency, rate, duration, download_ratio, reuse_names, seed):
+    """Runs the scenario and returns one sample per HTTP request."""
+    samples = []
+    samples_lock = threading.Lock()
+    rng = random.Random(seed)
+    businesses = list(fixtures)
+    jobs = queue.Queue()
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+
+    def scenario(index, scheduled):
+        business = businesses[index % len(businesses)]
+        name = f'{NAME_PREFIX}_{business}' if reuse_names else f'{NAME_PREFIX}_{business}_{index:06d}'
+        body, content_type = encode_multipart({'business_name': name}, fixtures[business])
+        status, payload = client.request('POST', '/score/', body, {'Content-Type': content_type})
+        record('score', status, time.perf_counter() - scheduled)
+        if status != 200:
+            return
+        for result in json.loads(payload).values():
+            url = result.get('pdf_download_url') if isinstance(result, dict) else None
+            with samples_lock:
+                download = url is not None and rng.random() < download_ratio
+            if download:
+                sent = time.perf_counter()
+                status, _ = client.request('GET', quote(url))
+                record('download', status, time.perf_counter() - sent)
+
+    def record(endpoint, status, seconds):
+        with samples_lock:
+            samples.append({'endpoint': endpoint, 'status': status, 'seconds': seconds, 'at': time.perf_counter() - start})
+
+    def worker():
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            index, scheduled = job
+            if scheduled is None:
+                scheduled = time.perf_counter()
+            elif scheduled > time.perf_counter():
+                time.sleep(scheduled - time.perf_counter())
+            scenario(index, scheduled)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    index = 0
+    while (requests is None or index < requests) and (deadline is None or time.perf_counter() < deadline):
+        if rate:
+            scheduled = start + index / rate
+        else:
+            # Closed loop: at most one queued scenario per client thread
+            while jobs.qsize() >= concurrency:
+                time.sleep(0.005)
+            scheduled = None
+        jobs.put((index, scheduled))
+        index += 1
+        if rate and deadline is not None and scheduled > deadline:
+            break
+    for _ in threads:
+        jobs.put(None)
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, elapsed):
+    report = {}
+    by_endpoint = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample['endpoint']].append(sample)
+    for endpoint, endpoint_samples in by_endpoint.items():
+        ok = np.array([s['seconds'] for s in endpoint_samples if 200 <= s['status'] < 300])
+        errors = defaultdict(int)
+        for s in endpoint_samples:
+            if not 200 <= s['status'] < 300:
+                errors[str(s['status']) if s['status'] else 'connection'] += 1
+        p50, p95, p99 = np.percentile(ok, [50, 95, 99]) if len(ok) else (float('nan'),) * 3
+        report[endpoint] = {
+            'requests': len(endpoint_samples), 'ok': int(len(ok)),
+            'error_rate': 1 - len(ok) / len(endpoint_samples), 'errors': dict(errors),
+            'throughput_per_sec': len(ok) / elapsed if elapsed > 0 else 0.0,
+            'p50_ms': p50 * 1000, 'p95_ms': p95 * 1000, 'p99_ms': p99 * 1000,
+            'max_ms': float(ok.max()) * 1000 if len(ok) else float('nan'),
+        }
+    return report
+
+
+def print_report(report):
+    print(f"\n{report['elapsed_seconds']:.1f}s, concurrency {report['concurrency']}, "
+          f"rate {report['rate'] or 'unbounded'}")
+    print(f"  {'endpoint':<10} {'requests':>8} {'errors':>7} {'req/s':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for endpoint, stats in report['endpoints'].items():
+        print(f"  {endpoint:<10} {stats['requests']:>8} {stats['error_rate']:>7.1%} {stats['throughput_per_sec']:>7.2f}"
+              f" {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}"
+              + (f"  {stats['errors']}" if stats['errors'] else ''))
+    if report['server_stages']:
+        print(f"\n  {'server stage':<22} {'count':>7} {'wall ms':>9} {'cpu ms':>9} {'total s':>9}")
+        for stage, stats in report['server_stages'].items():
+            print(f"  {stage:<22} {stats['count']:>7} {stats['mean_wall_ms']:>9.1f} {stats['mean_cpu_ms']:>9.1f}"
+                  f" {stats['total_wall_seconds']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the scoring API with fixture uploads.')
+    parser.add_argument('data_dir', nargs='?', default='data', help='Directory of <business>/trailing_{3,6}m folders')
+    parser.add_argument('--url', help='Target a running server instead of starting one, e.g. http://127.0.0.1:8000')
+    parser.add_argument('--requests', type=int, default=100, help='/score/ requests to send')
+    parser.add_argument('--duration', type=float, help='Stop sending after this many seconds')
+    parser.add_argument('--concurrency', type=int, default=4, help='Client threads')
+    parser.add_argument('--rate', type=float, help='/score/ requests per second (default: as fast as the clients go)')
+    parser.add_argument('--download-ratio', type=float, default=1.0, help='Fraction of memo links downloaded')
+    parser.add_argument('--reuse-names', action='store_true',
+                        help='Resend identical uploads so repeats are served by the result cache')
+    parser.add_argument('--server-env', action='append', default=[], metavar='NAME=VALUE',
+                        help='Environment for the started server, e.g. SCORING_MAX_WORKERS=8 (repeatable)')
+    parser.add_argument('--timeout', type=float, default=300, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the report as JSON')
+    args = parser.parse_args()
+
+    fixtures = find_fixtures(args.data_dir)
+    if not fixtures:
+        parser.error(f'No businesses with trailing_3m and trailing_6m uploads under {args.data_dir}')
+
+    workdir = tempfile.mkdtemp(prefix='load_test_')
+    server = None
+    try:
+        if args.url:
+            target = urlsplit(args.url)
+            host, port = target.hostname, target.port or 80
+        else:
+            # The server's cache, store and portfolio are kept out of the working tree for the run
+            host, port = '127.0.0.1', free_port()
+            server_env = {
+                'SCORING_CACHE_DIR': str(Path(workdir) / 'cache'), 'SCORING_STORE_DIR': str(Path(workdir) / 'store'),
+                'SCORING_PORTFOLIO_DB': str(Path(workdir) / 'portfolio.sqlite3'),
+            }
+            server_env.update(setting.split('=', 1) for setting in args.server_env)
+            server = start_server(port, workdir, server_env)
+        client = Client(host, port, args.timeout)
+
+        print(f"Replaying {len(fixtures)} businesses against {host}:{port}")
+        before = scrape_stages(client)
+        samples, elapsed = run_load(client, fixtures, args.requests if not args.duration else None,
+                                    args.concurrency, args.rate, args.duration, args.download_ratio,
+                                    args.reuse_names, args.seed)
+        report = {
+            'elapsed_seconds': elapsed, 'concurrency': args.concurrency, 'rate': args.rate,
+            'endpoints': summarize(samples, elapsed),
+            'server_stages': stage_breakdown(before, scrape_stages(client)),
+        }
+        print_report(report)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"\nReport written to {args.output}")
+    finally:
+        if server is not None:
+            stop_server(server)
+            for upload_dir in Path('uploads').glob(f'{NAME_PREFIX}_*'):
+                shutil.rmtree(upload_dir, ignore_errors=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
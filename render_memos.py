@@ -0,0 +1,50 @@
+"""
+Batch rendering of credit memos, for month-end runs.
+
+Renders every memo spec (*.pdf.memo.pkl, saved by the scoring API when it defers the PDF)
+found under a directory, across worker processes, into one PDF per memo or a single zip.
+The API keeps each request's memos in a workspace of its own, so a memo may be found once
+per request that produced it: only the newest is rendered.
+
+    python render_memos.py uploads --output memos.zip --workers 8
+    python render_memos.py uploads --output memos/
+"""
+import argparse
+import os
+from pathlib import Path
+
+from app.services.memo_batch import DEFAULT_CHUNK_SIZE, render_memos
+from app.services.memo_renderer import SPEC_SUFFIX
+
+
+def latest_specs(specs):
+    """The newest spec of each memo (Credit_Memo_<business>_<window>), by modification time."""
+    newest = {}
+    for spec in specs:
+        modified = spec.stat().st_mtime
+        if spec.name not in newest or modified > newest[spec.name][0]:
+            newest[spec.name] = (modified, spec)
+    return sorted(spec for _, spec in newest.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render every saved memo spec under a directory.')
+    parser.add_argument('spec_dir', nargs='?', default='uploads', help='Directory searched recursively for memo specs')
+    parser.add_argument('--output', default='memos.zip', help='Output directory, or a .zip archive')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Memos per worker task')
+    args = parser.parse_args(argv)
+
+    specs = latest_specs(Path(args.spec_dir).rglob(f'*{SPEC_SUFFIX}'))
+    print(f"Found {len(specs)} memo specs under {args.spec_dir}.")
+
+    def progress(done, elapsed):
+        print(f"[{done}/{len(specs)}] {done / elapsed:.1f} memos/sec")
+
+    stats = render_memos(specs, args.output, workers=args.workers, chunk_size=args.chunk_size, progress=progress)
+    print(f"Rendered {stats['memos']} memos in {stats['seconds']:.1f}s: "
+          f"{stats['memos_per_sec']:.1f} memos/sec. Output: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Startup cost report: what each process imports, and what a worker's warm-up costs.
+
+Imports each entry module in a fresh interpreter under `python -X importtime` and prints
+its total import time, the cost of each top-level package (the self time of all its
+modules), the slowest single modules, and which heavy packages (pandas, numpy,
+matplotlib, fpdf) it loaded. The server process imports app.main; a worker imports
+app.services.tasks to take its first task and loads the rest while warming up.
+--warm-up also times tasks.warm_up() twice in a fresh interpreter: the first call pays for
+imports, the chart backend, fonts and first-use setup, the second shows steady-state cost.
+
+    python startup_report.py
+    python startup_report.py --module app.main --top 15 --warm-up
+"""
+import argparse
+import json
+import subprocess
+import sys
+from collections import defaultdict
+
+DEFAULT_MODULES = ['app.main', 'app.services.tasks', 'app.services.pipeline', 'app.services.pdf_generator']
+HEAVY_PACKAGES = ['pandas', 'numpy', 'matplotlib', 'fpdf', 'PIL']
+
+WARM_UP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from app.services import tasks
+tasks.warm_up()
+first = time.perf_counter() - start
+start = time.perf_counter()
+tasks.warm_up()
+print(json.dumps({'first': first, 'second': time.perf_counter() - start}))
+"""
+
+
+def import_times(module):
+    """
+    [(module name, self seconds, cumulative seconds)] of everything a fresh `import module`
+    loads, the module last. Imports the interpreter made at startup are left out.
+    """
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nested imports are indented two spaces per level and listed before their importer
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, depth))
+    end = max((i for i, row in enumerate(rows) if row[0] == module and row[3] == 0), default=len(rows) - 1)
+    start = end
+    while start > 0 and rows[start - 1][3] > 0:
+        start -= 1
+    return [row[:3] for row in rows[start:end + 1]]
+
+
+def report(module, top):
+    rows = import_times(module)
+    total = rows[-1][2] if rows else 0.0
+    by_package = defaultdict(float)
+    for name, self_seconds, _ in rows:
+        by_package[name.split('.')[0]] += self_seconds
+    loaded = {name.split('.')[0] for name, _, _ in rows}
+
+    print(f"{module}: {total * 1000:.0f} ms, {len(rows)} modules")
+    print(f"  heavy packages loaded: {', '.join(p for p in HEAVY_PACKAGES if p in loaded) or 'none'}")
+    print("  by package (self time):")
+    for package, seconds in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"    {package:<40} {seconds * 1000:8.1f} ms")
+    print("  slowest modules (self time):")
+    for name, self_seconds, _ in sorted(rows, key=lambda row: -row[1])[:top]:
+        print(f"    {name:<40} {self_seconds * 1000:8.1f} ms")
+    print()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', action='append', default=None,
+                        help=f"Entry module to import (repeatable; default: {', '.join(DEFAULT_MODULES)})")
+    parser.add_argument('--top', type=int, default=10, help='Packages and modules listed per entry module')
+    parser.add_argument('--warm-up', action='store_true', help="Also time a fresh worker's warm-up")
+    args = parser.parse_args(argv)
+
+    for module in args.module or DEFAULT_MODULES:
+        report(module, args.top)
+
+    if args.warm_up:
+        completed = subprocess.run([sys.executable, '-c', WARM_UP_SCRIPT], capture_output=True, text=True, check=True)
+        timings = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(f"worker warm-up: {timings['first']:.2f}s cold (including imports), {timings['second']:.2f}s warm")
+
+
+if __name__ == '__main__':
+    main()